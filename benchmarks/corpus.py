@@ -0,0 +1,160 @@
+"""
+Synthetic corpus of papers shared by the benchmarks and the stub servers.
+
+The abstracts are assembled from sentences typical of cs.CV / cs.LG
+abstracts, a fraction of them mentions the keywords of the default
+`DefaultKeywordsFilter` config, a code link or an ignored topic, so the
+plugins take their real code paths. The corpus is deterministic for a
+given seed.
+
+Usage:
+    python benchmarks/corpus.py --num_papers 10000 --output corpus.jsonl.gz
+"""
+import sys
+import random
+import argparse
+import os.path as osp
+from datetime import date, timedelta
+
+sys.path.insert(0, osp.dirname(osp.dirname(osp.abspath(__file__))))
+
+from serie.base.paper import Paper, create_paper_from_dict  # noqa: E402
+from serie.utils.io import save_jsonl  # noqa: E402
+
+
+TASKS = [
+    "object detection", "semantic segmentation", "image classification",
+    "visual question answering", "image generation", "depth estimation",
+    "pose estimation", "image captioning", "video understanding",
+    "open-vocabulary detection", "referring segmentation", "3D point cloud "
+    "registration", "medical image segmentation", "anomaly detection",
+]
+METHODS = [
+    "a diffusion model", "a vision-language model", "a multimodal large "
+    "language model", "a lightweight transformer", "a graph neural network",
+    "a mixture of experts", "contrastive pre-training", "a state space "
+    "model", "masked autoencoders", "a dual-branch network",
+]
+SENTENCES = [
+    "{task} remains challenging due to the large variation of scenes.",
+    "Existing methods for {task} rely on costly manual annotations.",
+    "In this paper, we propose {method} for {task}.",
+    "Our approach builds on {method} and adapts it to {task}.",
+    "We introduce a new benchmark for {task} with diverse categories.",
+    "Extensive experiments show that our method outperforms the "
+    "state-of-the-art on {task} by a large margin.",
+    "We further analyze the efficiency of {method} under limited compute.",
+    "The proposed module can be plugged into {method} without retraining.",
+    "Ablation studies verify the contribution of each component.",
+    "Qualitative results show that {method} generalizes to unseen domains.",
+]
+CATEGORIES = ["cs.CV", "cs.LG", "cs.AI", "cs.CL", "cs.RO", "eess.IV"]
+NAMES = [
+    "Wei", "Li", "Anna", "Mohamed", "Sofia", "Kenji", "Lucas", "Priya",
+    "Olga", "Diego", "Hana", "Noah", "Chen", "Fatima", "Ivan", "Yuki",
+]
+START_DATE = date(2025, 3, 1)
+
+
+def synthetic_abstract(rng: random.Random, num_sentences: int = 8) -> str:
+    task = rng.choice(TASKS)
+    method = rng.choice(METHODS)
+    sentences = [
+        rng.choice(SENTENCES).format(task=task, method=method)
+        for _ in range(num_sentences)
+    ]
+    return " ".join(s[0].upper() + s[1:] for s in sentences)
+
+
+def synthetic_paper_dict(index: int, rng: random.Random) -> dict:
+    day = START_DATE + timedelta(days=index % 5)
+    arxiv_id = f"{day:%y%m}.{index:05d}"
+    abstract = synthetic_abstract(rng, rng.randint(6, 10))
+    comment = f"{rng.randint(8, 30)} pages, {rng.randint(2, 12)} figures"
+    if rng.random() < 0.3:
+        abstract += f" Code is available at https://github.com/u{index}/r."
+    elif rng.random() < 0.1:
+        comment += f". Project page: https://github.com/lab/p{index}"
+    primary = rng.choice(CATEGORIES)
+    return {
+        "url": f"http://arxiv.org/abs/{arxiv_id}v1",
+        "pdf_url": f"http://arxiv.org/pdf/{arxiv_id}v1",
+        "title": (
+            f"{rng.choice(METHODS).capitalize()} for "
+            f"{rng.choice(TASKS)}: study {index}"
+        ),
+        "authors": [
+            f"{rng.choice(NAMES)} {rng.choice(NAMES)}son"
+            for _ in range(rng.randint(2, 9))
+        ],
+        "abstract": abstract,
+        "online_date": day.isoformat(),
+        "update_date": day.isoformat(),
+        "links": [],
+        "version": "v1",
+        "comment": comment,
+        "venue": "arXiv",
+        "primary_category": primary,
+        "categories": sorted({primary, rng.choice(CATEGORIES)}),
+    }
+
+
+def synthetic_plugin_data(rng: random.Random) -> dict:
+    """
+    Plugin data as stored in `papers.jsonl` by a previous run.
+    """
+    keywords = rng.sample(["detect", "segment", "vision", "diffusion"],
+                          rng.randint(0, 2))
+    return {
+        "DefaultKeywordsFilter": {
+            "plugin_name": "DefaultKeywordsFilter",
+            "keywords": keywords, "ignorance": [],
+        },
+        "LanguageModelBasedKeywordsFilter": {
+            "plugin_name": "LanguageModelBasedKeywordsFilter",
+            "keywords": keywords[:1], "ignorance": [],
+        },
+        "Translator": {
+            "plugin_name": "Translator",
+            "translated_title": "标题", "translated_abstract": "摘要" * 80,
+        },
+    }
+
+
+def create_paper_dicts(num_papers: int,
+                       seed: int = 0,
+                       with_plugin_data: bool = False) -> list[dict]:
+    rng = random.Random(seed)
+    dicts = []
+    for i in range(num_papers):
+        data = synthetic_paper_dict(i, rng)
+        if with_plugin_data:
+            data["local_plugin_data"] = synthetic_plugin_data(rng)
+        dicts.append(data)
+    return dicts
+
+
+def create_papers(num_papers: int,
+                  seed: int = 0,
+                  with_plugin_data: bool = False) -> list[Paper]:
+    return [
+        create_paper_from_dict(d)
+        for d in create_paper_dicts(num_papers, seed, with_plugin_data)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_papers", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--with_plugin_data", action="store_true")
+    parser.add_argument("--output", default="corpus.jsonl.gz")
+    args = parser.parse_args()
+    dicts = create_paper_dicts(
+        args.num_papers, args.seed, args.with_plugin_data
+    )
+    print(save_jsonl(args.output, dicts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Timing and memory measurement of the benchmarks, and the comparison of a
+report against a stored baseline.
+"""
+import gc
+import json
+import time
+import platform
+import statistics
+import tracemalloc
+from datetime import datetime
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable
+
+from tabulate import tabulate
+
+from serie.utils.metrics import format_bytes
+
+
+@dataclass
+class Measurement:
+    """
+    Args:
+        name: Name of the benchmark, e.g., `keywords_filter[10000]`.
+        num_items: Number of items (papers, requests) processed by a run,
+            the throughput is given in items per second.
+        seconds: Wall time of every repeat.
+        peak_memory_bytes: Peak of the memory allocated by a separate run
+            traced by `tracemalloc`, None if it is not measured.
+        extra: Other measurements of the benchmark in bytes, e.g., the
+            memory kept per paper.
+    """
+    name: str
+    num_items: int
+    seconds: list[float] = field(default_factory=list)
+    peak_memory_bytes: int | None = None
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def median_seconds(self) -> float:
+        return statistics.median(self.seconds)
+
+    @property
+    def throughput(self) -> float:
+        return self.num_items / max(self.median_seconds, 1e-9)
+
+
+def measure(name: str,
+            func: Callable[[Any], Any],
+            num_items: int,
+            setup: Callable[[], Any] | None = None,
+            repeats: int = 3,
+            trace_memory: bool = True) -> Measurement:
+    """
+    Run `func(setup())` `repeats` times after a warmup run, `setup` is not
+    timed. The memory is traced by an additional run since `tracemalloc`
+    slows down the allocations.
+    """
+    def prepare():
+        return setup() if setup is not None else None
+
+    result = Measurement(name, num_items)
+    func(prepare())
+    for _ in range(repeats):
+        arg = prepare()
+        gc.collect()
+        start = time.perf_counter()
+        func(arg)
+        result.seconds.append(time.perf_counter() - start)
+    if trace_memory:
+        arg = prepare()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func(arg)
+            result.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+class Report:
+    """
+    The measurements of a run of the benchmarks.
+    """
+
+    def __init__(self, measurements: list[Measurement] | None = None):
+        self.measurements = measurements or []
+
+    def add(self, measurement: Measurement):
+        self.measurements.append(measurement)
+        print(
+            f"{measurement.name:>40}: {measurement.median_seconds:9.4f} s, "
+            f"{measurement.throughput:12,.1f} items/s, "
+            f"peak {format_bytes(measurement.peak_memory_bytes)}"
+            + "".join(
+                f", {key} {format_bytes(value)}"
+                for key, value in measurement.extra.items()
+            )
+        )
+
+    def asdict(self) -> dict:
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "benchmarks": {
+                m.name: {
+                    **asdict(m),
+                    "median_seconds": m.median_seconds,
+                    "throughput": m.throughput,
+                }
+                for m in self.measurements
+            },
+        }
+
+    def save(self, path: str):
+        with open(path, "w") as fp:
+            json.dump(self.asdict(), fp, indent=2)
+
+    def compare(self, baseline_path: str, tolerance: float = 0.2) -> int:
+        """
+        Print the ratios of the median time and the peak memory to the
+        baseline, return the number of benchmarks slower or larger than the
+        baseline by more than `tolerance`.
+        """
+        with open(baseline_path, "r") as fp:
+            baseline: dict = json.load(fp)["benchmarks"]
+        rows = []
+        num_regressions = 0
+        for m in self.measurements:
+            base = baseline.get(m.name)
+            if base is None:
+                rows.append([m.name, "-", "-", "new"])
+                continue
+            time_ratio = m.median_seconds / max(base["median_seconds"], 1e-9)
+            memory_ratio = None
+            if m.peak_memory_bytes and base.get("peak_memory_bytes"):
+                memory_ratio = m.peak_memory_bytes / base["peak_memory_bytes"]
+            regressed = (
+                time_ratio > 1 + tolerance
+                or (memory_ratio or 0) > 1 + tolerance
+            )
+            num_regressions += regressed
+            rows.append([
+                m.name,
+                f"{time_ratio:.2f}",
+                "-" if memory_ratio is None else f"{memory_ratio:.2f}",
+                "REGRESSION" if regressed else "ok",
+            ])
+        print(tabulate(
+            rows,
+            headers=["Benchmark", "Time ratio", "Memory ratio", "Status"],
+            tablefmt="pretty",
+            colalign=("left", "right", "right", "left"),
+        ))
+        return num_regressions
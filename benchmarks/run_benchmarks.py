@@ -0,0 +1,285 @@
+"""
+Benchmarks of the hot paths on a synthetic corpus, the network bound paths
+run against the local stub servers of `stub_servers.py`.
+
+Usage:
+    # Measure and store a baseline.
+    python benchmarks/run_benchmarks.py --output baseline.json
+    # Measure again and compare, exits with 1 if any benchmark regressed.
+    python benchmarks/run_benchmarks.py --baseline baseline.json
+    # A subset with the large corpus.
+    python benchmarks/run_benchmarks.py --components keywords_filter \\
+        --sizes 1000 10000 100000
+"""
+import os
+import sys
+import tracemalloc
+import logging
+import argparse
+import tempfile
+import os.path as osp
+
+sys.path.insert(0, osp.dirname(osp.dirname(osp.abspath(__file__))))
+
+import arxiv  # noqa: E402
+
+from serie.base.plugin import GlobalPluginData  # noqa: E402
+from serie.base.paper import create_paper_from_dict  # noqa: E402
+from serie.core.agent import Agent, ModelConfig, TaskMode  # noqa: E402
+from serie.core.run import check_plugin_data_class  # noqa: E402
+from serie.plugins import cvf_parser  # noqa: E402
+from serie.plugins.arxiv_parser import search  # noqa: E402
+from serie.plugins.default_keywords_filter import (  # noqa: E402
+    DefaultKeywordsFilter
+)
+from serie.plugins.markdown_table_maker import MarkdownTableMaker  # noqa: E402
+from serie.plugins.result_saver import ResultSaver  # noqa: E402
+from serie.utils.html import parse_html  # noqa: E402
+from serie.utils.io import import_config  # noqa: E402
+from serie.utils.misc import get_class_config_file_path  # noqa: E402
+
+from corpus import create_paper_dicts, create_papers  # noqa: E402
+from harness import Report, measure  # noqa: E402
+from stub_servers import (  # noqa: E402
+    ArxivStub, CVFStub, OpenAIStub, listing_page
+)
+
+
+API_KEY_ENV = "SERIE_BENCHMARK_API_KEY"
+
+
+def bench_create_paper_from_dict(report: Report, args):
+    for size in args.sizes:
+        dicts = create_paper_dicts(size, with_plugin_data=True)
+        measurement = measure(
+            f"create_paper_from_dict[{size}]",
+            lambda _: [create_paper_from_dict(d) for d in dicts],
+            size, repeats=args.repeats, trace_memory=args.trace_memory,
+        )
+        if args.trace_memory:
+            measurement.extra["bytes_per_paper"] = bytes_per_paper(dicts)
+        report.add(measurement)
+
+
+def bytes_per_paper(dicts: list[dict]) -> int:
+    """
+    The memory kept by a paper created from a dict, the dicts are built
+    beforehand so only the papers are traced.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        papers = [create_paper_from_dict(d) for d in dicts]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (after - before) // len(papers)
+
+
+def bench_paper_asdict(report: Report, args):
+    for size in args.sizes:
+        papers = check_plugin_data_class(
+            create_papers(size, with_plugin_data=True)
+        )
+        report.add(measure(
+            f"paper_asdict[{size}]",
+            lambda _: [p.asdict() for p in papers],
+            size, repeats=args.repeats, trace_memory=args.trace_memory,
+        ))
+
+
+def bench_keywords_filter(report: Report, args):
+    config = import_config(get_class_config_file_path(DefaultKeywordsFilter))
+    plugin = DefaultKeywordsFilter(**config["DefaultKeywordsFilter"])
+    for size in args.sizes:
+        report.add(measure(
+            f"keywords_filter[{size}]",
+            lambda papers: plugin.process(papers, GlobalPluginData()),
+            size,
+            setup=lambda: create_papers(size),
+            repeats=args.repeats, trace_memory=args.trace_memory,
+        ))
+
+
+def bench_result_saver(report: Report, args):
+    for size in args.sizes:
+        papers = check_plugin_data_class(
+            create_papers(size, with_plugin_data=True)
+        )
+
+        def setup():
+            directory = tempfile.mkdtemp(dir=args.work_directory)
+            saver = ResultSaver(
+                output_directory=osp.join(directory, "outputs"),
+                markdown_directory=osp.join(directory, "markdown"),
+                keywords_filter_plugin="DefaultKeywordsFilter",
+            )
+            global_plugin_data = GlobalPluginData()
+            global_plugin_data.data = {}
+            MarkdownTableMaker().process(papers, global_plugin_data)
+            return saver, global_plugin_data
+
+        report.add(measure(
+            f"result_saver[{size}]",
+            # `__call__` creates the folders of the dates first.
+            lambda arg: arg[0](papers, arg[1]),
+            size, setup=setup,
+            repeats=args.repeats, trace_memory=args.trace_memory,
+        ))
+
+
+def bench_html_parsing(report: Report, args):
+    for size in args.sizes:
+        html = listing_page([
+            (f"/content/CVPR2024/html/Paper_{i}.html", d["title"])
+            for i, d in enumerate(create_paper_dicts(size))
+        ])
+        for backend in args.html_backends:
+            report.add(measure(
+                f"html_parsing[{backend}][{size}]",
+                lambda _: parse_html(html, backend).find_all(
+                    "dt", class_="ptitle"
+                ),
+                size, repeats=args.repeats, trace_memory=args.trace_memory,
+            ))
+
+
+def bench_arxiv_search(report: Report, args):
+    num_results = args.num_requests * 10
+    with ArxivStub(num_results, latency=args.latency,
+                   error_rate=args.error_rate) as server:
+        query_url_format = arxiv.Client.query_url_format
+        arxiv.Client.query_url_format = server.query_url_format
+        try:
+            report.add(measure(
+                f"arxiv_search[{num_results}]",
+                lambda _: list(search(
+                    "cat:cs.CV", page_size=100, max_in_flight=4,
+                    delay_seconds=0.0,
+                )),
+                num_results,
+                repeats=args.repeats, trace_memory=args.trace_memory,
+            ))
+        finally:
+            arxiv.Client.query_url_format = query_url_format
+
+
+def bench_cvf_parser(report: Report, args):
+    with CVFStub(num_papers=args.num_requests, latency=args.latency,
+                 error_rate=args.error_rate) as server:
+        base_url = cvf_parser.BASE_URL
+        cvf_parser.BASE_URL = server.base_url
+
+        def setup():
+            return cvf_parser.CVFParser(
+                year=server.year,
+                conference=server.conference,
+                output_directory=tempfile.mkdtemp(dir=args.work_directory),
+                requests_per_second=0.0,
+            )
+
+        try:
+            report.add(measure(
+                f"cvf_parser[{args.num_requests}]",
+                lambda parser: parser.process([], GlobalPluginData()),
+                args.num_requests, setup=setup,
+                repeats=args.repeats, trace_memory=args.trace_memory,
+            ))
+        finally:
+            cvf_parser.BASE_URL = base_url
+
+
+def bench_agent(report: Report, args):
+    os.environ.setdefault(API_KEY_ENV, "benchmark")
+    with OpenAIStub(latency=args.latency,
+                    error_rate=args.error_rate) as server:
+        config = ModelConfig(
+            base_url=f"{server.base_url}/v1/",
+            endpoint="/v1/chat/completions",
+            model="stub",
+            api_key=API_KEY_ENV,
+            request_setting={
+                "requests_per_minute": 0,
+                "max_in_flight": 32,
+                "max_retries": 5,
+                "backoff_base_seconds": 0.01,
+                "backoff_max_seconds": 0.1,
+                "batch_poll_seconds": 0.01,
+            },
+            response_cache={"enable": False},
+        )
+        agent = Agent("stub", config=config)
+        prompts = [
+            f"Translate the abstract:\n\n{d['abstract']}"
+            for d in create_paper_dicts(args.num_requests)
+        ]
+        for mode in (TaskMode.CONCURRENT, TaskMode.BATCH):
+            report.add(measure(
+                f"agent[{mode.value}][{args.num_requests}]",
+                lambda _: agent(prompts, mode=mode),
+                args.num_requests,
+                repeats=args.repeats, trace_memory=args.trace_memory,
+            ))
+
+
+BENCHMARKS = {
+    "create_paper_from_dict": bench_create_paper_from_dict,
+    "paper_asdict": bench_paper_asdict,
+    "keywords_filter": bench_keywords_filter,
+    "result_saver": bench_result_saver,
+    "html_parsing": bench_html_parsing,
+    "arxiv_search": bench_arxiv_search,
+    "cvf_parser": bench_cvf_parser,
+    "agent": bench_agent,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--components", nargs="+", default=list(BENCHMARKS),
+                        choices=list(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", type=int,
+                        default=[1000, 10000],
+                        help="Corpus sizes of the local benchmarks.")
+    parser.add_argument("--num_requests", type=int, default=200,
+                        help="Requests sent to every stub server.")
+    parser.add_argument("--latency", type=float, default=0.01,
+                        help="Latency of the stub servers in seconds.")
+    parser.add_argument("--error_rate", type=float, default=0.05,
+                        help="Probability of a 429 of the stub servers.")
+    parser.add_argument("--html_backends", nargs="+",
+                        default=["fast", "html.parser"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no_memory", dest="trace_memory",
+                        action="store_false",
+                        help="Skip the tracemalloc runs.")
+    parser.add_argument("--output", default="",
+                        help="Save the report, e.g., as a new baseline.")
+    parser.add_argument("--baseline", default="",
+                        help="Compare the report with this baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown or growth over the baseline.")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Keep the logs of the plugins, including the "
+                        "errors of the throttled requests.")
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.ERROR)
+
+    report = Report()
+    with tempfile.TemporaryDirectory() as work_directory:
+        args.work_directory = work_directory
+        for name in args.components:
+            BENCHMARKS[name](report, args)
+    if args.output:
+        report.save(args.output)
+        print(f"Report saved to {args.output}")
+    if args.baseline:
+        num_regressions = report.compare(args.baseline, args.tolerance)
+        if num_regressions:
+            print(f"{num_regressions} benchmarks regressed.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
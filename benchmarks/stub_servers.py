@@ -0,0 +1,424 @@
+"""
+Local stand-ins of the remote services, so the network bound code paths
+can be benchmarked repeatably and offline.
+
+- `ArxivStub`: the arXiv Atom API (`/api/query` with `search_query` or
+  `id_list`, `start` and `max_results`).
+- `CVFStub`: the CVF Open Access conference, listing and paper pages.
+- `OpenAIStub`: an OpenAI compatible API, `/v1/chat/completions` and the
+  files and batches endpoints used by the batch mode of `Agent`.
+
+Every server runs in a background thread, adds `latency` seconds to every
+response and answers `429 Too Many Requests` with the probability
+`error_rate`. Use them as context managers:
+
+    with OpenAIStub(latency=0.05, error_rate=0.1) as server:
+        ...  # requests to server.base_url
+"""
+import json
+import time
+import random
+import threading
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from corpus import create_paper_dicts
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StubHTTPServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method: str):
+        stub = self.server.stub
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        stub.count_request()
+        if stub.latency > 0:
+            time.sleep(stub.latency)
+        if stub.should_throttle():
+            self.reply(429, b'{"error": "rate limited"}', "application/json",
+                       {"Retry-After": "0"})
+            return
+        url = urlparse(self.path)
+        status, content, content_type = stub.handle(
+            method, url.path, parse_qs(url.query), body
+        )
+        self.reply(status, content, content_type)
+
+    def reply(self,
+              status: int,
+              content: bytes,
+              content_type: str,
+              headers: dict[str, str] | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 refuses the bursts of concurrent clients.
+    request_queue_size = 256
+    stub: "StubServer"
+
+
+class StubServer:
+    """
+    Args:
+        latency: Seconds added to every response.
+        error_rate: Probability of answering `429 Too Many Requests`.
+        seed: Seed of the throttling decisions.
+    """
+
+    def __init__(self,
+                 latency: float = 0.0,
+                 error_rate: float = 0.0,
+                 seed: int = 0) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.num_requests = 0
+        self.num_throttled = 0
+        self.httpd: StubHTTPServer | None = None
+        self.thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        assert self.httpd is not None, "The server is not started."
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self.lock:
+            self.num_requests += 1
+
+    def should_throttle(self) -> bool:
+        with self.lock:
+            throttled = self.rng.random() < self.error_rate
+            self.num_throttled += throttled
+        return throttled
+
+    def handle(self,
+               method: str,
+               path: str,
+               query: dict[str, list[str]],
+               body: bytes) -> tuple[int, bytes, str]:
+        raise NotImplementedError
+
+    def start(self):
+        self.httpd = StubHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.httpd.stub = self
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def not_found() -> tuple[int, bytes, str]:
+    return 404, b"Not Found", "text/plain"
+
+
+class ArxivStub(StubServer):
+    """
+    Args:
+        num_results: Number of papers matching every search query.
+    """
+
+    def __init__(self, num_results: int = 1000, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.papers = create_paper_dicts(num_results)
+        self.index = {
+            d["url"].split("/abs/")[-1].split("v")[0]: d for d in self.papers
+        }
+
+    @property
+    def query_url_format(self) -> str:
+        """
+        The value of `arxiv.Client.query_url_format` to use this stub.
+        """
+        return f"{self.base_url}/api/query?{{}}"
+
+    def handle(self, method, path, query, body):
+        if path != "/api/query":
+            return not_found()
+        ids = [i for i in query.get("id_list", [""])[0].split(",") if i]
+        if ids:
+            papers = [
+                self.index[i.split("v")[0]] for i in ids
+                if i.split("v")[0] in self.index
+            ]
+        else:
+            papers = self.papers
+        start = int(query.get("start", ["0"])[0])
+        max_results = int(query.get("max_results", ["10"])[0])
+        page = papers[start:start + max_results]
+        feed = atom_feed(page, len(papers), start)
+        return 200, feed.encode("utf-8"), "application/atom+xml"
+
+
+def atom_feed(papers: list[dict], total: int, start: int) -> str:
+    entries = []
+    for d in papers:
+        authors = "".join(
+            f"<author><name>{escape(a)}</name></author>"
+            for a in d["authors"]
+        )
+        categories = "".join(
+            f'<category term="{c}" '
+            f'scheme="http://arxiv.org/schemas/atom"/>'
+            for c in d["categories"]
+        )
+        entries.append(
+            f"<entry>"
+            f"<id>{d['url']}</id>"
+            f"<updated>{d['update_date']}T12:00:00Z</updated>"
+            f"<published>{d['online_date']}T12:00:00Z</published>"
+            f"<title>{escape(d['title'])}</title>"
+            f"<summary>{escape(d['abstract'])}</summary>"
+            f"{authors}"
+            f"<arxiv:comment>{escape(d['comment'])}</arxiv:comment>"
+            f'<link href="{d["url"]}" rel="alternate" type="text/html"/>'
+            f'<link title="pdf" href="{d["pdf_url"]}" rel="related" '
+            f'type="application/pdf"/>'
+            f'<arxiv:primary_category term="{d["primary_category"]}" '
+            f'scheme="http://arxiv.org/schemas/atom"/>'
+            f"{categories}"
+            f"</entry>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom" '
+        'xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" '
+        'xmlns:arxiv="http://arxiv.org/schemas/atom">'
+        '<title>arXiv Query</title>'
+        f"<opensearch:totalResults>{total}</opensearch:totalResults>"
+        f"<opensearch:startIndex>{start}</opensearch:startIndex>"
+        f"<opensearch:itemsPerPage>{len(papers)}</opensearch:itemsPerPage>"
+        f"{''.join(entries)}"
+        "</feed>"
+    )
+
+
+class CVFStub(StubServer):
+    """
+    Serve `/{conference}{year}` and its `?day=all` listing with
+    `num_papers` papers, and their pages under `/content/`.
+    """
+
+    def __init__(self,
+                 conference: str = "CVPR",
+                 year: int = 2024,
+                 num_papers: int = 200,
+                 **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.conference = conference
+        self.year = year
+        self.papers = create_paper_dicts(num_papers)
+        self.paths = {self.paper_path(i): i for i in range(num_papers)}
+
+    def paper_path(self, index: int) -> str:
+        return (
+            f"/content/{self.conference}{self.year}/html/"
+            f"Paper_{index}_{self.conference}_{self.year}_paper.html"
+        )
+
+    def handle(self, method, path, query, body):
+        if path == f"/{self.conference}{self.year}":
+            if query.get("day") == ["all"]:
+                html = listing_page(
+                    [(self.paper_path(i), d["title"])
+                     for i, d in enumerate(self.papers)]
+                )
+            else:
+                html = (
+                    "<html><body><dl>"
+                    f'<dd><a href="/{self.conference}{self.year}?day='
+                    f'{self.year}-06-19">Day 1: {self.year}-06-19</a></dd>'
+                    f'<dd><a href="/{self.conference}{self.year}?day=all">'
+                    "All Papers</a></dd></dl></body></html>"
+                )
+            return 200, html.encode("utf-8"), "text/html"
+        if path in self.paths:
+            i = self.paths[path]
+            html = paper_page(self.papers[i], self.conference, self.year, i)
+            return 200, html.encode("utf-8"), "text/html"
+        return not_found()
+
+
+def listing_page(entries: list[tuple[str, str]]) -> str:
+    items = "".join(
+        f'<dt class="ptitle"><br><a href="{href}">{escape(title)}</a></dt>'
+        f"<dd>[<a href=\"{href.replace('html', 'papers')}\">pdf</a>]</dd>"
+        for href, title in entries
+    )
+    return (
+        "<html><head><title>Open Access</title></head><body>"
+        f'<div id="content"><dl>{items}</dl></div></body></html>'
+    )
+
+
+def paper_page(d: dict, conference: str, year: int, index: int) -> str:
+    authors = " and ".join(d["authors"])
+    bibtex = (
+        f"@InProceedings{{Paper_{index}_{year},<br>"
+        f"author = {{{authors}}},<br>"
+        f"title = {{{d['title']}}},<br>"
+        f"booktitle = {{Proceedings of {conference}}},<br>"
+        f"month = {{June}},<br>year = {{{year}}}<br>}}"
+    )
+    return (
+        "<html><head><title>Paper</title></head><body>"
+        f'<div id="papertitle">{escape(d["title"])}</div>'
+        f'<div id="authors"><i>{escape(authors)}</i></div>'
+        f'<div id="abstract">{escape(d["abstract"])}</div>'
+        f'<dd>[<a href="../papers/Paper_{index}_{conference}_{year}_'
+        f'paper.pdf">pdf</a>]</dd>'
+        f'<div class="bibref pre-white-space">{escape(bibtex)}</div>'
+        "</body></html>"
+    )
+
+
+class OpenAIStub(StubServer):
+    """
+    Args:
+        respond: Return the answer of a prompt, `"OK"` by default.
+    """
+
+    def __init__(self, respond=None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.respond = respond or (lambda prompt: "OK")
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict] = {}
+
+    def new_id(self, prefix: str) -> str:
+        with self.lock:
+            return f"{prefix}-{len(self.files) + len(self.batches)}"
+
+    def completion(self, request: dict) -> dict:
+        prompt = request["messages"][-1]["content"]
+        content = self.respond(prompt)
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", ""),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def handle(self, method, path, query, body):
+        if path.endswith("/chat/completions") and method == "POST":
+            return json_reply(self.completion(json.loads(body)))
+        if path.endswith("/files") and method == "POST":
+            file_id = self.new_id("file")
+            # The upload is a multipart form, keep the json lines only.
+            lines = [
+                line for line in body.split(b"\r\n")
+                if line.startswith(b"{")
+            ]
+            self.files[file_id] = b"\n".join(lines)
+            return json_reply(file_object(file_id, len(body)))
+        if path.endswith("/batches") and method == "POST":
+            return json_reply(self.create_batch(json.loads(body)))
+        parts = path.rstrip("/").split("/")
+        if "batches" in parts and method == "GET":
+            batch = self.batches.get(parts[-1])
+            return json_reply(batch) if batch else not_found()
+        if "files" in parts and parts[-1] == "content":
+            content = self.files.get(parts[-2])
+            if content is None:
+                return not_found()
+            return 200, content, "application/octet-stream"
+        if "files" in parts and method == "DELETE":
+            self.files.pop(parts[-1], None)
+            return json_reply(
+                {"id": parts[-1], "object": "file", "deleted": True}
+            )
+        return not_found()
+
+    def create_batch(self, request: dict) -> dict:
+        outputs = []
+        for line in self.files.get(request["input_file_id"], b"").split(b"\n"):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            outputs.append(json.dumps({
+                "id": f"response-{item['custom_id']}",
+                "custom_id": item["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "body": self.completion(item["body"]),
+                },
+            }).encode("utf-8"))
+        output_file_id = self.new_id("file")
+        self.files[output_file_id] = b"\n".join(outputs)
+        batch_id = self.new_id("batch")
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request["endpoint"],
+            "input_file_id": request["input_file_id"],
+            "completion_window": request["completion_window"],
+            "status": "completed",
+            "output_file_id": output_file_id,
+            "created_at": int(time.time()),
+        }
+        return self.batches[batch_id]
+
+
+def file_object(file_id: str, num_bytes: int) -> dict:
+    return {
+        "id": file_id,
+        "object": "file",
+        "bytes": num_bytes,
+        "created_at": int(time.time()),
+        "filename": "batch.jsonl",
+        "purpose": "batch",
+        "status": "processed",
+    }
+
+
+def json_reply(data: dict) -> tuple[int, bytes, str]:
+    return 200, json.dumps(data).encode("utf-8"), "application/json"
@@ -6,6 +6,9 @@ config = {
         "conference": "CVPR",
         "output_directory": "outputs",
         "num_requested": 10,
-        "max_retries": 10
+        "max_retries": 10,
+        "num_workers": 8,
+        "requests_per_second": 2.0,
+        "html_parser": "fast"
     }
 }
@@ -5,6 +5,8 @@ config = {
         "model": "dashscope-deepseek-v3-latest",
         "batch_mode": False,
         "concurrent_mode": True,
+        # Send every paper once with all the topics instead of once per topic.
+        "multi_topic_mode": False,
         "interested_topics": {
             "detect": "object detection task of 2D images",
             "segment": "image segmentation task of 2D images"
@@ -6,6 +6,10 @@ config = {
         "conference": "NeurIPS",
         "output_directory": "outputs",
         "num_requested": 10,
-        "max_retries": 10
+        "max_retries": 10,
+        "max_workers": 4,
+        "requests_per_second": 2.0,
+        # Keep the raw notes here and only request the modified ones later.
+        "snapshot_directory": "",
     }
 }
@@ -7,5 +7,8 @@ config = {
         "output_directory": f"{ROOT_PATH}/outputs",
         "markdown_directory": f"{ROOT_PATH}/../../Notebook/arxiv",
         "keywords_filter_plugin": "",
+        # Upsert into a SQLite paper store instead of writing papers.jsonl,
+        # e.g., f"{ROOT_PATH}/outputs/papers.sqlite3".
+        "store_path": "",
     }
 }
@@ -6,6 +6,8 @@ config = {
         "batch_mode": False,
         "concurrent_mode": True,
         "translate_all_results": False,
+        # Translate the title and the abstract of a paper by one request.
+        "combine_title_abstract": False,
         "prompt": "Directly translate the given text into Chinese. Don't output irrelevant contexts."  # noqa
     }
 }
@@ -1,11 +1,13 @@
 
 import os
+import re
 from enum import Enum
-from copy import deepcopy
 from datetime import datetime
-from dataclasses import asdict, dataclass
-from urllib.request import urlretrieve
+from functools import lru_cache
+from dataclasses import dataclass, fields, is_dataclass
 
+from serie.utils.http import HTTPCache
+from serie.utils.download import DownloadManager
 from serie.utils.logging import create_logger
 from serie.base.plugin import BasePluginData
 
@@ -13,7 +15,7 @@ from serie.base.plugin import BasePluginData
 logger = create_logger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class Author:
     """
     Representing a result's authors.
@@ -47,7 +49,7 @@ class LinkEnum(Enum):
     OTHER = "other"
 
 
-@dataclass
+@dataclass(slots=True)
 class Link:
     href: str
     title: str = ""
@@ -82,6 +84,15 @@ class Link:
 
 
 class Paper:
+    # Keys of `asdict`, which are also the keys accepted by `update`.
+    FIELDS = (
+        "url", "pdf_url", "title", "authors", "abstract", "online_date",
+        "update_date", "links", "version", "local_plugin_data", "comment",
+        "venue", "doi", "primary_category", "categories", "tags",
+        "custom_fields",
+    )
+    __slots__ = FIELDS
+
     def __init__(
             self,
             url: str | Link,
@@ -115,14 +126,10 @@ class Paper:
         self.title = title
         self.abstract = abstract
         if isinstance(online_date, str):
-            online_date = datetime.strptime(
-                online_date, "%Y-%m-%d" if online_date else ""
-            )
+            online_date = parse_date(online_date)
         self.online_date = online_date
         if isinstance(update_date, str):
-            update_date = datetime.strptime(
-                update_date, "%Y-%m-%d" if update_date else ""
-            )
+            update_date = parse_date(update_date)
         self.update_date = update_date
         self.links = [
             Link(link) if isinstance(link, str) else link for link in links
@@ -167,7 +174,17 @@ class Paper:
         data = self.local_plugin_data.get(plugin_name, default)
         return data
 
-    def download(self, link_type: LinkEnum, folder: str, filename: str = ""):
+    def download(self,
+                 link_type: LinkEnum,
+                 folder: str,
+                 filename: str = "",
+                 cache: HTTPCache | None = None,
+                 downloader: DownloadManager | None = None):
+        """
+        Download the file of `link_type` into `folder` by `downloader` (a
+        default one if not given), return the path or an empty string on
+        failure. The file is fetched through `cache` if given.
+        """
         if link_type == LinkEnum.CODE:
             raise NotImplementedError("Download code link is not implemented.")
         if link_type == LinkEnum.PDF:
@@ -182,12 +199,17 @@ class Paper:
                 )
                 return path
             logger.info(f"Downloading PDF from {link.href} to {path}")
-            downloaded, _ = urlretrieve(link.href, path)
-            return downloaded
+            downloader = downloader or DownloadManager()
+            return downloader.download(link.href, path, cache=cache)
         else:
             raise ValueError(f"Link type {link_type} is not supported.")
 
     def asdict(self):
+        """
+        Return the paper as builtin types. The lists and dicts are shared
+        with the paper instead of being copied, treat the result as
+        read-only, e.g., for serialization.
+        """
         links = [
             link if isinstance(link, str) else link.asdict()
             for link in self.links
@@ -198,12 +220,13 @@ class Paper:
             "title": self.title,
             "authors": [a.name for a in self.authors],
             "abstract": self.abstract,
-            "online_date": self.online_date.strftime("%Y-%m-%d"),
-            "update_date": self.update_date.strftime("%Y-%m-%d"),
+            "online_date": format_date(self.online_date),
+            "update_date": format_date(self.update_date),
             "links": links,
             "version": self.version,
             "local_plugin_data": {
-                k: asdict(v) for k, v in self.local_plugin_data.items()
+                k: plugin_data_asdict(v)
+                for k, v in self.local_plugin_data.items()
             },
             "comment": self.comment,
             "venue": self.venue,
@@ -213,7 +236,7 @@ class Paper:
             "tags": self.tags,
             "custom_fields": self.custom_fields,
         }
-        return deepcopy(data)
+        return data
 
     def update_authors(self, authors: str | Author | list[Author] | list[str]):
         if isinstance(authors, list):
@@ -274,7 +297,7 @@ class Paper:
             self.pdf_url.tag = LinkEnum.PDF
 
     def update(self, inputs: dict):
-        keys: list[str] = list(self.asdict().keys())
+        keys = self.FIELDS
         if isinstance(inputs, Paper):
             inputs = inputs.asdict()
         for key, val in inputs.items():
@@ -338,6 +361,42 @@ class Paper:
         return False
 
 
+@lru_cache(maxsize=4096)
+def parse_date(date: str) -> datetime:
+    # The papers of a run share a handful of dates, the parsed (immutable)
+    # datetimes are shared as well.
+    return datetime.strptime(date, "%Y-%m-%d" if date else "")
+
+
+@lru_cache(maxsize=4096)
+def format_date(date: datetime) -> str:
+    return date.strftime("%Y-%m-%d")
+
+
+@lru_cache(maxsize=None)
+def _field_names(cls) -> tuple[str, ...]:
+    return tuple(f.name for f in fields(cls))
+
+
+def plugin_data_asdict(data) -> dict:
+    """
+    Shallow counterpart of `dataclasses.asdict`, only nested dataclasses
+    are converted and the other values are shared. Plugin data loaded from
+    a file which are not converted to dataclasses yet are returned as is.
+    """
+    if isinstance(data, dict):
+        return data
+    result = {}
+    for name in _field_names(type(data)):
+        value = getattr(data, name)
+        if is_dataclass(value):
+            value = plugin_data_asdict(value)
+        elif isinstance(value, list) and value and is_dataclass(value[0]):
+            value = [plugin_data_asdict(v) for v in value]
+        result[name] = value
+    return result
+
+
 def format_valid_title(paper: Paper) -> str:
     title = (
         paper.title
@@ -351,6 +410,22 @@ def format_valid_title(paper: Paper) -> str:
     return title
 
 
+def split_arxiv_id(link: str) -> tuple[str, str]:
+    """
+    Split an arXiv url or id into the id without version and the version,
+    e.g., `http://arxiv.org/abs/2503.08507v2` -> (`2503.08507`, `v2`). The
+    version is empty if the link is not versioned.
+    """
+    link = link.strip().rstrip("/")
+    if link.endswith(".pdf"):
+        link = link[:-len(".pdf")]
+    match = re.search(r"(?:abs|pdf)/(.+)$", link)
+    paperid = match.group(1) if match else link.split("/")[-1]
+    match = re.match(r"^(.+?)(v\d+)?$", paperid)
+    assert match is not None
+    return match.group(1), match.group(2) or ""
+
+
 def create_paper_from_dict(data: dict):
     url = data.get("url", "")
     if not isinstance(url, dict):
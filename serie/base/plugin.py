@@ -1,11 +1,18 @@
 
+import json
+import hashlib
 from enum import Enum
 from abc import ABC, abstractmethod
+from typing import Iterable, Iterator
 from dataclasses import dataclass, field
 from serie.utils.logging import create_logger
+from serie.utils.metrics import RUN_METRICS, PluginMetrics
 
 
 logger = create_logger(__name__)
+# Name of the `BaseKeywordsFilterData` of any keywords filter in `reads` and
+# `writes`, for the plugins depending on whichever filter ran before.
+KEYWORDS_FILTER_DATA = "keywords_filter_data"
 
 
 class PluginStatus(Enum):
@@ -16,12 +23,31 @@ class PluginStatus(Enum):
     SKIPPED = "skipped"
 
 
+class ExecutionMode(Enum):
+    """
+    How a plugin runs when the pipeline is executed in streaming mode.
+
+    - BARRIER: `process` needs all the papers at once.
+    - PER_PAPER: the papers are processed independently, every chunk is
+        given to the plugin as soon as it arrives.
+    - PER_BATCH: the papers are processed independently, but the plugin
+        prefers large batches (e.g., concurrent model requests), the chunks
+        are merged into batches first.
+    """
+    BARRIER = "barrier"
+    PER_PAPER = "per_paper"
+    PER_BATCH = "per_batch"
+
+
 @dataclass
 class BasePluginData:
     plugin_name: str
     type: str = "local"
     save_as_item: bool = False
     save_as_text: bool = False
+    # Written by the plugins tracking the papers, see `BasePlugin`.
+    status: str = ""
+    fingerprint: str = ""
 
     def string_for_saving(self, *args, **kwargs) -> str:
         return ""
@@ -33,6 +59,38 @@ class GlobalPluginData:
 
 
 class BasePlugin(ABC):
+    """
+    The base class of the plugins.
+
+    A plugin processing every paper independently may set `track_papers`.
+    After `process`, the plugin data (named by `plugin_data_name`) of every
+    successfully processed paper is stamped with the DONE status and the
+    fingerprint of its inputs (`paper_fingerprint`). On the next run only
+    the papers which are not stamped, or whose inputs changed, are given to
+    `process`, and the plugin is DONE once all the papers requiring
+    processing are. Such a plugin must update the papers in place. The data
+    saved before the papers were tracked has no status, it is stamped with
+    the current inputs at the start of `run` if `paper_succeeded`.
+
+    A plugin whose `execution_mode` is not BARRIER may run concurrently
+    with its neighbours in a streaming pipeline, see `stream`. A plugin whose
+    mode depends on its arguments overrides `resolve_execution_mode`.
+
+    A plugin declaring `reads` and `writes` may run concurrently with the
+    neighbours it does not conflict with, see `serie.core.schedule`. They
+    name the paper fields (e.g., `title`) and the local or global plugin
+    data (e.g., `Translator`) the plugin reads and writes. Such a plugin
+    must update the papers in place and keep the list of papers unchanged.
+    The plugins running concurrently add their data to the same papers,
+    iterate over a copy of `paper.local_plugin_data`.
+
+    Every call is measured into `metrics`, see `serie.utils.metrics`.
+    """
+    track_papers: bool = False
+    execution_mode: ExecutionMode = ExecutionMode.BARRIER
+    reads: tuple[str, ...] | None = None
+    writes: tuple[str, ...] | None = None
+
     def __init__(self,
                  overwrite: bool = False,
                  version: str = "",
@@ -42,15 +100,135 @@ class BasePlugin(ABC):
         self.dependencies = dependencies or []
         self.overwrite = overwrite
         self.status = PluginStatus.TODO
+        self.metrics = PluginMetrics(type(self).__name__)
+
+    @classmethod
+    def resolve_execution_mode(cls, **kwargs) -> ExecutionMode:
+        """
+        Return the execution mode of a plugin created with the arguments
+        `kwargs`, which are the arguments of `__init__` that are set.
+        """
+        return cls.execution_mode
 
     @abstractmethod
     def process(self, papers, global_plugin_data: GlobalPluginData):
         raise NotImplementedError("process method is not implemented")
 
+    def stream(self,
+               batches: Iterable[list],
+               global_plugin_data: GlobalPluginData) -> Iterator[list]:
+        """
+        Process the papers batch by batch in a streaming pipeline. Every
+        batch goes through `__call__`, a source plugin may override it to
+        yield its papers as they arrive.
+        """
+        for batch in batches:
+            self.status = PluginStatus.TODO
+            yield self(batch, global_plugin_data)
+
+    def measure_stream(
+            self, outputs: Iterator[tuple[int, list]]) -> Iterator[list]:
+        """
+        Yield the batches of an override of `stream` which does not go
+        through `__call__`. `outputs` yields the number of papers consumed
+        and the batch produced, the production of every batch is measured
+        into `metrics` like a call.
+        """
+        self.status = PluginStatus.RUNNING
+        while True:
+            with RUN_METRICS.measure(self.metrics, 0) as metrics:
+                metrics.status = PluginStatus.RUNNING.value
+                try:
+                    output = next(outputs, None)
+                except Exception:
+                    metrics.status = PluginStatus.ERROR.value
+                    raise
+                if output is None:
+                    self.status = PluginStatus.DONE
+                    metrics.status = self.status.value
+                    return
+                metrics.papers_in += output[0]
+                metrics.papers_out += len(output[1])
+            yield output[1]
+
     def check_status(self, papers, global_plugin_data: GlobalPluginData):
-        pass
+        if not self.track_papers:
+            return
+        for paper in papers:
+            if self.requires_processing(paper) and not self.paper_done(paper):
+                self.status = PluginStatus.TODO
+                return
+        self.status = PluginStatus.DONE
+
+    def requires_processing(self, paper) -> bool:
+        return True
+
+    def plugin_data_name(self) -> str:
+        return type(self).__name__
+
+    def paper_fingerprint(self, paper) -> str:
+        return fingerprint(self.version, paper.title, paper.abstract)
+
+    def paper_succeeded(self, paper, plugin_data: BasePluginData) -> bool:
+        return True
+
+    def paper_done(self, paper) -> bool:
+        data = paper.get_plugin_data(self.plugin_data_name())
+        if not isinstance(data, BasePluginData):
+            return False
+        return (
+            data.status == PluginStatus.DONE.value
+            and data.fingerprint == self.paper_fingerprint(paper)
+        )
+
+    def pending_papers(self, papers) -> list:
+        if self.overwrite:
+            return list(papers)
+        return [
+            p for p in papers
+            if not (self.requires_processing(p) and self.paper_done(p))
+        ]
+
+    def stamp_untracked_papers(self, papers):
+        """
+        Stamp the data saved before the papers were tracked, the results
+        which `paper_succeeded` are kept rather than paid for again.
+        """
+        for paper in papers:
+            data = paper.get_plugin_data(self.plugin_data_name())
+            if not isinstance(data, BasePluginData) or data.status:
+                continue
+            if self.paper_succeeded(paper, data):
+                data.status = PluginStatus.DONE.value
+                data.fingerprint = self.paper_fingerprint(paper)
+
+    def mark_papers_done(self, papers):
+        for paper in papers:
+            data = paper.get_plugin_data(self.plugin_data_name())
+            if not isinstance(data, BasePluginData):
+                continue
+            if not self.requires_processing(paper):
+                continue
+            if self.paper_succeeded(paper, data):
+                data.status = PluginStatus.DONE.value
+                data.fingerprint = self.paper_fingerprint(paper)
 
     def __call__(self, papers, global_plugin_data: GlobalPluginData):
+        with RUN_METRICS.measure(self.metrics, len(papers)) as metrics:
+            metrics.status = PluginStatus.RUNNING.value
+            try:
+                papers = self.run(papers, global_plugin_data)
+            except Exception:
+                metrics.status = PluginStatus.ERROR.value
+                raise
+            if metrics.status == PluginStatus.RUNNING.value:
+                metrics.status = self.status.value
+            metrics.papers_out += len(papers)
+        return papers
+
+    def run(self, papers, global_plugin_data: GlobalPluginData):
+        if self.track_papers:
+            self.stamp_untracked_papers(papers)
         self.check_status(papers, global_plugin_data)
         if self.status == PluginStatus.DONE:
             if not self.overwrite:
@@ -58,6 +236,7 @@ class BasePlugin(ABC):
                     "Plugin status is DONE and overwrite is False. "
                     "Skipping processing."
                 )
+                self.metrics.status = PluginStatus.SKIPPED.value
                 return papers
             else:
                 logger.warning(
@@ -65,7 +244,16 @@ class BasePlugin(ABC):
                     "Processing again."
                 )
         self.status = PluginStatus.RUNNING
-        papers = self.process(papers, global_plugin_data)
+        if self.track_papers:
+            pending = self.pending_papers(papers)
+            logger.info(
+                f"{len(pending)} of {len(papers)} papers are not processed "
+                f"by {self.plugin_data_name()} with the same inputs."
+            )
+            self.process(pending, global_plugin_data)
+            self.mark_papers_done(pending)
+        else:
+            papers = self.process(papers, global_plugin_data)
         self.status = PluginStatus.DONE
         return papers
 
@@ -78,3 +266,13 @@ class BaseKeywordsFilterData(BasePluginData):
 
     def string_for_saving(self, *args, **kwargs) -> str:
         return f"- keywords: {', '.join(self.keywords)}"
+
+
+def fingerprint(*items) -> str:
+    """
+    A short, stable hash of JSON serializable items.
+    """
+    serialized = json.dumps(
+        items, sort_keys=True, ensure_ascii=False, default=str
+    ).encode("utf-8")
+    return hashlib.sha256(serialized).hexdigest()[:16]
@@ -0,0 +1,442 @@
+import os
+import json
+import shutil
+import sqlite3
+import hashlib
+import threading
+import os.path as osp
+from time import time
+from typing import Callable, Iterable, Iterator
+from urllib.parse import parse_qs, urlparse
+
+from serie.utils.logging import create_logger
+from serie.utils.download import is_complete_pdf
+from serie.base.paper import (
+    Paper, create_paper_from_dict, format_valid_title, split_arxiv_id
+)
+
+
+logger = create_logger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    paper_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    title TEXT NOT NULL,
+    venue TEXT NOT NULL,
+    online_date TEXT NOT NULL,
+    update_date TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (paper_id, version)
+);
+CREATE INDEX IF NOT EXISTS idx_papers_update_date ON papers (update_date);
+CREATE INDEX IF NOT EXISTS idx_papers_venue ON papers (venue);
+CREATE TABLE IF NOT EXISTS paper_keywords (
+    paper_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    plugin_name TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    ignored INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (paper_id, version, plugin_name, keyword)
+);
+CREATE INDEX IF NOT EXISTS idx_paper_keywords_keyword
+    ON paper_keywords (keyword);
+"""
+
+
+class PaperStore:
+    """
+    A persistent paper store backed by SQLite in WAL mode.
+
+    Papers are keyed by their normalized id (see `normalize_paper_id`) and
+    version, the full `Paper.asdict()` is kept as JSON and only hydrated into
+    `Paper` objects when iterated.
+
+    Examples:
+        >>> with PaperStore("outputs/papers.sqlite3") as store:
+        ...     store.upsert(papers)
+        ...     for paper in store.query(keyword="detect"):
+        ...         print(paper.title)
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        folder = osp.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def upsert(self, papers: Iterable[Paper | dict]) -> int:
+        """
+        Insert or replace the papers, return the number of papers written.
+        """
+        rows = []
+        keywords = []
+        for paper in papers:
+            data = paper.asdict() if isinstance(paper, Paper) else paper
+            paper_id, version = normalize_paper_id(data)
+            rows.append((
+                paper_id, version, data["title"], data["venue"],
+                data["online_date"], data["update_date"], json.dumps(data),
+            ))
+            keywords.extend(
+                (paper_id, version, name, keyword, ignored)
+                for name, keyword, ignored in collect_keywords(data)
+            )
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO papers (paper_id, version, title, venue, "
+                "online_date, update_date, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (paper_id, version) DO UPDATE SET "
+                "title = excluded.title, venue = excluded.venue, "
+                "online_date = excluded.online_date, "
+                "update_date = excluded.update_date, data = excluded.data",
+                rows,
+            )
+            self.connection.executemany(
+                "DELETE FROM paper_keywords "
+                "WHERE paper_id = ? AND version = ?",
+                [row[:2] for row in rows],
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO paper_keywords "
+                "(paper_id, version, plugin_name, keyword, ignored) "
+                "VALUES (?, ?, ?, ?, ?)",
+                keywords,
+            )
+        logger.info(f"Upserted {len(rows)} papers into {self.path}")
+        return len(rows)
+
+    def query(self,
+              start_date: str = "",
+              end_date: str = "",
+              venue: str = "",
+              keyword: str = "",
+              plugin_name: str = "",
+              include_ignored: bool = False) -> Iterator[Paper]:
+        """
+        Lazily yield the papers matching all the given conditions.
+
+        Args:
+            start_date: Inclusive lower bound of `update_date`, `%Y-%m-%d`.
+            end_date: Exclusive upper bound of `update_date`, `%Y-%m-%d`.
+            venue: Exact venue of the papers.
+            keyword: Keyword assigned by a keywords filter plugin.
+            plugin_name: Restrict `keyword` to the given plugin.
+            include_ignored: Whether to keep the papers whose `keyword` is
+                also in the ignorance list of the plugin.
+        """
+        sql = "SELECT p.data FROM papers AS p"
+        conditions: list[str] = []
+        params: list[str] = []
+        if keyword:
+            sql += (
+                " JOIN paper_keywords AS k"
+                " ON k.paper_id = p.paper_id AND k.version = p.version"
+            )
+            conditions.append("k.keyword = ?")
+            params.append(keyword)
+            if plugin_name:
+                conditions.append("k.plugin_name = ?")
+                params.append(plugin_name)
+            if not include_ignored:
+                conditions.append("k.ignored = 0")
+        if start_date:
+            conditions.append("p.update_date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("p.update_date < ?")
+            params.append(end_date)
+        if venue:
+            conditions.append("p.venue = ?")
+            params.append(venue)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        # A keyword may be assigned by several plugins, grouping yields every
+        # paper once.
+        sql += " GROUP BY p.paper_id, p.version ORDER BY p.rowid"
+        for (data,) in self.connection.execute(sql, params):
+            yield create_paper_from_dict(json.loads(data))
+
+    def get(self, paper_id: str, version: str = "") -> Paper | None:
+        """
+        Return the paper with the given normalized id, the latest stored
+        version is returned if `version` is not given.
+        """
+        if version:
+            row = self.connection.execute(
+                "SELECT data FROM papers WHERE paper_id = ? AND version = ?",
+                (paper_id, version),
+            ).fetchone()
+        else:
+            row = self.connection.execute(
+                "SELECT data FROM papers WHERE paper_id = ? "
+                "ORDER BY CAST(SUBSTR(version, 2) AS INTEGER) DESC LIMIT 1",
+                (paper_id,),
+            ).fetchone()
+        return create_paper_from_dict(json.loads(row[0])) if row else None
+
+    def contains(self, paper: Paper) -> bool:
+        paper_id, version = normalize_paper_id(paper.asdict())
+        row = self.connection.execute(
+            "SELECT 1 FROM papers WHERE paper_id = ? AND version = ?",
+            (paper_id, version),
+        ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM papers"
+        ).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+PDF_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS papers (
+    paper_id TEXT NOT NULL,
+    version TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (paper_id, version)
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    path TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+"""
+
+
+class PDFStore:
+    """
+    A content-addressed store of PDFs shared by the downloaders.
+
+    Every PDF is kept once under `<directory>/blobs`, named by the sha256 of
+    its content. An SQLite index maps the normalized paper id and version
+    (see `normalize_paper_id`) and the PDF url to the blob, so a paper known
+    to the index is never downloaded again, even if its title changed or it
+    is requested by another venue with the same PDF url. The human-readable
+    files in the download folders are hardlinks (or symlinks) of the blobs.
+
+    Args:
+        directory: The root directory of the blobs and the index.
+        link_mode: `hardlink` or `symlink`. A hardlink falls back to a
+            symlink if the folders are on different file systems.
+    """
+
+    def __init__(self, directory: str, link_mode: str = "hardlink") -> None:
+        if link_mode not in ("hardlink", "symlink"):
+            raise ValueError(f"Unknown link mode: {link_mode}")
+        self.directory = directory
+        self.link_mode = link_mode
+        self.blob_directory = osp.join(directory, "blobs")
+        self.tmp_directory = osp.join(directory, "tmp")
+        os.makedirs(self.blob_directory, exist_ok=True)
+        os.makedirs(self.tmp_directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.paper_locks: dict[tuple[str, str], threading.Lock] = {}
+        # The downloaders fetch the PDFs concurrently, all the threads share
+        # the connection under the lock.
+        self.connection = sqlite3.connect(
+            osp.join(directory, "index.sqlite3"), check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(PDF_STORE_SCHEMA)
+
+    def blob_path(self, digest: str) -> str:
+        return osp.join(self.blob_directory, digest[:2], f"{digest}.pdf")
+
+    def lookup(self, paper_id: str, version: str, url: str = "") -> str:
+        """
+        Return the digest of the blob of the paper, or of the url if the
+        paper is unknown. An empty string means the PDF is not stored.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT digest FROM papers WHERE paper_id = ? AND version = ?",
+                (paper_id, version),
+            ).fetchone()
+            if row is None and url:
+                row = self.connection.execute(
+                    "SELECT digest FROM urls WHERE url = ?", (url,)
+                ).fetchone()
+        if row is None or not osp.exists(self.blob_path(row[0])):
+            return ""
+        return row[0]
+
+    def ingest(self, path: str, paper_id: str, version: str,
+               url: str = "") -> str:
+        """
+        Move the file at `path` into the store, return its digest. The file
+        is dropped if an identical blob is already stored.
+        """
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1 << 20), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        blob_path = self.blob_path(digest)
+        size = os.path.getsize(path)
+        if osp.exists(blob_path):
+            os.remove(path)
+        else:
+            os.makedirs(osp.dirname(blob_path), exist_ok=True)
+            shutil.move(path, blob_path)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO blobs (digest, size, created_at) "
+                "VALUES (?, ?, ?)", (digest, size, time()),
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO papers (paper_id, version, digest) "
+                "VALUES (?, ?, ?)", (paper_id, version, digest),
+            )
+            if url:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO urls (url, digest) VALUES (?, ?)",
+                    (url, digest),
+                )
+        return digest
+
+    def link(self, digest: str, path: str) -> str:
+        """
+        Make `path` point to the blob, return `path`.
+        """
+        blob_path = self.blob_path(digest)
+        folder = osp.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        linked = False
+        if self.link_mode == "hardlink":
+            try:
+                os.link(blob_path, path)
+                linked = True
+            except OSError as e:
+                logger.warning(f"Failed to hardlink {path}: {e}, symlink it.")
+        if not linked:
+            os.symlink(osp.abspath(blob_path), path)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO links (path, digest) VALUES (?, ?)",
+                (osp.abspath(path), digest),
+            )
+        return path
+
+    def is_linked(self, digest: str, path: str) -> bool:
+        try:
+            return osp.samefile(self.blob_path(digest), path)
+        except OSError:
+            return False
+
+    def fetch(self,
+              paper: Paper,
+              folder: str,
+              download: Callable[[str], str]) -> str:
+        """
+        Place the PDF of `paper` into `folder` under its title and return the
+        path, or an empty string on failure. `download(path)` is only called
+        if the store has no blob of the paper, it should write the PDF to
+        `path` and return `path` on success.
+        """
+        paper_id, version = normalize_paper_id(
+            {"url": paper.url.href, "version": paper.version}
+        )
+        url = paper.pdf_url.href
+        with self.paper_lock(paper_id, version):
+            digest = self.lookup(paper_id, version, url)
+            if digest:
+                logger.info(f"Found the PDF of {paper_id} {version} in store.")
+            else:
+                name = hashlib.sha1(f"{paper_id}#{version}".encode())
+                # A stable temporary name lets an interrupted download resume.
+                tmp_path = osp.join(
+                    self.tmp_directory, f"{name.hexdigest()}.pdf"
+                )
+                # A download left by an interrupted run is reused only if it
+                # is a complete PDF, the blobs are never re-downloaded.
+                if osp.exists(tmp_path) and not is_complete_pdf(tmp_path):
+                    logger.warning(f"Discard the incomplete PDF {tmp_path}.")
+                    os.remove(tmp_path)
+                if not osp.exists(tmp_path) and not download(tmp_path):
+                    return ""
+                if not is_complete_pdf(tmp_path):
+                    logger.error(f"The PDF of {paper_id} is incomplete.")
+                    os.remove(tmp_path)
+                    return ""
+                digest = self.ingest(tmp_path, paper_id, version, url)
+        path = osp.join(folder, f"{format_valid_title(paper)}.pdf")
+        if osp.lexists(path) and not self.is_linked(digest, path):
+            path = path.replace(".pdf", f" @ {paper.version}.pdf")
+        if self.is_linked(digest, path):
+            return path
+        if osp.lexists(path):
+            logger.warning(f"File {path} already exists, skip linking.")
+            return path
+        return self.link(digest, path)
+
+    def paper_lock(self, paper_id: str, version: str) -> threading.Lock:
+        with self.lock:
+            key = (paper_id, version)
+            if key not in self.paper_locks:
+                self.paper_locks[key] = threading.Lock()
+            return self.paper_locks[key]
+
+    def close(self):
+        self.connection.close()
+
+
+def normalize_paper_id(data: dict) -> tuple[str, str]:
+    """
+    Return the normalized id and the version of a paper given by
+    `Paper.asdict()`, e.g., `arxiv:2503.08507`, `openreview:<note id>` or
+    `cvf:<page name>`. Other sources fall back to the url.
+    """
+    url = data["url"]
+    if isinstance(url, dict):
+        url = url["href"]
+    version = data.get("version", "") or "v1"
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if "arxiv.org" in host:
+        paper_id, url_version = split_arxiv_id(url)
+        return f"arxiv:{paper_id}", url_version or version
+    if "openreview.net" in host:
+        note_id = parse_qs(parsed.query).get("id", [""])[0]
+        if note_id:
+            return f"openreview:{note_id}", version
+    if "thecvf.com" in host:
+        name = osp.splitext(osp.basename(parsed.path))[0]
+        return f"cvf:{name}", version
+    return url, version
+
+
+def collect_keywords(data: dict) -> Iterator[tuple[str, str, int]]:
+    """
+    Yield (plugin name, keyword, ignored) of the keywords filter plugins.
+    """
+    for name, plugin_data in data.get("local_plugin_data", {}).items():
+        if not isinstance(plugin_data, dict):
+            continue
+        ignorance = set(plugin_data.get("ignorance", []) or [])
+        for keyword in plugin_data.get("keywords", []) or []:
+            yield name, keyword, int(keyword in ignorance)
@@ -49,6 +49,64 @@ class Configs:
                 "If set to `True`, the existing files will be overwritten."
             )
         })
+    resume: bool = field(
+        default=DEFAULT.get('resume', False),
+        metadata={
+            "help": (
+                "Whether to resume the pipeline from the checkpoint taken "
+                "after the last finished plugin of a previous run."
+            )
+        })
+    metrics_history_file: str = field(
+        default=DEFAULT.get('metrics_history_file', ""),
+        metadata={
+            "help": (
+                "If set, the metrics of every run (see `run_metrics.json` "
+                "under `output_directory`) are appended to this json lines "
+                "file for trend comparison."
+            )
+        })
+    trace_memory: bool = field(
+        default=DEFAULT.get('trace_memory', False),
+        metadata={
+            "help": (
+                "Whether to trace the peak memory of every plugin with "
+                "`tracemalloc`, which slows down the run."
+            )
+        })
+    streaming: bool = field(
+        default=DEFAULT.get('streaming', False),
+        metadata={
+            "help": (
+                "Whether to run the consecutive per-paper and per-batch "
+                "plugins concurrently, passing the papers in batches."
+            )
+        })
+    max_parallel_plugins: int = field(
+        default=DEFAULT.get('max_parallel_plugins', 1),
+        metadata={
+            "help": (
+                "Maximum number of plugins running concurrently. If greater "
+                "than 1, the consecutive plugins declaring what they read "
+                "and write run concurrently unless they conflict."
+            )
+        })
+    stream_batch_size: int = field(
+        default=DEFAULT.get('stream_batch_size', 64),
+        metadata={
+            "help": (
+                "Number of papers of a batch given to the per-batch plugins "
+                "in streaming mode."
+            )
+        })
+    stream_queue_size: int = field(
+        default=DEFAULT.get('stream_queue_size', 8),
+        metadata={
+            "help": (
+                "Maximum number of batches waiting between two plugins in "
+                "streaming mode."
+            )
+        })
 
     def __post_init__(self):
         self.datetime = parse_date(self.datetime)
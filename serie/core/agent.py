@@ -1,22 +1,31 @@
 
 import os
 import json
+import random
+import asyncio
+import sqlite3
 import hashlib
+import threading
+import os.path as osp
 from enum import Enum
-from time import sleep, time
+from time import monotonic, sleep, time
 from dataclasses import dataclass
-from concurrent.futures import ThreadPoolExecutor
 
-from openai import OpenAI
-from tabulate import tabulate
+import openai
+from openai import AsyncOpenAI, OpenAI
 from openai.types.chat.chat_completion import ChatCompletion
 
+from serie.base.constants import ROOT_PATH
 from serie.utils.misc import get_class_config_file_path
 from serie.utils.logging import create_logger
+from serie.utils.metrics import count
 from serie.utils.io import load_jsonl, save_jsonl, import_config
 
 
 logger = create_logger(__name__, auto_setup_fmt=True)
+DEFAULT_RESPONSE_CACHE_PATH = osp.join(
+    ROOT_PATH, "outputs", "agent_response_cache.sqlite3"
+)
 
 
 class TaskMode(Enum):
@@ -33,10 +42,12 @@ class ModelConfig:
     api_key: str = ""
     model_kwargs: dict | None = None
     request_setting: dict | None = None
+    response_cache: dict | None = None
 
     def __post_init__(self):
         self.model_kwargs = self.model_kwargs or {}
         self.request_setting = self.request_setting or {}
+        self.response_cache = self.response_cache or {}
 
 
 @dataclass
@@ -65,11 +76,263 @@ class History:
         return [m.todict() for m in self.messages] if self.messages else []
 
 
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled continuously at `rate_per_minute`
+    and holding at most `burst_seconds` worth of tokens, so no window of the
+    provider sees more than the configured rate.
+
+    `reserve` never blocks, it takes the tokens (possibly going into debt)
+    and returns how long the caller has to wait before using them, so the
+    same bucket can be awaited by coroutines and slept on by threads.
+    """
+
+    def __init__(self,
+                 rate_per_minute: float,
+                 burst_seconds: float = 1.0) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated_at = monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.rate,
+            )
+            self.updated_at = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """
+        Take `amount` more tokens (or give them back if negative) once the
+        real cost of a reserved request is known.
+        """
+        if self.rate <= 0:
+            return
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """
+    Admit requests under both the requests per minute and the tokens per
+    minute limits. A non-positive limit is disabled.
+    """
+
+    def __init__(self,
+                 requests_per_minute: float,
+                 tokens_per_minute: float = 0) -> None:
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def reserve(self, num_tokens: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(num_tokens))
+
+    def adjust(self, num_tokens: int):
+        self.tokens.adjust(num_tokens)
+
+
+RATE_LIMITERS: dict[str, RateLimiter] = {}
+RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(key: str,
+                     requests_per_minute: float,
+                     tokens_per_minute: float = 0) -> RateLimiter:
+    """
+    Return the limiter shared by all the agents requesting the same model of
+    the same provider, e.g., Translator and the language model based keywords
+    filter of a pipeline.
+    """
+    with RATE_LIMITERS_LOCK:
+        if key not in RATE_LIMITERS:
+            RATE_LIMITERS[key] = RateLimiter(
+                requests_per_minute, tokens_per_minute
+            )
+        return RATE_LIMITERS[key]
+
+
+def estimate_tokens(messages: list[dict], model_kwargs: dict) -> int:
+    """
+    A rough estimation of the tokens used by a request: about 4 characters
+    per prompt token plus an equally long completion. It is corrected with
+    the reported usage once the response arrives.
+    """
+    prompt = sum(len(m["content"]) for m in messages) // 4 + 1
+    completion = min(prompt, model_kwargs.get("max_tokens") or prompt)
+    return prompt + completion
+
+
+def count_usage(usage) -> None:
+    """
+    Count the tokens reported by a completion, `usage` is None if the
+    server doesn't report them.
+    """
+    if usage is None:
+        return
+    count("prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0)
+    count("completion_tokens", getattr(usage, "completion_tokens", 0) or 0)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Rate limits, server errors, connection errors and invalid responses are
+    retried, the other client errors would fail again.
+    """
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return True
+
+
+def backoff_delay(error: Exception,
+                  attempt: int,
+                  request_setting: dict) -> float:
+    """
+    Exponential backoff with full jitter, `Retry-After` of the server is
+    honored when it is given.
+    """
+    if isinstance(error, openai.APIStatusError):
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            return float(retry_after)  # type: ignore
+        except (TypeError, ValueError):
+            pass
+    base = request_setting.get("backoff_base_seconds", 1.0)
+    cap = request_setting.get("backoff_max_seconds", 60.0)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ResponseCache:
+    """
+    A persistent, size-bounded cache of the model responses, keyed by the
+    sha256 of (model, messages, model_kwargs) and stored in SQLite.
+
+    Args:
+        path: The SQLite database file.
+        max_entries: The least recently used entries are evicted once the
+            cache holds more entries. A non-positive value means unbounded.
+        ttl: Seconds an entry stays valid, None means it never expires.
+    """
+
+    def __init__(self,
+                 path: str = DEFAULT_RESPONSE_CACHE_PATH,
+                 max_entries: int = 100000,
+                 ttl: float | None = None) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+        self.lock = threading.Lock()
+        folder = osp.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # The agent completes the messages concurrently, all the threads
+        # share the connection under the lock.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed_at "
+            "ON responses (accessed_at)"
+        )
+
+    @staticmethod
+    def make_key(model: str, messages: list[dict], model_kwargs: dict) -> str:
+        serialized = json.dumps(
+            {"model": model, "messages": messages, "kwargs": model_kwargs},
+            sort_keys=True, ensure_ascii=False,
+        ).encode("utf-8")
+        return hashlib.sha256(serialized).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT content, created_at FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is not None and (
+                    self.ttl is not None and now - row[1] >= self.ttl):
+                with self.connection:
+                    self.connection.execute(
+                        "DELETE FROM responses WHERE key = ?", (key,)
+                    )
+                row = None
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (now, key),
+                )
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, key: str, content: str):
+        now = time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, content, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            if self.max_entries > 0:
+                self.connection.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed_at DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
+
+
 class Agent:
-    def __init__(self, model: str):
-        configs = import_config(get_class_config_file_path(self.__class__))
+    """
+    Args:
+        model: The key of the model in `configs/core/agent.py`.
+        bypass_cache: If True, always request the model and don't read the
+            response cache, the new responses are still written to it. The
+            cache is configured by the `response_cache` of the model config,
+            e.g., `{"path": ..., "max_entries": 100000, "ttl": None}`, and
+            `{"enable": False}` disables it.
+        config: If set, it is used instead of the config of `model` in
+            `configs/core/agent.py`, e.g., to use a local server.
+
+    The `request_setting` of the model config supports `requests_per_minute`,
+    `tokens_per_minute` (0 disables the limit), `max_in_flight` (concurrent
+    requests of the concurrent mode), `max_retries`, `backoff_base_seconds`,
+    `backoff_max_seconds` and `batch_poll_seconds` (interval of polling the
+    status of a batch job).
+    """
+
+    def __init__(self,
+                 model: str,
+                 bypass_cache: bool = False,
+                 config: ModelConfig | None = None):
         self.model = model
-        self.config = ModelConfig(**configs.get(model, {}))
+        if config is None:
+            configs = import_config(
+                get_class_config_file_path(self.__class__)
+            )
+            config = ModelConfig(**configs.get(model, {}))
+        self.config = config
         logger.info(f"Creating agent with config:\n{str(self.config)}")
         self.client = OpenAI(
             api_key=os.environ.get(self.config.api_key, None),
@@ -77,6 +340,18 @@ class Agent:
         )
         logger.info(f"Agent created with model {self.config.model}")
         self.history = History()
+        self.bypass_cache = bypass_cache
+        cache_config = dict(self.config.response_cache or {})
+        self.cache = (
+            ResponseCache(**cache_config)
+            if cache_config.pop("enable", True) else None
+        )
+        request_setting = self.config.request_setting or {}
+        self.rate_limiter = get_rate_limiter(
+            f"{self.config.base_url}#{self.config.model}",
+            request_setting.get("requests_per_minute", 64),
+            request_setting.get("tokens_per_minute", 0),
+        )
 
     def append(self, role: str, content: str):
         self.history.append(role=role, content=content)
@@ -107,6 +382,7 @@ class Agent:
                         message: str,
                         include_history: bool = False,
                         stream: bool = False,
+                        read_cache: bool = True,
                         **kwargs) -> str:
         self.client: OpenAI
         messages = self.history.tolist() if include_history else []
@@ -114,9 +390,25 @@ class Agent:
         model_kwarg = self.config.model_kwargs or {}
         model_kwarg.update(kwargs)
         request_setting = self.config.request_setting or {}
+        key = None
+        if self.cache is not None and not stream:
+            key = self.cache.make_key(
+                self.config.model, messages, model_kwarg
+            )
+            content = None
+            if read_cache and not self.bypass_cache:
+                content = self.cache.get(key)
+            if content is not None:
+                count("llm_cached_responses")
+                self.history.append(role="user", content=message)
+                self.history.append(role="assistant", content=content)
+                return content
         content = ""
         N = request_setting.get("max_retries", 0) + 1
         for i in range(N):
+            estimated = estimate_tokens(messages, model_kwarg)
+            sleep(self.rate_limiter.reserve(estimated))
+            count("llm_requests")
             try:
                 response: ChatCompletion = self.client.chat.completions.create(
                     messages=messages,  # type: ignore # openai handles this
@@ -124,6 +416,11 @@ class Agent:
                     stream=stream,
                     **model_kwarg,
                 )
+                if getattr(response, "usage", None) is not None:
+                    self.rate_limiter.adjust(
+                        response.usage.total_tokens - estimated
+                    )
+                    count_usage(response.usage)
                 content = response.choices[0].message.content
                 if not isinstance(content, str):
                     raise ValueError(f"Invalid response content: {content}")
@@ -131,14 +428,70 @@ class Agent:
             except Exception as e:
                 logger.error(f"Failed to complete message: {message}\n{e}")
                 content = ""
-                if i < N - 1:
-                    logger.info(f"Retry {i + 1}/{N-1} ...")
-                    sleep(30)
+                if i == N - 1 or not is_retryable(e):
+                    break
+                delay = backoff_delay(e, i, request_setting)
+                logger.info(f"Retry {i + 1}/{N-1} in {delay:.1f} seconds.")
+                sleep(delay)
+        if key is not None and content:
+            self.cache.put(key, content)
         self.history.append(role="user", content=message)
         self.history.append(role="assistant", content=content)
         return content
 
+    def lookup_cache(
+            self,
+            messages: list[str],
+            **kwargs) -> tuple[list[str], list[str | None]]:
+        """
+        Return the cache keys and the cached responses of the messages sent
+        without history, the response is None if it is not cached.
+        """
+        if self.cache is None:
+            return [""] * len(messages), [None] * len(messages)
+        model_kwarg = dict(self.config.model_kwargs or {})
+        model_kwarg.update(kwargs)
+        keys = [
+            self.cache.make_key(
+                self.config.model,
+                [{"role": "user", "content": m}],
+                model_kwarg,
+            )
+            for m in messages
+        ]
+        if self.bypass_cache:
+            return keys, [None] * len(messages)
+        cached = [self.cache.get(k) for k in keys]
+        count("llm_cached_responses", sum(c is not None for c in cached))
+        return keys, cached
+
+    def log_cache_stats(self):
+        if self.cache is not None:
+            logger.info(
+                f"Response cache statistics of {self.model}: "
+                f"{self.cache.stats}"
+            )
+
     def complete_batch(self, messages: list[str], **kwargs) -> list[str]:
+        keys, cached = self.lookup_cache(messages, **kwargs)
+        missing = [i for i, c in enumerate(cached) if c is None]
+        logger.info(
+            f"{len(messages) - len(missing)} of {len(messages)} responses "
+            f"are cached."
+        )
+        results = [c or "" for c in cached]
+        if missing:
+            responses = self.request_batch(
+                [messages[i] for i in missing], **kwargs
+            )
+            for i, response in zip(missing, responses):
+                results[i] = response
+                if self.cache is not None and response:
+                    self.cache.put(keys[i], response)
+        self.log_cache_stats()
+        return results
+
+    def request_batch(self, messages: list[str], **kwargs) -> list[str]:
         os.makedirs("tmp", exist_ok=True)
         model_kwarg = self.config.model_kwargs or {}
         model_kwarg.update(kwargs)
@@ -158,8 +511,11 @@ class Agent:
             completion_window="24h",
             metadata={"description": f"complete batches by {self.model}"},
         )
+        poll_seconds = (self.config.request_setting or {}).get(
+            "batch_poll_seconds", 30
+        )
         while True:
-            sleep(30)
+            sleep(poll_seconds)
             try:
                 job = self.client.batches.retrieve(batch_task.id)
             except Exception as e:
@@ -180,6 +536,11 @@ class Agent:
         out_jsonl_path = f"tmp/.agent.batch.out.{sha}.jsonl"
         content.write_to_file(out_jsonl_path)
         finished = load_jsonl(out_jsonl_path)
+        count("llm_requests", len(batch_items))
+        for r in finished:
+            usage = (r["response"].get("body") or {}).get("usage") or {}
+            count("prompt_tokens", usage.get("prompt_tokens", 0))
+            count("completion_tokens", usage.get("completion_tokens", 0))
         responses = {
             r["custom_id"]: (r["response"]["body"]["choices"]
                              [0]["message"]["content"])
@@ -199,51 +560,122 @@ class Agent:
             self,
             messages: list[str],
             **kwargs) -> list[str]:
-        def request(messages: list[str]):
-            with ThreadPoolExecutor() as executor:
-                results = list(executor.map(
-                    lambda msg: self.complete_single(msg, **kwargs), messages)
-                )
-            return results
+        # Serve the cached responses first, only the misses count against the
+        # RPM and TPM limitations.
+        _, cached = self.lookup_cache(messages, **kwargs)
+        missing = [i for i, c in enumerate(cached) if c is None]
+        logger.info(
+            f"{len(messages) - len(missing)} of {len(messages)} responses "
+            f"are cached."
+        )
+        results = [c or "" for c in cached]
+        if missing:
+            responses = self.request_concurrent(
+                [messages[i] for i in missing], **kwargs
+            )
+            for i, response in zip(missing, responses):
+                results[i] = response
+        self.log_cache_stats()
+        return results
+
+    def request_concurrent(
+            self,
+            messages: list[str],
+            **kwargs) -> list[str]:
+        start_time = time()
+        results = asyncio.run(self.arequest_concurrent(messages, **kwargs))
+        elapsed = time() - start_time
+        logger.info(
+            f"Completed {len(messages)} messages by {self.config.model} in "
+            f"{elapsed:.1f} seconds "
+            f"({len(messages) * 60 / max(elapsed, 1e-6):.1f} per minute)."
+        )
+        return results
 
+    async def arequest_concurrent(
+            self,
+            messages: list[str],
+            **kwargs) -> list[str]:
+        """
+        Complete the messages with `AsyncOpenAI`, at most `max_in_flight`
+        requests are pending and the requests are admitted by the RPM and
+        TPM limiter shared by all the agents of the same model.
+        """
+        model_kwarg = self.config.model_kwargs or {}
+        model_kwarg.update(kwargs)
         request_setting = self.config.request_setting or {}
-        requests_per_minute = request_setting.get("requests_per_minute", 64)
-        # If no max_tasks_per_minute is provided or messages are fewer than
-        # the limit, process normally.
-        if len(messages) <= requests_per_minute:
-            return request(messages)
-
-        # Otherwise, partition messages into batches and ensure each batch
-        # takes at least 60 seconds.
-        all_results = []
-        chunks = [
-            messages[i:i + requests_per_minute]
-            for i in range(0, len(messages), requests_per_minute)
-        ]
-        for i, chunk in enumerate(chunks):
-            header = [
-                "Model", "Current Chunk", "Total Chunks", "Messages in Chunk",
-                "Messages Processed", "Messages in Total"
-            ]
-            data = [
-                self.config.model, i + 1, len(chunks), len(chunk),
-                len(all_results), len(messages)
-            ]
-            table = tabulate(
-                [data],
-                headers=header, tablefmt="pretty", maxcolwidths=[None, 96],
-            )
-            logger.info(f"\n{table}")
-            start_time = time()
-            all_results.extend(request(chunk))
-            sleep_time = 60 - (time() - start_time)
-            if sleep_time > 0 and i < len(chunks) - 1:
+        semaphore = asyncio.Semaphore(
+            request_setting.get("max_in_flight", 16)
+        )
+        client = AsyncOpenAI(
+            api_key=os.environ.get(self.config.api_key, None),
+            base_url=self.config.base_url,
+            max_retries=0,
+        )
+        finished = 0
+
+        async def request(message: str) -> str:
+            nonlocal finished
+            async with semaphore:
+                content = await self.acomplete(client, message, model_kwarg)
+            finished += 1
+            if finished % 100 == 0 or finished == len(messages):
                 logger.info(
-                    f"Sleeping for {sleep_time} seconds due to "
-                    f"the RPM limitation ({requests_per_minute}) ..."
+                    f"Completed {finished}/{len(messages)} messages by "
+                    f"{self.config.model}."
                 )
-                sleep(sleep_time)
-        return all_results
+            return content
+
+        async with client:
+            results = await asyncio.gather(*[request(m) for m in messages])
+        for message, content in zip(messages, results):
+            if self.cache is not None and content:
+                key = self.cache.make_key(
+                    self.config.model,
+                    [{"role": "user", "content": message}],
+                    model_kwarg,
+                )
+                self.cache.put(key, content)
+            self.history.append(role="user", content=message)
+            self.history.append(role="assistant", content=content)
+        return list(results)
+
+    async def acomplete(self,
+                        client: AsyncOpenAI,
+                        message: str,
+                        model_kwarg: dict) -> str:
+        messages = [{"role": "user", "content": message}]
+        request_setting = self.config.request_setting or {}
+        N = request_setting.get("max_retries", 0) + 1
+        for i in range(N):
+            estimated = estimate_tokens(messages, model_kwarg)
+            await asyncio.sleep(self.rate_limiter.reserve(estimated))
+            count("llm_requests")
+            try:
+                response: ChatCompletion = (
+                    await client.chat.completions.create(
+                        messages=messages,  # type: ignore
+                        model=self.config.model,
+                        **model_kwarg,
+                    )
+                )
+                if response.usage is not None:
+                    self.rate_limiter.adjust(
+                        response.usage.total_tokens - estimated
+                    )
+                    count_usage(response.usage)
+                content = response.choices[0].message.content
+                if not isinstance(content, str):
+                    raise ValueError(f"Invalid response content: {content}")
+                return content
+            except Exception as e:
+                logger.error(f"Failed to complete message: {message}\n{e}")
+                if i == N - 1 or not is_retryable(e):
+                    break
+                delay = backoff_delay(e, i, request_setting)
+                logger.info(f"Retry {i + 1}/{N-1} in {delay:.1f} seconds.")
+                await asyncio.sleep(delay)
+        return ""
 
     def try_delete_server_file(self, file_id: str):
         try:
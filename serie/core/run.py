@@ -1,68 +1,500 @@
 import os
+import json
 import time
+import queue
+import hashlib
 import inspect
+import threading
+import os.path as osp
+from dataclasses import fields
+from typing import Iterable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+)
 from tabulate import tabulate
 
 from serie.config import Configs
 from serie.utils.logging import create_logger
-from serie.base.paper import Paper
-from serie.base.plugin import BasePlugin, BasePluginData, GlobalPluginData
+from serie.base.paper import Paper, create_paper_from_dict
+from serie.base.plugin import (
+    BasePlugin, BasePluginData, ExecutionMode, GlobalPluginData
+)
 from serie.plugins import get_plugin_cls
-from serie.utils.io import import_config
+from serie.core.schedule import (
+    PluginTiming, build_plugin_graph, critical_path, is_schedulable,
+    report_critical_path
+)
+from serie.utils.io import import_config, iter_jsonl, save_jsonl
 from serie.utils.misc import get_class_config_file_path
+from serie.utils.metrics import RUN_METRICS
 
 
 logger = create_logger(__name__)
+STREAM_END = object()
+STREAM_POLL_SECONDS = 0.1
+
+
+class PipelineCheckpoint:
+    """
+    Snapshot of the papers and the `GlobalPluginData` taken after every
+    plugin step, kept as gzip compressed json lines under `directory`. Only
+    the latest snapshot of a pipeline is kept.
+
+    Args:
+        directory: Where to save the snapshot.
+        plugin_names: The plugins of the pipeline.
+        plugins_configs: The plugin configs of the pipeline, a snapshot
+            taken with different plugins or configs is not resumed.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 plugin_names: list[str],
+                 plugins_configs: dict[str, dict] | None = None) -> None:
+        self.directory = directory
+        serialized = json.dumps(
+            [plugin_names, plugins_configs or {}], sort_keys=True, default=str
+        ).encode("utf-8")
+        self.fingerprint = hashlib.sha256(serialized).hexdigest()
+        self.state_path = osp.join(directory, "state.json")
+        self.papers_path = osp.join(directory, "papers.jsonl.gz")
+
+    def save(self,
+             step: int,
+             papers: list[Paper],
+             global_plugin_data: GlobalPluginData,
+             overwrite: bool):
+        os.makedirs(self.directory, exist_ok=True)
+        save_jsonl(self.papers_path, (p.asdict() for p in papers))
+        state = {
+            "fingerprint": self.fingerprint,
+            "step": step,
+            "overwrite": overwrite,
+            "global_plugin_data": global_plugin_data.data,
+        }
+        with open(f"{self.state_path}.tmp", "w") as fp:
+            json.dump(state, fp, default=str)
+        # The state is replaced last, it never refers to papers of another
+        # step.
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    def load(self) -> tuple[int, list[Paper], GlobalPluginData, bool] | None:
+        """
+        Return the number of finished steps, the papers, the global plugin
+        data and the overwrite flag, or None if there is nothing to resume.
+        """
+        if not osp.exists(self.state_path):
+            return None
+        with open(self.state_path, "r") as fp:
+            state = json.load(fp)
+        if state["fingerprint"] != self.fingerprint:
+            logger.warning(
+                f"The checkpoint under {self.directory} is taken by another "
+                f"pipeline, ignoring it."
+            )
+            return None
+        papers = [
+            create_paper_from_dict(d) for d in iter_jsonl(self.papers_path)
+        ]
+        papers = check_plugin_data_class(papers)
+        global_plugin_data = GlobalPluginData()
+        global_plugin_data.data = state["global_plugin_data"]
+        return state["step"], papers, global_plugin_data, state["overwrite"]
 
 
 def forward_plugins(cfgs: Configs,
                     plugin_names: list[str],
                     plugins_configs: dict[str, dict] | None = None):
-    papers = forward_plugins_once(cfgs, plugin_names, plugins_configs)
-    for idx in range(cfgs.max_retries_num):
-        if len(papers):
-            break
-        logger.info(f"Retry {idx + 1}/{cfgs.max_retries_num}. "
-                    f"Sleeping for {cfgs.sleep_seconds} seconds.")
-        time.sleep(cfgs.sleep_seconds)
-        papers = forward_plugins_once(cfgs, plugin_names, plugins_configs)
-    logger.info(f"Finished running. Processed {len(papers)} papers.")
+    checkpoint = PipelineCheckpoint(
+        osp.join(cfgs.output_directory, "checkpoints"),
+        plugin_names,
+        plugins_configs,
+    )
+    start = 0
+    papers: list[Paper] = []
+    global_plugin_data = GlobalPluginData()
+    # NOTE: `data` is a class attribute, use a fresh dict for every run.
+    global_plugin_data.data = {}
+    restored = checkpoint.load() if cfgs.resume else None
+    if restored is not None:
+        start, papers, global_plugin_data, cfgs.overwrite = restored
+        logger.info(
+            f"Resuming from step {start + 1}/{len(plugin_names)} with "
+            f"{len(papers)} papers."
+        )
+    RUN_METRICS.start(cfgs.trace_memory)
+    run_start = time.time()
+    path: list[PluginTiming] = []
+    step = start
+    finished = False
+    # Only the source of the papers, i.e., the first step after the
+    # `ResultLoader`, is retried when it produces nothing (e.g., arXiv has
+    # no announcements yet). The following steps pass the empty list on.
+    is_source = all(n == "ResultLoader" for n in plugin_names[:start])
+    try:
+        while step < len(plugin_names):
+            end, kind = find_segment(
+                cfgs, plugin_names, step, plugins_configs
+            )
+            papers, global_plugin_data = forward_plugin_with_retries(
+                cfgs, plugin_names, step, papers, global_plugin_data,
+                plugins_configs, checkpoint, end, kind, path,
+                retry_empty=is_source and not len(papers),
+            )
+            is_source = is_source and plugin_names[step] == "ResultLoader"
+            checkpoint.save(end, papers, global_plugin_data, cfgs.overwrite)
+            step = end
+        finished = True
+        logger.info(f"Finished running. Processed {len(papers)} papers.")
+        report_critical_path(path, time.time() - run_start)
+    finally:
+        # The metrics of a failed run are saved as well, they tell which
+        # plugin failed and how long it took.
+        RUN_METRICS.report()
+        RUN_METRICS.save(
+            cfgs.output_directory,
+            cfgs.metrics_history_file,
+            pipeline=plugin_names,
+            datetime=cfgs.datetime,
+            finished=finished,
+            num_papers=len(papers),
+            critical_path=[
+                {"plugin": t.name, "seconds": t.seconds} for t in path
+            ],
+        )
     return papers
 
 
-def forward_plugins_once(
+def forward_plugin_with_retries(
         cfgs: Configs,
         plugin_names: list[str],
-        plugins_configs: dict[str, dict] | None = None) -> list[Paper]:
-    papers: list[Paper] = []
+        step: int,
+        papers: list[Paper],
+        global_plugin_data: GlobalPluginData,
+        plugins_configs: dict[str, dict] | None,
+        checkpoint: PipelineCheckpoint,
+        end: int | None = None,
+        kind: str = "plugin",
+        path: list[PluginTiming] | None = None,
+        retry_empty: bool = False,
+) -> tuple[list[Paper], GlobalPluginData]:
+    """
+    Run the plugin of `step`, or the segment of the plugins from `step` to
+    `end` (see `find_segment`), retry it from the last snapshot if it fails
+    or, if `retry_empty` is set, produces no papers. Plugins may modify the
+    papers in place, hence a retry never reuses the papers of the failed
+    attempt.
 
-    global_plugin_data = GlobalPluginData()
-    plugins = [get_plugin_cls(name) for name in plugin_names]
-    for cls, name in zip(plugins, plugin_names):
-        # first, inspect the arguments of the plugin
-        # find the argument from cfgs
-        args = prepare_plugins_args_from_configs(cfgs, plugin_names, cls)
-        if plugins_configs and name in plugins_configs:
-            args.update(plugins_configs[name])
-        str_args = tabulate(
-            [[k, v] for k, v in args.items()],
-            tablefmt="pretty",
-            colalign=("right", "left"),
-            headers=["Argument", "Value"],
-            maxcolwidths=[None, 96],
-        )
-        logger.info(
-            f"Running plugin {cls.__name__} with following args:\n{str_args}"
-        )
-        plugin: BasePlugin = cls(**args)
-        papers: list[Paper] = plugin(papers, global_plugin_data)
-        papers = check_plugin_data_class(papers)
-        if name == "ResultLoader" and len(papers) == 0:
-            logger.info("No papers found, setting overwrite to True.")
-            cfgs.overwrite = True
+    The wall time of the plugins on the critical path of the successful
+    attempt is appended to `path`.
+    """
+    end = step + 1 if end is None else end
+    name = " -> ".join(plugin_names[step:end])
+    for idx in range(cfgs.max_retries_num + 1):
+        if idx > 0:
+            logger.info(f"Retry {name} {idx}/{cfgs.max_retries_num}. "
+                        f"Sleeping for {cfgs.sleep_seconds} seconds.")
+            time.sleep(cfgs.sleep_seconds)
+            papers, global_plugin_data = [], GlobalPluginData()
+            global_plugin_data.data = {}
+            restored = checkpoint.load() if step > 0 else None
+            if restored is not None:
+                _, papers, global_plugin_data, cfgs.overwrite = restored
+        attempt_start = time.time()
+        attempt_path: list[PluginTiming] = []
+        try:
+            if kind == "stream":
+                output = forward_stream(
+                    cfgs, plugin_names, plugin_names[step:end], papers,
+                    global_plugin_data, plugins_configs,
+                )
+            elif kind == "graph":
+                output = forward_graph(
+                    cfgs, plugin_names, plugin_names[step:end], papers,
+                    global_plugin_data, plugins_configs, attempt_path,
+                )
+            else:
+                output = forward_plugin(
+                    cfgs, plugin_names, name, papers, global_plugin_data,
+                    plugins_configs,
+                )
+        except Exception as e:
+            if idx == cfgs.max_retries_num:
+                raise
+            logger.error(f"Plugin {name} failed: {e}")
+            continue
+        if path is not None:
+            path.extend(attempt_path or [
+                PluginTiming(name, attempt_start, time.time())
+            ])
+        # An empty output of the source usually means it is not ready yet
+        # (e.g., arXiv returns nothing), while an empty `ResultLoader` only
+        # means the papers have to be requested by the following plugins.
+        if len(output) or not retry_empty or name == "ResultLoader":
+            return output, global_plugin_data
+        papers = output
+    return papers, global_plugin_data
+
+
+def forward_plugin(cfgs: Configs,
+                   plugin_names: list[str],
+                   name: str,
+                   papers: list[Paper],
+                   global_plugin_data: GlobalPluginData,
+                   plugins_configs: dict[str, dict] | None = None):
+    plugin = create_plugin(cfgs, plugin_names, name, plugins_configs)
+    papers: list[Paper] = plugin(papers, global_plugin_data)
+    papers = check_plugin_data_class(papers)
+    if name == "ResultLoader" and len(papers) == 0:
+        logger.info("No papers found, setting overwrite to True.")
+        cfgs.overwrite = True
     return papers
 
 
+def create_plugin(cfgs: Configs,
+                  plugin_names: list[str],
+                  name: str,
+                  plugins_configs: dict[str, dict] | None = None):
+    cls = get_plugin_cls(name)
+    args = prepare_plugin_args(cfgs, plugin_names, name, plugins_configs)
+    str_args = tabulate(
+        [[k, v] for k, v in args.items()],
+        tablefmt="pretty",
+        colalign=("right", "left"),
+        headers=["Argument", "Value"],
+        maxcolwidths=[None, 96],
+    )
+    logger.info(
+        f"Running plugin {cls.__name__} with following args:\n{str_args}"
+    )
+    plugin: BasePlugin = cls(**args)
+    return plugin
+
+
+def prepare_plugin_args(cfgs: Configs,
+                        plugin_names: list[str],
+                        name: str,
+                        plugins_configs: dict[str, dict] | None = None):
+    cls = get_plugin_cls(name)
+    # first, inspect the arguments of the plugin
+    # find the argument from cfgs
+    args = prepare_plugins_args_from_configs(cfgs, plugin_names, cls)
+    if plugins_configs and name in plugins_configs:
+        args.update(plugins_configs[name])
+    return args
+
+
+def find_segment(cfgs: Configs,
+                 plugin_names: list[str],
+                 step: int,
+                 plugins_configs: dict[str, dict] | None = None
+                 ) -> tuple[int, str]:
+    """
+    Return the end and the kind of the segment of plugins starting at
+    `step`: a streaming segment if `cfgs.streaming`, a graph of plugins run
+    concurrently if `cfgs.max_parallel_plugins` is greater than 1, or a
+    single plugin.
+    """
+    if cfgs.streaming:
+        end = find_stream_segment_end(
+            cfgs, plugin_names, step, plugins_configs
+        )
+        if end - step > 1:
+            return end, "stream"
+    if cfgs.max_parallel_plugins > 1:
+        end = step
+        while (end < len(plugin_names)
+               and is_schedulable(get_plugin_cls(plugin_names[end]))):
+            end += 1
+        if end - step > 1:
+            return end, "graph"
+    return step + 1, "plugin"
+
+
+def find_stream_segment_end(cfgs: Configs,
+                            plugin_names: list[str],
+                            start: int,
+                            plugins_configs: dict[str, dict] | None = None
+                            ) -> int:
+    """
+    Return the end of the streaming segment starting at `start`, i.e., the
+    consecutive plugins which are not barriers with their configured
+    arguments (see `BasePlugin.resolve_execution_mode`). A single plugin is
+    not worth streaming and forms a segment by itself.
+    """
+    end = start
+    while end < len(plugin_names):
+        name = plugin_names[end]
+        args = prepare_plugin_args(cfgs, plugin_names, name, plugins_configs)
+        mode = get_plugin_cls(name).resolve_execution_mode(**args)
+        if mode == ExecutionMode.BARRIER:
+            break
+        end += 1
+    return end if end - start > 1 else start + 1
+
+
+def forward_stream(cfgs: Configs,
+                   plugin_names: list[str],
+                   names: list[str],
+                   papers: list[Paper],
+                   global_plugin_data: GlobalPluginData,
+                   plugins_configs: dict[str, dict] | None = None):
+    """
+    Run the plugins `names` as a pipeline. Every plugin runs in its own
+    thread and consumes the batches produced by the previous one through a
+    bounded queue, so a slow plugin throttles the plugins before it instead
+    of piling up papers in memory. The first error stops all the plugins and
+    is raised once they have all returned.
+    """
+    plugins = [
+        create_plugin(cfgs, plugin_names, name, plugins_configs)
+        for name in names
+    ]
+    queues = [
+        queue.Queue(maxsize=max(1, cfgs.stream_queue_size)) for _ in plugins
+    ]
+    stop = threading.Event()
+    errors: list[BaseException] = []
+
+    def run(idx: int):
+        plugin = plugins[idx]
+        if idx == 0:
+            batches = iter_batches(papers, cfgs.stream_batch_size)
+        else:
+            batches = iter_queue(queues[idx - 1], stop)
+        if plugin.execution_mode == ExecutionMode.PER_BATCH:
+            batches = rebatch(batches, cfgs.stream_batch_size)
+        try:
+            for batch in plugin.stream(batches, global_plugin_data):
+                batch = check_plugin_data_class(batch)
+                if len(batch) and not put_queue(queues[idx], batch, stop):
+                    return
+        except BaseException as e:
+            logger.error(f"Plugin {names[idx]} failed in streaming mode.")
+            errors.append(e)
+            stop.set()
+            return
+        put_queue(queues[idx], STREAM_END, stop)
+
+    threads = [
+        threading.Thread(target=run, args=(idx, ), name=names[idx])
+        for idx in range(len(plugins))
+    ]
+    for thread in threads:
+        thread.start()
+    output: list[Paper] = []
+    for batch in iter_queue(queues[-1], stop):
+        output.extend(batch)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return output
+
+
+def forward_graph(cfgs: Configs,
+                  plugin_names: list[str],
+                  names: list[str],
+                  papers: list[Paper],
+                  global_plugin_data: GlobalPluginData,
+                  plugins_configs: dict[str, dict] | None = None,
+                  path: list[PluginTiming] | None = None):
+    """
+    Run the plugins `names` on a thread pool of `cfgs.max_parallel_plugins`
+    workers, a plugin starts once the plugins it waits for are finished, see
+    `build_plugin_graph`. The plugins update the papers in place, which are
+    checked once all the plugins are finished. The wall time of the plugins
+    on the critical path is appended to `path`.
+    """
+    plugins = [
+        create_plugin(cfgs, plugin_names, name, plugins_configs)
+        for name in names
+    ]
+    graph = build_plugin_graph(names, plugins)
+    timings: list[PluginTiming] = [PluginTiming(n, 0.0, 0.0) for n in names]
+
+    def run(idx: int):
+        timings[idx].start = time.time()
+        output = plugins[idx](papers, global_plugin_data)
+        timings[idx].end = time.time()
+        if len(output) != len(papers):
+            raise RuntimeError(
+                f"Plugin {names[idx]} changed the number of papers from "
+                f"{len(papers)} to {len(output)}, it can't run concurrently "
+                f"with other plugins."
+            )
+
+    logger.info(f"Running plugins {names} concurrently.")
+    done: set[int] = set()
+    running: dict[Future, int] = {}
+    executor = ThreadPoolExecutor(max_workers=cfgs.max_parallel_plugins)
+    try:
+        while len(done) < len(plugins):
+            for idx in range(len(plugins)):
+                if (idx not in done and idx not in running.values()
+                        and graph[idx] <= done):
+                    running[executor.submit(run, idx)] = idx
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                idx = running.pop(future)
+                future.result()
+                done.add(idx)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    if path is not None:
+        seconds = [t.seconds for t in timings]
+        path.extend(timings[i] for i in critical_path(seconds, graph))
+    return check_plugin_data_class(papers)
+
+
+def iter_batches(papers: list[Paper], batch_size: int) -> Iterator[list]:
+    batch_size = max(1, batch_size)
+    for i in range(0, len(papers), batch_size):
+        yield papers[i:i + batch_size]
+
+
+def rebatch(batches: Iterable[list], batch_size: int) -> Iterator[list]:
+    """
+    Merge the incoming chunks into batches of at least `batch_size` papers,
+    the remainder is given when the input is exhausted.
+    """
+    pending: list = []
+    for batch in batches:
+        pending.extend(batch)
+        if len(pending) >= batch_size:
+            yield pending
+            pending = []
+    if pending:
+        yield pending
+
+
+def put_queue(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """
+    Put `item` into `q`, return False without putting it if the pipeline is
+    stopped while waiting for room.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=STREAM_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def iter_queue(q: queue.Queue, stop: threading.Event) -> Iterator[list]:
+    while True:
+        try:
+            item = q.get(timeout=STREAM_POLL_SECONDS)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is STREAM_END:
+            return
+        yield item
+
+
 def check_plugin_data_class(papers: list[Paper]):
     logger.info("Checking plugin data class ...")
     for paper in papers:
@@ -73,6 +505,15 @@ def check_plugin_data_class(papers: list[Paper]):
             if isinstance(data, dict):
                 if "plugin_name" not in data.keys():
                     data["plugin_name"] = key + "Data"
+                names = {field.name for field in fields(data_cls)}
+                retired = sorted(data.keys() - names)
+                if retired:
+                    # Fields a data class no longer declares, e.g. the
+                    # `source_hash` of Translator, are dropped on load.
+                    logger.warning_once(
+                        f"Dropping the retired fields {retired} of {key}."
+                    )
+                    data = {k: v for k, v in data.items() if k in names}
                 data: BasePluginData = data_cls(**data)
             else:
                 assert isinstance(data, data_cls)
@@ -0,0 +1,107 @@
+from dataclasses import dataclass
+
+from tabulate import tabulate
+
+from serie.base.plugin import BasePlugin
+from serie.utils.logging import create_logger
+
+
+logger = create_logger(__name__)
+
+
+@dataclass
+class PluginTiming:
+    """
+    Wall time of a step of the pipeline, either a plugin or a streaming
+    segment of plugins.
+    """
+    name: str
+    start: float
+    end: float
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+
+def is_schedulable(cls: type[BasePlugin]) -> bool:
+    """
+    Whether the plugin declares what it reads and writes, i.e., whether it
+    may run concurrently with its neighbours.
+    """
+    return cls.reads is not None and cls.writes is not None
+
+
+def conflicts(earlier: BasePlugin, later: BasePlugin) -> bool:
+    """
+    Whether `later` must wait for `earlier`, i.e., one of them writes what
+    the other one reads or writes.
+    """
+    if not (is_schedulable(type(earlier)) and is_schedulable(type(later))):
+        return True
+    earlier_writes = set(earlier.writes or ())
+    later_writes = set(later.writes or ())
+    return bool(
+        earlier_writes & set(later.reads or ())
+        or earlier_writes & later_writes
+        or set(earlier.reads or ()) & later_writes
+    )
+
+
+def build_plugin_graph(names: list[str],
+                       plugins: list[BasePlugin]) -> list[set[int]]:
+    """
+    Return the indices of the plugins every plugin waits for. A plugin
+    waits for the earlier plugins it conflicts with and the earlier plugins
+    listed in its `dependencies`, so the result of the pipeline is the same
+    as running the plugins in order.
+    """
+    graph: list[set[int]] = []
+    for j, later in enumerate(plugins):
+        graph.append({
+            i for i, earlier in enumerate(plugins[:j])
+            if names[i] in later.dependencies or conflicts(earlier, later)
+        })
+    return graph
+
+
+def critical_path(seconds: list[float], graph: list[set[int]]) -> list[int]:
+    """
+    Return the indices of the longest chain of plugins of the graph given by
+    `build_plugin_graph`, weighted by their wall time.
+    """
+    if not seconds:
+        return []
+    # The plugins only wait for earlier plugins, the indices are already in
+    # topological order.
+    finish: list[float] = []
+    previous: list[int | None] = []
+    for j, waits in enumerate(graph):
+        before = max(waits, key=lambda i: finish[i], default=None)
+        previous.append(before)
+        finish.append(seconds[j] + (finish[before] if before is not None
+                                    else 0.0))
+    last: int | None = max(range(len(finish)), key=lambda i: finish[i])
+    path = []
+    while last is not None:
+        path.append(last)
+        last = previous[last]
+    return path[::-1]
+
+
+def report_critical_path(path: list[PluginTiming], wall_seconds: float):
+    """
+    Log the critical path of a run, the steps whose wall time adds up to
+    the duration of the run and are worth optimizing first.
+    """
+    total = sum(t.seconds for t in path)
+    str_path = tabulate(
+        [[t.name, f"{t.seconds:.2f}"] for t in path],
+        tablefmt="pretty",
+        colalign=("left", "right"),
+        headers=["Plugin", "Seconds"],
+    )
+    logger.info(
+        f"Critical path of the run ({total:.2f} of {wall_seconds:.2f} "
+        f"seconds):\n{str_path}"
+    )
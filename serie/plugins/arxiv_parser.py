@@ -1,15 +1,28 @@
 
+import os
+import json
+import hashlib
 import os.path as osp
+from collections import deque
 from dataclasses import dataclass
+from typing import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import arxiv
-from serie.base.paper import Link, LinkEnum, Paper
-from serie.base.plugin import BasePluginData, GlobalPluginData, BasePlugin
+from serie.base.paper import (
+    Link, LinkEnum, Paper, create_paper_from_dict, split_arxiv_id
+)
+from serie.base.plugin import (
+    BasePluginData, ExecutionMode, GlobalPluginData, BasePlugin
+)
 from serie.utils.io import load_json
+from serie.utils.http import HostRateLimiter
 from serie.utils.logging import create_logger
+from serie.utils.metrics import count
 
 
 logger = create_logger(__name__)
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
 
 
 @dataclass
@@ -24,12 +37,34 @@ class ArxivParserFromJsonFileData(BasePluginData):
 
 
 class ArxivParser(BasePlugin):
+    """
+    Collect papers from arXiv.
+
+    Args:
+        page_size: Number of results requested per arXiv API call.
+        max_in_flight: Maximum number of pages requested concurrently, the
+            requests are still spaced by `delay_seconds`.
+        delay_seconds: Minimum interval between two requests to the API.
+        output_directory: If set, the harvest is checkpointed after every
+            page under this directory, and a failed run resumes from the last
+            completed page.
+        id_chunk_size: Number of ids per `id_list` request when the papers
+            are given by `json_file`.
+    """
+
+    execution_mode = ExecutionMode.PER_BATCH
+
     def __init__(
             self,
             datetime: str,
             categories: str = "(cat:cs.CV OR cat:cs.AI OR cat:cs.LG)",
             query: str = "",
             json_file: str = "",
+            page_size: int = 100,
+            max_in_flight: int = 1,
+            delay_seconds: float = 3.0,
+            output_directory: str = "",
+            id_chunk_size: int = 100,
             overwrite: bool = False,
             version: str = "",
             dependencies: list[str] | None = None,
@@ -37,6 +72,14 @@ class ArxivParser(BasePlugin):
         super().__init__(overwrite, version, dependencies, **kwargs)
         self.categories = categories
         self.datetime = datetime
+        self.page_size = page_size
+        self.max_in_flight = max(1, max_in_flight)
+        self.delay_seconds = delay_seconds
+        self.id_chunk_size = id_chunk_size
+        self.checkpoint_directory = (
+            osp.join(output_directory, "arxiv_checkpoints")
+            if output_directory else ""
+        )
 
         self.json_file = osp.abspath(json_file) if json_file else ""
         if json_file and not osp.exists(json_file):
@@ -49,37 +92,105 @@ class ArxivParser(BasePlugin):
                 papers: list[Paper],
                 global_plugin_data: GlobalPluginData) -> list[Paper]:
         if self.query:
-            papers.extend(search(self.query))
+            papers.extend(self.search(self.query))
         if self.json_file:
             items: list[dict] = load_json(self.json_file)
             self.check_metas(items)
-            queries = [f"id:{item['id']}" for item in items]
-            results = search(" OR ".join(queries))
-            for result in results:
-                item_of_result = None
-                for item in items:
-                    if item["id"] in result.url.href:
-                        item_of_result = item
-                        break
-                if item_of_result is None:
-                    logger.warning(f"Item not found for {result.url}")
-                    continue
-                result.update(item_of_result)
-                for key, val in item_of_result["local_plugin_data"].items():
-                    if key not in result.local_plugin_data.keys():
-                        result.local_plugin_data[key] = val
-                    else:
-                        data = result.get_plugin_data(key)
-                        assert data is not None and isinstance(val, dict)
-                        for k, v in val.items():
-                            if isinstance(data, dict):
-                                data[k] = v
-                            else:
-                                setattr(data, k, v)
-            papers.extend(results)
+            papers.extend(self.lookup(items))
         papers = self.deduplicate(papers)
         return papers
 
+    def stream(self,
+               batches: Iterable[list[Paper]],
+               global_plugin_data: GlobalPluginData) -> Iterator[list[Paper]]:
+        """
+        Pass the given papers through, then yield the searched papers page
+        by page as they arrive, deduplicated like `process`.
+        """
+        return self.measure_stream(self.iter_pages(batches))
+
+    def iter_pages(
+            self,
+            batches: Iterable[list[Paper]]) -> Iterator[tuple[int, list]]:
+        seen: set[str] = set()
+
+        def unique(papers: list[Paper]) -> list[Paper]:
+            result = []
+            for paper in papers:
+                if paper.url.href not in seen:
+                    seen.add(paper.url.href)
+                    result.append(paper)
+            return result
+
+        for batch in batches:
+            yield len(batch), unique(batch)
+        if self.query:
+            page: list[Paper] = []
+            for paper in self.search(self.query):
+                page.append(paper)
+                if len(page) == self.page_size:
+                    yield 0, unique(page)
+                    page = []
+            if page:
+                yield 0, unique(page)
+        if self.json_file:
+            items: list[dict] = load_json(self.json_file)
+            self.check_metas(items)
+            yield 0, unique(self.lookup(items))
+
+    def lookup(self, items: list[dict]) -> list[Paper]:
+        """
+        Fetch the papers listed in `items` by chunked `id_list` requests and
+        join them back to their items through the normalized arXiv id.
+        """
+        mapping: dict[str, list[dict]] = {}
+        ids: list[str] = []
+        for item in items:
+            mapping.setdefault(item["id"], []).append(item)
+            # Only the explicitly versioned urls are requested with their
+            # version, the others resolve to the latest version.
+            _, version = split_arxiv_id(item["url"])
+            ids.append(item["id"] + version)
+        ids = list(dict.fromkeys(ids))
+        results = list(lookup(
+            ids,
+            chunk_size=self.id_chunk_size,
+            max_in_flight=self.max_in_flight,
+            delay_seconds=self.delay_seconds,
+        ))
+        for result in results:
+            paperid, version = split_arxiv_id(result.url.href)
+            candidates = mapping.get(paperid, [])
+            if not candidates:
+                logger.warning(f"Item not found for {result.url}")
+                continue
+            item_of_result = next(
+                (c for c in candidates if c["version"] == version),
+                candidates[0],
+            )
+            result.update(item_of_result)
+            for key, val in item_of_result["local_plugin_data"].items():
+                if key not in result.local_plugin_data.keys():
+                    result.local_plugin_data[key] = val
+                else:
+                    data = result.get_plugin_data(key)
+                    assert data is not None and isinstance(val, dict)
+                    for k, v in val.items():
+                        if isinstance(data, dict):
+                            data[k] = v
+                        else:
+                            setattr(data, k, v)
+        return results
+
+    def search(self, query: str) -> Iterator[Paper]:
+        return search(
+            query,
+            page_size=self.page_size,
+            max_in_flight=self.max_in_flight,
+            delay_seconds=self.delay_seconds,
+            checkpoint_directory=self.checkpoint_directory,
+        )
+
     def deduplicate(self, papers: list[Paper]):
         logger.info(f"Deduplicating papers for {len(papers)} items papers ...")
         if len(papers) == 0:
@@ -108,30 +219,291 @@ class ArxivParser(BasePlugin):
                 raise ValueError(f"URL not found in {item}.")
             if "tags" not in item:
                 raise ValueError(f"Tags not found in {item}.")
-            link: str = item["url"]
-            item["id"] = link.split("/")[-1].split("v")[0]
-            ver = link.split("/")[-1]
-            ver = ver.split("v")[-1] if "v" in ver else "1"
-            item["version"] = f"v{ver}"
+            paperid, version = split_arxiv_id(item["url"])
+            item["id"] = paperid
+            item["version"] = version or "v1"
             logger.debug(f"Check item: {item}")
 
 
-def search(query: str) -> list[Paper]:
-    results = []
-    client = arxiv.Client(num_retries=10, delay_seconds=3)
-    for i in range(10):
-        search = arxiv.Search(query=query,
-                              sort_by=arxiv.SortCriterion.LastUpdatedDate,
-                              max_results=10000)
-        results = list(client.results(search))
-        logger.info(f"Get {len(results)} items.")
-        if len(results):
-            logger.info(f"Range: {results[-1].updated} {results[0].updated}")
-            break
-    results = [create_paper_from_arxiv(r) for r in results]
+class HarvestCheckpoint:
+    """
+    Persist the papers of the completed pages of a query, together with the
+    offset of the next page to request.
+    """
+
+    def __init__(self, directory: str, query: str, page_size: int) -> None:
+        key = hashlib.sha256(f"{query}|{page_size}".encode()).hexdigest()
+        os.makedirs(directory, exist_ok=True)
+        self.state_path = osp.join(directory, f"{key[:16]}.json")
+        self.papers_path = osp.join(directory, f"{key[:16]}.jsonl")
+        self.query = query
+        self.offset = 0
+        self.num_papers = 0
+        if osp.exists(self.state_path):
+            with open(self.state_path, "r") as fp:
+                state = json.load(fp)
+            self.offset = state["offset"]
+            self.num_papers = state["num_papers"]
+
+    def papers(self) -> Iterator[Paper]:
+        if not self.num_papers:
+            return
+        with open(self.papers_path, "r") as fp:
+            # Lines written after the last saved state belong to a page that
+            # was not completed.
+            for _, line in zip(range(self.num_papers), fp):
+                yield create_paper_from_dict(json.loads(line))
+
+    def append(self, offset: int, papers: list[Paper]):
+        with open(self.papers_path, "a") as fp:
+            for paper in papers:
+                fp.write(json.dumps(paper.asdict()))
+                fp.write("\n")
+        self.offset = offset
+        self.num_papers += len(papers)
+        state = {
+            "query": self.query,
+            "offset": self.offset,
+            "num_papers": self.num_papers,
+        }
+        with open(f"{self.state_path}.tmp", "w") as fp:
+            json.dump(state, fp)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    def clear(self):
+        for path in (self.state_path, self.papers_path):
+            if osp.exists(path):
+                os.remove(path)
+
+
+def search(query: str,
+           page_size: int = 100,
+           max_in_flight: int = 1,
+           delay_seconds: float = 3.0,
+           num_retries: int = 10,
+           checkpoint_directory: str = "") -> Iterator[Paper]:
+    """
+    Harvest the results of `query` page by page, yielding the papers in the
+    order of the last updated date as soon as their page arrives.
+
+    Up to `max_in_flight` pages are requested concurrently, the requests are
+    spaced by `delay_seconds`. A failed or empty page is retried
+    `num_retries` times before raising, the harvest ends at the total number
+    of results reported by the feed. If `checkpoint_directory` is set, every
+    completed page is persisted there and the next call with the same query
+    resumes from it.
+    """
+    checkpoint = None
+    offset = 0
+    if checkpoint_directory:
+        checkpoint = HarvestCheckpoint(checkpoint_directory, query, page_size)
+        offset = checkpoint.offset
+        if offset:
+            logger.info(
+                f"Resuming the harvest from offset {offset} with "
+                f"{checkpoint.num_papers} papers of the previous run."
+            )
+        yield from checkpoint.papers()
+    rate_limiter = HostRateLimiter(
+        1 / delay_seconds if delay_seconds > 0 else 0
+    )
+    count = 0
+    # Total number of results reported by the last non-empty page, the
+    # harvest ends once it is reached.
+    total: int | None = None
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        pending: deque[tuple[int, Future]] = deque()
+        next_offset = offset
+        while True:
+            while (
+                    len(pending) < max_in_flight
+                    and (total is None or next_offset < total)):
+                future = executor.submit(
+                    request_page, query, next_offset, page_size,
+                    rate_limiter, num_retries,
+                )
+                pending.append((next_offset, future))
+                next_offset += page_size
+            if not pending:
+                break
+            start, future = pending.popleft()
+            try:
+                results, num_results = future.result()
+            except Exception:
+                for _, f in pending:
+                    f.cancel()
+                raise
+            if results:
+                total = num_results
+            elif total and start < total:
+                # Keep the checkpoint, the next run resumes from this page.
+                for _, f in pending:
+                    f.cancel()
+                raise RuntimeError(
+                    f"Got an empty page at offset {start} of {total} "
+                    f"results after {num_retries} retries."
+                )
+            papers = [create_paper_from_arxiv(r) for r in results]
+            if checkpoint is not None:
+                checkpoint.append(start + page_size, papers)
+            count += len(papers)
+            logger.info(
+                f"Get {len(papers)} items from offset {start}, "
+                f"{count} items in total."
+            )
+            yield from papers
+            if not results or start + len(results) >= (total or 0):
+                break
+        for _, f in pending:
+            f.cancel()
+    if checkpoint is not None:
+        checkpoint.clear()
+
+
+def lookup(ids: list[str],
+           chunk_size: int = 100,
+           max_in_flight: int = 1,
+           delay_seconds: float = 3.0,
+           num_retries: int = 10) -> Iterator[Paper]:
+    """
+    Fetch the papers of the given arXiv ids with `id_list` requests of at
+    most `chunk_size` ids, up to `max_in_flight` of them run concurrently.
+    The papers are yielded chunk by chunk in the order of `ids`.
+    """
+    rate_limiter = HostRateLimiter(
+        1 / delay_seconds if delay_seconds > 0 else 0
+    )
+    chunks = [
+        ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)
+    ]
+    logger.info(f"Looking up {len(ids)} ids in {len(chunks)} requests.")
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = [
+            executor.submit(request_id_list, chunk, rate_limiter, num_retries)
+            for chunk in chunks
+        ]
+        for chunk, future in zip(chunks, futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.warning(
+                    f"Failed to look up {len(chunk)} ids: {e}. Looking them "
+                    f"up in smaller requests."
+                )
+                results = request_id_list_bisecting(
+                    chunk, rate_limiter, num_retries
+                )
+            for result in results:
+                yield create_paper_from_arxiv(result)
+
+
+def request_page(query: str,
+                 offset: int,
+                 page_size: int,
+                 rate_limiter: HostRateLimiter,
+                 num_retries: int = 10) -> tuple[list[arxiv.Result], int]:
+    """
+    Return the results of the page at `offset` and the total number of
+    results reported by the feed.
+    """
+    search = arxiv.Search(query=query,
+                          sort_by=arxiv.SortCriterion.LastUpdatedDate)
+    # The API occasionally returns an empty result set for valid queries at
+    # any offset, the empty pages are retried.
+    return request_results(
+        search, offset, page_size, rate_limiter, num_retries,
+        retry_empty=True,
+    )
+
+
+def request_id_list(ids: list[str],
+                    rate_limiter: HostRateLimiter,
+                    num_retries: int = 10) -> list[arxiv.Result]:
+    search = arxiv.Search(id_list=ids, max_results=len(ids))
+    results, _ = request_results(
+        search, 0, len(ids), rate_limiter, num_retries, retry_empty=True
+    )
+    return results
+
+
+def request_id_list_bisecting(ids: list[str],
+                              rate_limiter: HostRateLimiter,
+                              num_retries: int = 10) -> list[arxiv.Result]:
+    """
+    Look up the halves of `ids` separately if one of them makes the whole
+    request fail (e.g., a malformed id is rejected with HTTP 400), skip the
+    ids which still fail on their own.
+    """
+    if len(ids) == 1:
+        try:
+            return request_id_list(ids, rate_limiter, num_retries)
+        except Exception as e:
+            logger.error(f"Failed to look up {ids[0]}, skip it: {e}")
+            return []
+    results: list[arxiv.Result] = []
+    middle = len(ids) // 2
+    for half in (ids[:middle], ids[middle:]):
+        try:
+            results.extend(request_id_list(half, rate_limiter, num_retries))
+        except Exception:
+            results.extend(
+                request_id_list_bisecting(half, rate_limiter, num_retries)
+            )
     return results
 
 
+def request_results(
+        search: arxiv.Search,
+        offset: int,
+        page_size: int,
+        rate_limiter: HostRateLimiter,
+        num_retries: int = 10,
+        retry_empty: bool = False) -> tuple[list[arxiv.Result], int]:
+    """
+    Request a single page of `search`. An empty page is retried if
+    `retry_empty` is set, unless the feed reports that `offset` is past the
+    end of the results.
+    """
+    # The retries are done below, one counted request is one real request.
+    client = arxiv.Client(page_size=page_size, num_retries=0)
+    # `Client.results` hides the total number of results and silently stops
+    # at an empty page, so the feed of the page is parsed directly. The
+    # parsed feed (`ParsedFeed`) requires arxiv>=4.
+    url = client._format_url(search, offset, page_size)
+    results: list[arxiv.Result] = []
+    total = 0
+    for i in range(num_retries):
+        rate_limiter.wait(ARXIV_API_URL)
+        count("http_requests")
+        try:
+            feed = client._parse_feed(url, first_page=True)
+        except Exception as e:
+            if i == num_retries - 1 or is_client_error(e):
+                raise
+            logger.error(
+                f"Failed to get the page at offset {offset}, retry "
+                f"{i + 1}/{num_retries - 1}. Error message: {e}"
+            )
+            continue
+        results = feed.results
+        total = feed.header.total_results
+        if len(results) or not retry_empty or 0 < total <= offset:
+            break
+        logger.warning(
+            f"Got an empty page at offset {offset}, retry "
+            f"{i + 1}/{num_retries - 1}."
+        )
+    return results, total
+
+
+def is_client_error(error: Exception) -> bool:
+    # The request is rejected for good, e.g., a malformed id in `id_list`.
+    return (
+        isinstance(error, arxiv.HTTPError)
+        and 400 <= error.status < 500 and error.status != 429
+    )
+
+
 def create_paper_from_arxiv(result: arxiv.Result):
     links = []
     for L in result.links:
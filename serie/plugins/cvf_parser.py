@@ -6,17 +6,20 @@ This script is designed to parse the papers from CVF Open Access.
 import os
 import re
 import time
-import requests
 import datetime
 import os.path as osp
+from concurrent.futures import ThreadPoolExecutor
 
-import bs4
+import requests
 import bibtexparser
 from tqdm import tqdm
-from bs4 import BeautifulSoup
 from bibtexparser.bibdatabase import BibDatabase
 
 from serie.utils.logging import create_logger
+from serie.utils.html import HTMLElement, parse_html
+from serie.utils.http import (
+    HostRateLimiter, HTTPCache, create_session, request_get
+)
 from serie.base.paper import Paper, Link, LinkEnum
 from serie.base.plugin import (
     BasePlugin, GlobalPluginData
@@ -28,6 +31,23 @@ BASE_URL = "https://openaccess.thecvf.com"
 
 
 class CVFParser(BasePlugin):
+    """
+    Parse the papers of a conference from CVF Open Access.
+
+    Args:
+        num_workers: Number of threads fetching the per-paper pages. All
+            workers share one keep-alive connection pool.
+        requests_per_second: Politeness budget per host, replacing the fixed
+            sleep after every downloaded page. A non-positive value disables
+            the limiter.
+        html_parser: The HTML parser backend, `fast` for the targeted
+            extractor or a BeautifulSoup feature such as `html5lib`.
+        cache_policy: `offline`, `revalidate` or `refresh`, see
+            `serie.utils.http.CachePolicy`.
+        cache_ttl: Seconds before a cached page is revalidated, None means
+            the cached pages never expire under the `revalidate` policy.
+    """
+
     def __init__(
             self,
             year: int,
@@ -35,6 +55,11 @@ class CVFParser(BasePlugin):
             output_directory: str,
             max_retries: int = 3,
             num_requested: int | None = None,
+            num_workers: int = 8,
+            requests_per_second: float = 2.0,
+            html_parser: str = "fast",
+            cache_policy: str = "revalidate",
+            cache_ttl: float | None = None,
             overwrite: bool = False,
             version: str = "",
             dependencies: list[str] | None = None,
@@ -45,7 +70,14 @@ class CVFParser(BasePlugin):
         self.output_directory = output_directory
         self.max_retries = max_retries
         self.num_requested = num_requested
+        self.num_workers = max(1, num_workers)
+        self.html_parser = html_parser
         self.url = osp.join(BASE_URL, f"{conference}{year}?day=all")
+        self.session = create_session(self.num_workers)
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.cache = HTTPCache(
+            osp.join(output_directory, "http_cache"), cache_policy, cache_ttl
+        )
         os.makedirs(self.output_directory, exist_ok=True)
 
     def process(self,
@@ -57,35 +89,63 @@ class CVFParser(BasePlugin):
             self.url,
             cache_file=osp.join(self.output_directory, "paper_list.html"),
             max_retries=self.max_retries,
+            session=self.session,
+            rate_limiter=self.rate_limiter,
+            backend=self.html_parser,
+            cache=self.cache,
         )
         paper_folder = osp.join(self.output_directory, "papers")
         os.makedirs(paper_folder, exist_ok=True)
-        pbar = tqdm(soup.find_all("dt", class_="ptitle"))
-        for count, dt in enumerate(pbar):
+        entries: list[tuple[str, str]] = []
+        for count, dt in enumerate(soup.find_all("dt", class_="ptitle")):
             if self.num_requested and count >= self.num_requested:
                 break
-            a: bs4.element.Tag = dt.find("a")  # type: ignore
+            a: HTMLElement = dt.find("a")  # type: ignore
             if a:
                 url: str = a["href"]  # type: ignore
                 url = osp.join(BASE_URL, url.lstrip("/"))
-                cache_path = osp.join(paper_folder, osp.basename(url))
-                info = parse_paper_info(url, cache_file=cache_path)
+                entries.append((url, a.text))
+
+        def fetch(url: str) -> dict[str, str]:
+            cache_path = osp.join(paper_folder, osp.basename(url))
+            return parse_paper_info(
+                url,
+                cache_file=cache_path,
+                session=self.session,
+                rate_limiter=self.rate_limiter,
+                backend=self.html_parser,
+                cache=self.cache,
+            )
+
+        # `executor.map` yields the results in the proceedings order.
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            infos = executor.map(fetch, [url for url, _ in entries])
+            for (url, text), info in tqdm(zip(entries, infos),
+                                          total=len(entries)):
                 if not info:
                     logger.warning_once(
                         f"Failed to parse paper info from {url}. "
                         f"Skipping this paper."
                     )
                     continue
-                info["title"] = info["title"] or a.text
+                info["title"] = info["title"] or text
                 info["url"] = url
                 paper = create_paper_from_cvf_data(info, date)
                 papers.append(paper)
+        logger.info(f"HTTP cache statistics: {self.cache.stats}")
         return papers
 
     def get_conference_date(self):
         url = osp.join(BASE_URL, f"{self.conference}{self.year}")
-        soup = request_html_content(url, max_retries=self.max_retries)
-        date_text: bs4.element.Tag = soup.find(
+        soup = request_html_content(
+            url,
+            max_retries=self.max_retries,
+            session=self.session,
+            rate_limiter=self.rate_limiter,
+            backend=self.html_parser,
+            cache=self.cache,
+        )
+        date_text: HTMLElement = soup.find(
             "a", string=lambda x: x and x.startswith("Day")  # type: ignore
         )
         default_date = f"{self.year}-01-01"
@@ -124,8 +184,15 @@ def parse_paper_info(
         url: str,
         cache_file: str | None = None,
         max_retries: int = 3,
-        sleep_time: int = 1) -> dict[str, str]:
-    soup = request_html_content(url, cache_file, max_retries, sleep_time)
+        sleep_time: int = 1,
+        session: requests.Session | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        backend: str = "fast",
+        cache: HTTPCache | None = None) -> dict[str, str]:
+    soup = request_html_content(
+        url, cache_file, max_retries, sleep_time, session, rate_limiter,
+        backend, cache,
+    )
     if soup is None:
         return {}
     abstract = soup.find(id="abstract")
@@ -180,22 +247,36 @@ def request_html_content(
         url: str,
         cache_file: str | None = None,
         max_retries: int = 3,
-        sleep_time: int = 1):
-    if cache_file and osp.exists(cache_file):
+        sleep_time: int = 1,
+        session: requests.Session | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        backend: str = "fast",
+        cache: HTTPCache | None = None):
+    if cache is not None:
+        # Adopt the loose cache files written by previous runs.
+        if cache_file and osp.exists(cache_file):
+            cache.import_file(url, cache_file)
+        txt = cache.fetch_text(
+            url,
+            session=session,
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+            sleep_time=sleep_time,
+        )
+        if txt is None:
+            logger.error(f"Failed to get {url}")
+            return None
+    elif cache_file and osp.exists(cache_file):
         with open(cache_file, "r") as f:
             txt = f.read()
     else:
-        response = None
-        for _ in range(max_retries):
-            try:
-                response = requests.get(url, timeout=10, allow_redirects=True)
-                response.raise_for_status()
-            except Exception as e:
-                logger.error(f"Failed to get {url}. Error message: {e}.\n"
-                             f"Retry after {sleep_time} seconds.")
-                time.sleep(sleep_time)
-                continue
-            break
+        response = request_get(
+            url,
+            session=session,
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+            sleep_time=sleep_time,
+        )
         if response is None:
             logger.error(f"Failed to get {url}")
             return None
@@ -203,9 +284,9 @@ def request_html_content(
         if cache_file:
             with open(cache_file, "w") as f:
                 f.write(txt)
-        if sleep_time:
+        if sleep_time and rate_limiter is None:
             time.sleep(sleep_time)
-    return BeautifulSoup(txt, "html5lib")
+    return parse_html(txt, backend)
 
 
 if __name__ == "__main__":
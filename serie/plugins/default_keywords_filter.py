@@ -2,7 +2,8 @@
 from dataclasses import dataclass
 from serie.utils.logging import create_logger
 from serie.base.plugin import (
-    BasePlugin, BaseKeywordsFilterData, GlobalPluginData
+    KEYWORDS_FILTER_DATA, BasePlugin, BaseKeywordsFilterData, ExecutionMode,
+    GlobalPluginData,
 )
 from serie.base.paper import Paper
 
@@ -53,6 +54,10 @@ class DefaultKeywordsFilter(BasePlugin):
         >>> plugin = DefaultKeywordsFilter(keywords, ignorance)
     """
 
+    execution_mode = ExecutionMode.PER_PAPER
+    reads = ("title", "abstract")
+    writes = ("DefaultKeywordsFilter", KEYWORDS_FILTER_DATA)
+
     def __init__(self,
                  keywords: dict[str, list[str]] | None = None,
                  ignorance: dict[str, list[str]] | None = None,
@@ -63,6 +68,8 @@ class DefaultKeywordsFilter(BasePlugin):
         super().__init__(overwrite, version, dependencies, **kwargs)
         self.keywords = keywords or {}
         self.ignorance = ignorance or {}
+        self.keywords_matcher = KeywordsMatcher(self.keywords)
+        self.ignorance_matcher = KeywordsMatcher(self.ignorance)
 
     def process(self,
                 papers: list[Paper],
@@ -77,29 +84,71 @@ class DefaultKeywordsFilter(BasePlugin):
         for paper in papers:
             plugin_data = paper.get_plugin_data(plugin_name())
             assert isinstance(plugin_data, DefaultKeywordsFilterData)
-            for keyword in self.keywords.keys():
-                subkeywords = self.keywords[keyword]
-                if any(check_paper_contains_keyword(paper, kw)
-                       for kw in subkeywords):
-                    if keyword not in plugin_data.keywords:
-                        plugin_data.keywords.append(keyword)
+            for keyword in self.keywords_matcher.match(paper):
+                if keyword not in plugin_data.keywords:
+                    plugin_data.keywords.append(keyword)
         return papers
 
     def process_ignorance(self, papers: list[Paper]):
         for paper in papers:
             plugin_data = paper.get_plugin_data(plugin_name())
             assert isinstance(plugin_data, DefaultKeywordsFilterData)
-            for keyword in self.ignorance.keys():
-                subkeywords = self.ignorance[keyword]
-                if any(check_paper_contains_keyword(paper, kw)
-                       for kw in subkeywords):
-                    if (
-                            keyword not in plugin_data.ignorance
-                            and keyword in plugin_data.keywords):
-                        plugin_data.ignorance.append(keyword)
+            for keyword in self.ignorance_matcher.match(paper):
+                if (
+                        keyword not in plugin_data.ignorance
+                        and keyword in plugin_data.keywords):
+                    plugin_data.ignorance.append(keyword)
         return papers
 
 
+class KeywordsMatcher:
+    """
+    Compiled form of `{keyword: [subkeyword1, subkeyword2, ...]}`, giving
+    the same result as calling `check_paper_contains_keyword` for every
+    subkeyword.
+
+    The subkeywords are split into AND groups (`a & b`) of lowercase
+    patterns once, and the patterns shared by several keywords (e.g., the
+    common ignore phrases) are deduplicated. Matching a paper lowercases its
+    title and abstract once and scans them once per distinct pattern, then
+    evaluates the AND groups from the set of found patterns.
+    """
+
+    def __init__(self, keywords: dict[str, list[str]]) -> None:
+        self.groups: dict[str, list[tuple[str, ...]]] = {}
+        patterns: dict[str, None] = {}
+        for keyword, subkeywords in keywords.items():
+            groups = []
+            for subkeyword in subkeywords:
+                if "&" in subkeyword:
+                    group = tuple(
+                        kw.strip().lower() for kw in subkeyword.split("&")
+                    )
+                else:
+                    group = (subkeyword.lower(), )
+                groups.append(group)
+                patterns.update(dict.fromkeys(group))
+            self.groups[keyword] = groups
+        self.patterns = list(patterns)
+
+    def match(self, paper: Paper) -> list[str]:
+        """
+        Return the keywords found in the paper, in the order of definition.
+        """
+        title = paper.title.lower()
+        abstract = paper.abstract.lower()
+        # Title and abstract are scanned separately, a pattern spanning both
+        # of them is not a match.
+        found = {
+            pattern for pattern in self.patterns
+            if pattern in abstract or pattern in title
+        }
+        return [
+            keyword for keyword, groups in self.groups.items()
+            if any(all(p in found for p in group) for group in groups)
+        ]
+
+
 def parse_keywords_for_papers(papers: list[Paper], keywords: list[str]):
     for paper in papers:
         paper.add_plugin_data(DefaultKeywordsFilterData())
@@ -3,10 +3,16 @@
 import os.path as osp
 from dataclasses import field, dataclass
 from glob import glob
+from concurrent.futures import ThreadPoolExecutor
 
+from serie.utils.http import HTTPCache
+from serie.utils.download import DownloadManager
 from serie.utils.logging import create_logger
-from serie.base.plugin import BasePlugin, BasePluginData, GlobalPluginData
+from serie.base.plugin import (
+    BasePlugin, BasePluginData, ExecutionMode, GlobalPluginData
+)
 from serie.base.paper import Link, LinkEnum, Paper, format_valid_title
+from serie.base.store import PDFStore
 from serie.base.constants import UNIQUE_PAPER_SIGNATURE
 
 
@@ -202,6 +208,10 @@ class DownloaderInformationCollectorData(BasePluginData):
 
 
 class DownloaderInformationCollector(BasePlugin):
+    execution_mode = ExecutionMode.PER_PAPER
+    reads = ()
+    writes = ("DownloaderInformationCollector", )
+
     def process(
             self, papers: list[Paper], global_plugin_data: GlobalPluginData):
         for paper in papers:
@@ -210,19 +220,61 @@ class DownloaderInformationCollector(BasePlugin):
 
 
 class Downloader(BasePlugin):
+    """
+    Download the papers marked by `DownloaderData.download`.
+
+    Args:
+        cache_directory: If set, the PDFs are fetched through the shared
+            HTTP cache stored in this directory.
+        cache_policy: `offline`, `revalidate` or `refresh`, see
+            `serie.utils.http.CachePolicy`.
+        cache_ttl: Seconds before a cached PDF is revalidated, None means
+            the cached PDFs never expire under the `revalidate` policy.
+        num_workers: The number of PDFs downloaded concurrently.
+        connections_per_host: The maximum number of concurrent downloads
+            from the same host.
+        max_retries: The number of retries of a failed download.
+        pdf_store_directory: If set, the PDFs are kept once in a
+            content-addressed store in this directory and `dir_pdf` holds
+            links to them, see `serie.base.store.PDFStore`.
+        pdf_link_mode: `hardlink` or `symlink`, how `dir_pdf` links to the
+            store.
+    """
+
     def __init__(self,
                  dir_pdf: str = "",
                  dir_code: str = "",
                  dir_markdown_note: str = "",
+                 cache_directory: str = "",
+                 cache_policy: str = "revalidate",
+                 cache_ttl: float | None = None,
+                 num_workers: int = 8,
+                 connections_per_host: int = 2,
+                 max_retries: int = 5,
+                 pdf_store_directory: str = "",
+                 pdf_link_mode: str = "hardlink",
                  overwrite: bool = False,
                  *args, **kwargs) -> None:
         super().__init__(overwrite, *args, **kwargs)
         self.dir_pdf = dir_pdf
         self.dir_code = dir_code
         self.dir_markdown_note = dir_markdown_note
+        self.store = None
+        if pdf_store_directory:
+            self.store = PDFStore(pdf_store_directory, pdf_link_mode)
+        self.cache = None
+        if cache_directory:
+            self.cache = HTTPCache(cache_directory, cache_policy, cache_ttl)
+        self.num_workers = num_workers
+        self.downloader = DownloadManager(
+            connections_per_host=connections_per_host,
+            max_retries=max_retries,
+            pool_size=num_workers,
+        )
 
     def process(
             self, papers: list[Paper], global_plugin_data: GlobalPluginData):
+        to_download: list[Paper] = []
         for paper in papers:
             data = paper.get_plugin_data(DownloaderData.plugin_name)
             assert isinstance(data, DownloaderData)
@@ -235,8 +287,15 @@ class Downloader(BasePlugin):
             if not pdf_url:
                 logger.warning(f"Paper {paper.title} has no pdf url.")
                 continue
-            if self.dir_pdf:
-                paper.download(LinkEnum.PDF, folder=self.dir_pdf)
+            to_download.append(paper)
+        if self.dir_pdf:
+            download_pdfs(
+                to_download, self.dir_pdf, self.num_workers,
+                self.downloader, self.cache, self.store,
+            )
+        for paper in to_download:
+            data = paper.get_plugin_data(DownloaderData.plugin_name)
+            assert isinstance(data, DownloaderData)
             if self.dir_code:
                 paper.download(LinkEnum.CODE, folder=self.dir_code)
             if not self.dir_markdown_note:
@@ -250,21 +309,41 @@ class Downloader(BasePlugin):
 
 
 class DownloaderGivenMarkdown(BasePlugin):
+    """
+    Download the papers checked in the markdown files, see `Downloader` for
+    the arguments.
+    """
+
     def __init__(self,
                  dir_markdown_src: str = "",
                  dir_pdf: str = "",
                  dir_code: str = "",
                  dir_markdown_note: str = "",
+                 num_workers: int = 8,
+                 connections_per_host: int = 2,
+                 max_retries: int = 5,
+                 pdf_store_directory: str = "",
+                 pdf_link_mode: str = "hardlink",
                  overwrite: bool = False,
                  *args, **kwargs) -> None:
         super().__init__(overwrite, *args, **kwargs)
         self.dir_markdown_src = dir_markdown_src
+        self.store = None
+        if pdf_store_directory:
+            self.store = PDFStore(pdf_store_directory, pdf_link_mode)
         self.dir_pdf = dir_pdf
         self.dir_code = dir_code
         self.dir_markdown_note = dir_markdown_note
+        self.num_workers = num_workers
+        self.downloader = DownloadManager(
+            connections_per_host=connections_per_host,
+            max_retries=max_retries,
+            pool_size=num_workers,
+        )
 
     def process(
             self, papers: list[Paper], global_plugin_data: GlobalPluginData):
+        to_download: list[Paper] = []
         for paper in papers:
             data = paper.get_plugin_data(
                 DownloaderGivenMarkdownData.plugin_name
@@ -279,8 +358,12 @@ class DownloaderGivenMarkdown(BasePlugin):
             if not pdf_url:
                 logger.warning(f"Paper {paper.title} has no pdf url.")
                 continue
-            if self.dir_pdf:
-                paper.download(LinkEnum.PDF, folder=self.dir_pdf)
+            to_download.append(paper)
+        if self.dir_pdf:
+            download_pdfs(
+                to_download, self.dir_pdf, self.num_workers,
+                self.downloader, store=self.store,
+            )
         return papers
 
     def parse_file_then_download(self, path: str, papers: list[Paper]):
@@ -308,7 +391,9 @@ class DownloaderGivenMarkdown(BasePlugin):
                     logger.warning(f"Paper {paper.title} has no pdf url.")
                     continue
                 if self.dir_pdf:
-                    paper.download(LinkEnum.PDF, folder=self.dir_pdf)
+                    download_pdf(
+                        paper, self.dir_pdf, self.downloader, store=self.store
+                    )
                 if self.dir_code:
                     paper.download(LinkEnum.CODE, folder=self.dir_code)
                 save_markdown_note(
@@ -322,6 +407,52 @@ class DownloaderGivenMarkdown(BasePlugin):
         return paths
 
 
+def download_pdf(paper: Paper,
+                 folder: str,
+                 downloader: DownloadManager,
+                 cache: HTTPCache | None = None,
+                 store: PDFStore | None = None) -> str:
+    """
+    Download the PDF of the paper into `folder`, through `store` if given.
+    Return the path, empty on failure.
+    """
+    if store is None:
+        return paper.download(
+            LinkEnum.PDF, folder=folder, cache=cache, downloader=downloader
+        )
+    return store.fetch(
+        paper, folder,
+        lambda path: paper.download(
+            LinkEnum.PDF, folder=osp.dirname(path),
+            filename=osp.basename(path), cache=cache, downloader=downloader,
+        ),
+    )
+
+
+def download_pdfs(papers: list[Paper],
+                  folder: str,
+                  num_workers: int,
+                  downloader: DownloadManager,
+                  cache: HTTPCache | None = None,
+                  store: PDFStore | None = None) -> list[str]:
+    """
+    Download the PDFs of the papers concurrently, the per-host limits are
+    enforced by `downloader`. Return the paths, empty for the failures.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        paths = list(executor.map(
+            lambda paper: download_pdf(
+                paper, folder, downloader, cache, store
+            ),
+            papers,
+        ))
+    failures = sum(1 for path in paths if not path)
+    logger.info(
+        f"Downloaded {len(paths) - failures} of {len(paths)} PDFs to {folder}."
+    )
+    return paths
+
+
 def save_markdown_note(dir_markdown_note: str, title: str, content: str):
     path = osp.join(dir_markdown_note, f"{title}.md")
     if not osp.exists(path):
@@ -6,17 +6,16 @@ This script is designed to parse the papers from CVF Open Access.
 import os
 import re
 import time
-import requests
 import datetime
 import os.path as osp
 
-import bs4
 import bibtexparser
 from tqdm import tqdm
-from bs4 import BeautifulSoup, Tag
 from bibtexparser.bibdatabase import BibDatabase
 
 from serie.utils.logging import create_logger
+from serie.utils.html import HTMLElement, parse_html
+from serie.utils.http import HostRateLimiter, HTTPCache, request_get
 from serie.base.paper import Paper, Link, LinkEnum
 from serie.base.plugin import (
     BasePlugin, GlobalPluginData
@@ -28,6 +27,18 @@ BASE_URL = "https://www.ecva.net"
 
 
 class ECCVParser(BasePlugin):
+    """
+    Parse the papers of ECCV from the ECVA website.
+
+    Args:
+        requests_per_second: Politeness budget for the pages that are not
+            served by the cache.
+        cache_policy: `offline`, `revalidate` or `refresh`, see
+            `serie.utils.http.CachePolicy`.
+        cache_ttl: Seconds before a cached page is revalidated, None means
+            the cached pages never expire under the `revalidate` policy.
+    """
+
     def __init__(
             self,
             year: int,
@@ -36,6 +47,10 @@ class ECCVParser(BasePlugin):
             paper_online_date: str,
             max_retries: int = 10,
             num_requested: int | None = None,
+            html_parser: str = "fast",
+            requests_per_second: float = 1.0,
+            cache_policy: str = "revalidate",
+            cache_ttl: float | None = None,
             overwrite: bool = False,
             version: str = "",
             dependencies: list[str] | None = None,
@@ -50,7 +65,12 @@ class ECCVParser(BasePlugin):
         self.paper_online_date = paper_online_date
         self.max_retries = max_retries
         self.num_requested = num_requested
+        self.html_parser = html_parser
         self.url = "https://www.ecva.net/papers.php"
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.cache = HTTPCache(
+            osp.join(output_directory, "http_cache"), cache_policy, cache_ttl
+        )
         os.makedirs(self.output_directory, exist_ok=True)
 
     def process(self,
@@ -63,10 +83,19 @@ class ECCVParser(BasePlugin):
                 self.output_directory, f"eccv_{self.year}_paper_list.html"
             ),
             max_retries=self.max_retries,
+            backend=self.html_parser,
+            cache=self.cache,
+            rate_limiter=self.rate_limiter,
         )
         paper_folder = osp.join(self.output_directory, "papers")
         os.makedirs(paper_folder, exist_ok=True)
-        pbar = tqdm(soup.select(f'dt.ptitle a[href*="eccv_{self.year}"]'))
+        # Equivalent to the selector `dt.ptitle a[href*="eccv_{year}"]`.
+        anchors: list[HTMLElement] = [
+            a for dt in soup.find_all("dt", class_="ptitle")
+            for a in dt.find_all("a")
+            if f"eccv_{self.year}" in a.get("href", "")
+        ]
+        pbar = tqdm(anchors)
         for count, dt in enumerate(pbar):
             if self.num_requested and count >= self.num_requested:
                 break
@@ -75,17 +104,30 @@ class ECCVParser(BasePlugin):
             url: str = dt["href"]  # type: ignore
             url = osp.join(BASE_URL, url.lstrip("/"))
             cache_path = osp.join(paper_folder, osp.basename(url))
-            info = parse_paper_info(url, cache_file=cache_path)
+            info = parse_paper_info(
+                url,
+                cache_file=cache_path,
+                backend=self.html_parser,
+                cache=self.cache,
+                rate_limiter=self.rate_limiter,
+            )
             info["url"] = url
             info["conference"] = self.conference
             paper = create_paper_from_eccv(info, date)
             papers.append(paper)
+        logger.info(f"HTTP cache statistics: {self.cache.stats}")
         return papers
 
     def get_conference_date(self):
         url = osp.join(BASE_URL, f"{self.conference}{self.year}")
-        soup = request_html_content(url, max_retries=self.max_retries)
-        date_text: bs4.element.Tag = soup.find(
+        soup = request_html_content(
+            url,
+            max_retries=self.max_retries,
+            backend=self.html_parser,
+            cache=self.cache,
+            rate_limiter=self.rate_limiter,
+        )
+        date_text: HTMLElement = soup.find(
             "a", string=lambda x: x and x.startswith("Day")  # type: ignore
         )
         default_date = f"{self.year}-01-01"
@@ -125,9 +167,15 @@ def parse_paper_info(
         url: str,
         cache_file: str | None = None,
         max_retries: int = 3,
-        sleep_time: int = 1) -> dict[str, str]:
+        sleep_time: int = 1,
+        backend: str = "fast",
+        cache: HTTPCache | None = None,
+        rate_limiter: HostRateLimiter | None = None) -> dict[str, str]:
     entries = {}
-    soup = request_html_content(url, cache_file, max_retries, sleep_time)
+    soup = request_html_content(
+        url, cache_file, max_retries, sleep_time, backend, cache,
+        rate_limiter,
+    )
     ids = ("papertitle", "abstract", "authors")
     entries.update({i: "" for i in ids})
     for i in ids:
@@ -140,7 +188,7 @@ def parse_paper_info(
         else:
             entries[i.replace("paper", "")] = tag.get_text(strip=True)
 
-    links: bs4.ResultSet[Tag] = soup.find_all("a")  # type: ignore
+    links: list[HTMLElement] = soup.find_all("a")  # type: ignore
     ids = ("pdf", "supplementary", "doi")
     entries.update({i: "" for i in ids})
     for link in links:
@@ -176,31 +224,41 @@ def request_html_content(
         url: str,
         cache_file: str | None = None,
         max_retries: int = 3,
-        sleep_time: int = 1):
-    if cache_file and osp.exists(cache_file):
+        sleep_time: int = 1,
+        backend: str = "fast",
+        cache: HTTPCache | None = None,
+        rate_limiter: HostRateLimiter | None = None):
+    if cache is not None:
+        # Adopt the loose cache files written by previous runs.
+        if cache_file and osp.exists(cache_file):
+            cache.import_file(url, cache_file)
+        txt = cache.fetch_text(
+            url,
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+            sleep_time=sleep_time,
+        )
+        if txt is None:
+            raise ValueError(f"Failed to get {url}")
+    elif cache_file and osp.exists(cache_file):
         with open(cache_file, "r") as f:
             txt = f.read()
     else:
-        response = None
-        for _ in range(max_retries):
-            try:
-                response = requests.get(url, timeout=10, allow_redirects=True)
-                response.raise_for_status()
-            except Exception as e:
-                logger.error(f"Failed to get {url}. Error message: {e}.\n"
-                             f"Retry after {sleep_time} seconds.")
-                time.sleep(sleep_time)
-                continue
-            break
+        response = request_get(
+            url,
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+            sleep_time=sleep_time,
+        )
         if response is None:
             raise ValueError(f"Failed to get {url}")
         txt = response.text
         if cache_file:
             with open(cache_file, "w") as f:
                 f.write(txt)
-        if sleep_time:
+        if sleep_time and rate_limiter is None:
             time.sleep(sleep_time)
-    return BeautifulSoup(txt, "html5lib")
+    return parse_html(txt, backend)
 
 
 if __name__ == "__main__":
@@ -2,7 +2,9 @@
 import re
 from dataclasses import dataclass
 
-from serie.base.plugin import BasePlugin, BasePluginData, GlobalPluginData
+from serie.base.plugin import (
+    BasePlugin, BasePluginData, ExecutionMode, GlobalPluginData
+)
 from serie.base.paper import LinkEnum, Paper, Link
 
 
@@ -21,6 +23,10 @@ class GitHubLinkParserData(BasePluginData):
 
 
 class GitHubLinkParser(BasePlugin):
+    execution_mode = ExecutionMode.PER_PAPER
+    reads = ("abstract", "comment")
+    writes = ("GitHubLinkParser", "links")
+
     def process(self,
                 papers: list[Paper],
                 global_plugin_data: GlobalPluginData) -> list[Paper]:
@@ -1,10 +1,11 @@
 
+import re
 from dataclasses import dataclass
 
 from serie.utils.logging import create_logger
 from serie.base.plugin import (
-    BasePlugin, BaseKeywordsFilterData, BasePluginData, PluginStatus,
-    GlobalPluginData,
+    KEYWORDS_FILTER_DATA, BasePlugin, BaseKeywordsFilterData, BasePluginData,
+    ExecutionMode, GlobalPluginData, fingerprint,
 )
 from serie.base.paper import Paper
 from serie.core.agent import Agent, TaskMode
@@ -52,20 +53,72 @@ def default_prompt_template():
     )
 
 
+def default_multi_topic_prompt_template():
+    return (
+        ""
+        "# Task Description\n"
+        "You are given a research paper's title and abstract as inputs, "
+        "and a list of topics, each one has an interested topic and a "
+        "discarded topic. Your task is to determine, for every topic, "
+        "whether the paper is falling into its interested topic.\n\n"
+
+        # Requirements
+        "# Task Requirements\n"
+        "- Please first provide a clear analysis "
+        "based on the title and abstract;\n"
+
+        "- You shouldn't try to guess the content not appear in "
+        "the provided text;\n"
+
+        "- Judge every topic independently, and finish with exactly one "
+        "result per topic, where KEY is the key of the topic;\n"
+
+        "- If the paper is related to the interested topic, "
+        "return <-|TOPIC: KEY|RESULT: TRUE|->;\n"
+
+        "- If the paper is related to the discarded topic, "
+        "return <-|TOPIC: KEY|RESULT: FALSE|->, even if the paper is also "
+        "related to the interested topic;\n"
+
+        "- If the paper does not fall into the interested scope, return "
+        "<-|TOPIC: KEY|RESULT: FALSE|->;\n\n"
+
+        # Title and Abstract
+        "# Task Input\n"
+        "## Topics\n{topics}\n\n"
+        "## Title\n{title}\n\n"
+        "## Abstract\n{abstract}"
+    )
+
+
+MULTI_TOPIC_RESULT_PATTERN = re.compile(
+    r"<-\|TOPIC:\s*(.+?)\s*\|\s*RESULT:\s*(TRUE|FALSE)\s*\|->"
+)
+
+
 @dataclass
 class LanguageModelBasedKeywordsFilterData(BaseKeywordsFilterData):
     plugin_name: str = plugin_name()
+    model: str = ""
 
 
 class LanguageModelBasedKeywordsFilter(BasePlugin):
     """
-    This plugin is used to parse keywords from the papers.
+    This plugin is used to parse keywords from the papers. The papers are
+    tracked (see `BasePlugin`), a paper classified by the same model with the
+    same topics is skipped unless `overwrite` is set.
 
     Args:
         model: The model used to tell if a paper is related to a specific task.
         batch_mode: If True, the plugin will process the papers in batch.
         topics: A dictionary of topics, the key of the dict is the specified
             keyword, and the value is the related topic to be analyzed.
+        bypass_response_cache: If True, request the model even if the
+            response of a prompt is cached by the agent.
+        multi_topic_mode: If True, every paper is sent once with all the
+            topics and the model returns a verdict per topic, instead of one
+            prompt per (topic, paper). The topics missing from a response
+            are asked again one by one.
 
     Examples:
         >>> topics = {
@@ -74,6 +127,12 @@ class LanguageModelBasedKeywordsFilter(BasePlugin):
         ... }
     """
 
+    track_papers = True
+    execution_mode = ExecutionMode.PER_BATCH
+    # `requires_processing` reads the data of the keywords filters before.
+    reads = ("title", "abstract", KEYWORDS_FILTER_DATA)
+    writes = ("LanguageModelBasedKeywordsFilter", KEYWORDS_FILTER_DATA)
+
     def __init__(
             self,
             model: str,
@@ -83,35 +142,53 @@ class LanguageModelBasedKeywordsFilter(BasePlugin):
             discarded_topics: dict[str, str],
             max_workers: int = 16,
             max_tasks_per_minute: int = 16,
+            bypass_response_cache: bool = False,
+            multi_topic_mode: bool = False,
             overwrite: bool = False,
             version: str = "",
             dependencies: list[str] | None = None,
             **kwargs) -> None:
         super().__init__(overwrite, version, dependencies, **kwargs)
-        self.agent = Agent(model)
+        self.agent = Agent(model, bypass_response_cache)
         self.batch_mode = batch_mode
+        self.execution_mode = self.resolve_execution_mode(
+            batch_mode=batch_mode
+        )
         self.concurrent_mode = concurrent_mode
         self.interested_topics = interested_topics
         self.discarded_topics = discarded_topics
         self.max_workers = max_workers
         self.max_tasks_per_minute = max_tasks_per_minute
+        self.multi_topic_mode = multi_topic_mode
 
-    def check_status(
-            self, papers: list[Paper], global_plugin_data: GlobalPluginData):
-        datas = [p.get_plugin_data(plugin_name()) for p in papers]
-        keywords = []
-        for d in datas:
-            if isinstance(d, LanguageModelBasedKeywordsFilterData):
-                if len(d.keywords) > 0:
-                    keywords.extend(d.keywords)
-        if len(keywords) > 0:
-            self.status = PluginStatus.DONE
-            return
+    @classmethod
+    def resolve_execution_mode(
+            cls, batch_mode: bool = False, **kwargs) -> ExecutionMode:
+        # A streamed batch mode would submit a Batch API job per batch.
+        if batch_mode:
+            return ExecutionMode.BARRIER
+        return cls.execution_mode
+
+    def paper_fingerprint(self, paper: Paper) -> str:
+        return fingerprint(
+            self.version, self.agent.model, self.interested_topics,
+            self.discarded_topics, paper.title, paper.abstract,
+        )
+
+    def paper_succeeded(
+            self, paper: Paper, plugin_data: BasePluginData) -> bool:
+        assert isinstance(plugin_data, LanguageModelBasedKeywordsFilterData)
+        return plugin_data.model == self.agent.model
 
     def process(
             self, papers: list[Paper], global_plugin_data: GlobalPluginData):
         for paper in papers:
-            paper.add_plugin_data(LanguageModelBasedKeywordsFilterData())
+            # The papers processed again start from scratch.
+            paper.reset_plugin_data(
+                LanguageModelBasedKeywordsFilterData(model=self.agent.model)
+            )
+        if self.multi_topic_mode:
+            return self.process_multi_topic(papers, global_plugin_data)
         if self.batch_mode or self.concurrent_mode:
             return self.process_batch(papers, global_plugin_data)
         else:
@@ -140,23 +217,85 @@ class LanguageModelBasedKeywordsFilter(BasePlugin):
         logger.info("Processing responses ...")
         keywords = list(self.interested_topics.keys())
         for i, r in enumerate(responses):
-            if "<-|RESULT: TRUE|->" in r or "<-|RESULT: FALSE|->" not in r:
-                paper = papers_to_process[i % N]
-                if "<-|RESULT: TRUE|->" not in r:
-                    logger.warning(
-                        f"The model doesn't output valid result, the paper "
-                        f"will be marked as related.\n\n"
-                        f"Model Prompt: {prompts[i]}\n\n"
-                        f"Model Response: {r}\n\n"
-                        f"Model: {self.agent.model}\n"
-                    )
-                plugin = paper.get_plugin_data(plugin_name())
-                assert isinstance(plugin, LanguageModelBasedKeywordsFilterData)
-                plugin.keywords.append(keywords[i // N])
-            elif "<-|RESULT: FALSE|->" in r:
-                pass
+            self.apply_topic_response(
+                papers_to_process[i % N], keywords[i // N], prompts[i], r
+            )
+        return papers
+
+    def process_multi_topic(
+            self, papers: list[Paper], global_plugin_data: GlobalPluginData):
+        papers_to_process = [
+            r for r in papers if self.requires_processing(r)
+        ]
+        if len(papers_to_process) == 0:
+            return papers
+        N = len(papers_to_process)
+        logger.info(
+            f"Processing {N} papers with {len(self.interested_topics)} "
+            f"topics per prompt ..."
+        )
+        prompts = prepare_multi_topic_prompts(
+            papers_to_process, self.interested_topics, self.discarded_topics
+        )
+        responses = self.complete(prompts)
+        keywords = list(self.interested_topics.keys())
+        fallback: list[tuple[Paper, str]] = []
+        for paper, r in zip(papers_to_process, responses):
+            verdicts = parse_multi_topic_response(r)
+            plugin = paper.get_plugin_data(plugin_name())
+            assert isinstance(plugin, LanguageModelBasedKeywordsFilterData)
+            for keyword in keywords:
+                if keyword not in verdicts:
+                    fallback.append((paper, keyword))
+                elif verdicts[keyword]:
+                    plugin.keywords.append(keyword)
+        if len(fallback) == 0:
+            return papers
+        logger.warning(
+            f"The model doesn't output valid results of {len(fallback)} "
+            f"(paper, topic) pairs, asking them one by one ..."
+        )
+        prompts = [
+            prepare_prompts(
+                [paper],
+                self.interested_topics[keyword],
+                self.discarded_topics.get(keyword, ""),
+            )[0]
+            for paper, keyword in fallback
+        ]
+        responses = self.complete(prompts)
+        for (paper, keyword), prompt, r in zip(fallback, prompts, responses):
+            self.apply_topic_response(paper, keyword, prompt, r)
+        # Keep the order of the topics regardless of the fallback.
+        for paper in papers_to_process:
+            plugin = paper.get_plugin_data(plugin_name())
+            assert isinstance(plugin, LanguageModelBasedKeywordsFilterData)
+            plugin.keywords.sort(key=keywords.index)
         return papers
 
+    def complete(self, prompts: list[str]) -> list[str]:
+        if self.batch_mode or self.concurrent_mode:
+            mode = TaskMode.BATCH if self.batch_mode else TaskMode.CONCURRENT
+            responses = self.agent(prompts, mode=mode)
+            return [responses] if isinstance(responses, str) else responses
+        return [self.agent.complete_single(prompt) for prompt in prompts]
+
+    def apply_topic_response(
+            self, paper: Paper, keyword: str, prompt: str, response: str):
+        r = response
+        if "<-|RESULT: TRUE|->" in r or "<-|RESULT: FALSE|->" not in r:
+            if "<-|RESULT: TRUE|->" not in r:
+                logger.warning(
+                    f"The model doesn't output valid result, the paper "
+                    f"will be marked as related.\n\n"
+                    f"Model Prompt: {prompt}\n\n"
+                    f"Model Response: {r}\n\n"
+                    f"Model: {self.agent.model}\n"
+                )
+            plugin = paper.get_plugin_data(plugin_name())
+            assert isinstance(plugin, LanguageModelBasedKeywordsFilterData)
+            plugin.keywords.append(keyword)
+
     def process_single(
             self, papers: list[Paper], global_plugin_data: GlobalPluginData):
         papers_to_process = [
@@ -195,8 +334,11 @@ class LanguageModelBasedKeywordsFilter(BasePlugin):
         return papers
 
     def requires_processing(self, paper: Paper):
-        plugin_datas: dict[str, BasePluginData] = paper.local_plugin_data
-        for data in plugin_datas.values():
+        # A copy, the plugins running concurrently may add their data.
+        plugin_datas: list[BasePluginData] = list(
+            paper.local_plugin_data.values()
+        )
+        for data in plugin_datas:
             if isinstance(data, BaseKeywordsFilterData):
                 if data.plugin_name == plugin_name():
                     continue
@@ -229,3 +371,33 @@ def prepare_prompts(
             title=paper.title, abstract=paper.abstract)
         total_prompts.append(prompt)
     return total_prompts
+
+
+def prepare_multi_topic_prompts(
+        papers: list[Paper],
+        interested_topics: dict[str, str],
+        discarded_topics: dict[str, str]):
+    topics = "\n".join([
+        f"### KEY: {keyword}\n"
+        f"- Interested Topic: {interested}\n"
+        f"- Discarded Topic: {discarded_topics.get(keyword, '')}"
+        for keyword, interested in interested_topics.items()
+    ])
+    total_prompts: list[str] = []
+    for paper in papers:
+        prompt = default_multi_topic_prompt_template()
+        prompt = prompt.format(
+            topics=topics, title=paper.title, abstract=paper.abstract)
+        total_prompts.append(prompt)
+    return total_prompts
+
+
+def parse_multi_topic_response(response: str) -> dict[str, bool]:
+    """
+    Return the verdict of every topic key found in the response, the last
+    verdict wins if the model repeats a topic.
+    """
+    return {
+        keyword: result == "TRUE"
+        for keyword, result in MULTI_TOPIC_RESULT_PATTERN.findall(response)
+    }
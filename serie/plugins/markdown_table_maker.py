@@ -1,4 +1,5 @@
 
+from typing import IO, Iterable, Iterator
 from dataclasses import dataclass
 from serie.base.plugin import BasePlugin, BasePluginData, GlobalPluginData
 from serie.base.paper import Paper
@@ -26,31 +27,76 @@ class MarkdownTableMakerData(BasePluginData):
 
 
 class MarkdownTableMaker(BasePlugin):
+    """
+    Make a markdown table of the papers.
+
+    Args:
+        defer_rendering: If True, only the headers are kept in the global
+            plugin data and `ResultSaver` streams the rows into the file,
+            instead of keeping the rendered table in memory.
+        cache_rows: If True, the row of a paper (by its url) is rendered once
+            and reused by all the tables made by this instance.
+    """
+
+    reads = ("title", "primary_category", "url", "links")
+    writes = ("MarkdownTableMaker", )
+
+    def __init__(self,
+                 defer_rendering: bool = False,
+                 cache_rows: bool = False,
+                 overwrite: bool = False,
+                 version: str = "",
+                 dependencies: list[str] | None = None,
+                 **kwargs) -> None:
+        super().__init__(overwrite, version, dependencies, **kwargs)
+        self.defer_rendering = defer_rendering
+        self.row_cache: dict[str, str] | None = {} if cache_rows else None
+
     def process(self,
                 papers: list[Paper],
                 global_plugin_data: GlobalPluginData):
-        table = self.make_table(papers)
+        if self.defer_rendering:
+            table = {"headers": table_header()}
+        else:
+            table = self.make_table(papers)
         global_plugin_data.data[MarkdownTableMakerData.plugin_name] = table
         return papers
 
     def make_table(self,
                    papers: list[Paper],
                    headers: list[str] | None = None) -> str:
-        if headers is None:
-            headers = table_header()
+        return "".join(self.iter_rows(papers, headers))
 
-        table = f"| Index | {' | '.join(headers)} |\n"
-        table += f"| --- | {' | '.join(['---' for _ in headers])} |\n"
+    def write_table(self,
+                    fp: IO[str],
+                    papers: Iterable[Paper],
+                    headers: list[str] | None = None):
+        fp.writelines(self.iter_rows(papers, headers))
 
+    def iter_rows(self,
+                  papers: Iterable[Paper],
+                  headers: list[str] | None = None) -> Iterator[str]:
+        """
+        Yield the lines of the table, the headers first.
+        """
+        if headers is None:
+            headers = table_header()
+        yield f"| Index | {' | '.join(headers)} |\n"
+        yield f"| --- | {' | '.join(['---' for _ in headers])} |\n"
         for idx, paper in enumerate(papers):
-            code_link: str = paper.code_link.href
-            row = [
-                str(idx + 1),
-                f"[[#{paper.title}]]",
-                paper.primary_category,
-                paper.url.href,
-                code_link
-            ]
-            table += f"| {' | '.join(row)} |\n"
-
-        return table
+            yield f"| {idx + 1} | {self.render_cells(paper)} |\n"
+
+    def render_cells(self, paper: Paper) -> str:
+        if self.row_cache is not None:
+            cells = self.row_cache.get(paper.url.href)
+            if cells is not None:
+                return cells
+        cells = " | ".join([
+            f"[[#{paper.title}]]",
+            paper.primary_category,
+            paper.url.href,
+            paper.code_link.href,
+        ])
+        if self.row_cache is not None:
+            self.row_cache[paper.url.href] = cells
+        return cells
@@ -4,13 +4,24 @@ This script is designed to parse the papers from OpenReview.
 """
 
 import os
+import time
+import json
+import random
+import itertools
+import os.path as osp
+from collections import deque
 from datetime import datetime
+from typing import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import openreview
 from tqdm import tqdm
 from openreview.api import OpenReviewClient, Note
 
+from serie.utils.http import HostRateLimiter
+from serie.utils.io import dumps_line, iter_jsonl, open_binary
 from serie.utils.logging import create_logger
+from serie.utils.metrics import count
 from serie.base.paper import Paper, Link, LinkEnum
 from serie.base.plugin import (
     BasePlugin, GlobalPluginData
@@ -19,9 +30,159 @@ from serie.base.plugin import (
 
 logger = create_logger(__name__)
 BASE_URL = "https://api2.openreview.net"
+BASE_URL_V1 = "https://api.openreview.net"
+
+
+class OpenReviewHarvester:
+    """
+    Stream the notes of a venue from OpenReview.
+
+    A full harvest requests the pages sorted by `id`, which editing a note
+    does not change, up to the number of notes reported by the first page.
+    The pages are requested concurrently by up to `max_workers` and yielded
+    in order as soon as they arrive.
+
+    An incremental harvest requests the most recently modified notes first
+    and stops at the first note not modified after `since`. Editing a note
+    meanwhile moves it to the head and shifts the offsets of the others, so
+    the head is checked again at the end.
+
+    Once the notes are consumed, `total` is the number of notes reported by
+    OpenReview and `consistent` tells whether no note may have been skipped.
+
+    Args:
+        fetch_notes: `fetch_notes(**params)` returns the notes of the venue
+            given the paging parameters of `get_notes` (`offset`, `limit`,
+            `sort` and `with_count`).
+        page_size: The number of notes of a page.
+        max_workers: The number of pages requested concurrently.
+        requests_per_second: Politeness limit, a non-positive value disables
+            it.
+        max_retries: The number of retries of a failed page.
+    """
+
+    def __init__(self,
+                 fetch_notes: Callable[..., list | tuple[list, int]],
+                 page_size: int = 1000,
+                 max_workers: int = 4,
+                 requests_per_second: float = 2.0,
+                 max_retries: int = 3) -> None:
+        self.fetch_notes = fetch_notes
+        self.page_size = page_size
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.max_retries = max_retries
+        self.total = 0
+        self.consistent = False
+
+    def iter_notes(self, since: int = 0) -> Iterator[Note | openreview.Note]:
+        """
+        Yield the notes modified after `since`, a timestamp in milliseconds,
+        or all the notes if it is 0.
+        """
+        self.total, self.consistent = 0, False
+        if since:
+            yield from self.iter_modified_notes(since)
+        else:
+            yield from self.iter_all_notes()
+
+    def iter_all_notes(self) -> Iterator[Note | openreview.Note]:
+        # `get_notes` only returns the count without an offset.
+        notes, self.total = self.fetch_with_retries(
+            limit=self.page_size, sort="id", with_count=True,
+        )
+        seen: set[str] = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pages = executor.map(
+                lambda offset: self.fetch_with_retries(
+                    offset=offset, limit=self.page_size, sort="id",
+                ),
+                range(self.page_size, self.total, self.page_size),
+            )
+            for page in itertools.chain([notes], pages):
+                for note in page:
+                    if note.id not in seen:
+                        seen.add(note.id)
+                        yield note
+        self.consistent = len(seen) >= self.total
+
+    def iter_modified_notes(
+            self, since: int) -> Iterator[Note | openreview.Note]:
+        notes, self.total = self.fetch_with_retries(
+            limit=self.page_size, sort="tmdate:desc", with_count=True,
+        )
+        latest = max((note.tmdate for note in notes), default=0)
+        seen: set[str] = set()
+        offset = self.page_size
+        # An incremental harvest usually ends within the first pages, so the
+        # waves of concurrent requests start small and grow.
+        wave = 1
+        reached = False
+        pending: deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                modified = [note for note in notes if note.tmdate > since]
+                for note in modified:
+                    if note.id not in seen:
+                        seen.add(note.id)
+                        yield note
+                if len(modified) < len(notes) or offset >= self.total:
+                    reached = True
+                    break
+                if not notes:
+                    # An empty page before the end, some notes are missing.
+                    break
+                while len(pending) < wave and offset < self.total:
+                    pending.append(executor.submit(
+                        self.fetch_with_retries, offset=offset,
+                        limit=self.page_size, sort="tmdate:desc",
+                    ))
+                    offset += self.page_size
+                wave = min(2 * wave, self.max_workers)
+                notes = pending.popleft().result()
+            for future in pending:
+                future.cancel()
+        head = self.fetch_with_retries(limit=1, sort="tmdate:desc")
+        self.consistent = reached and all(
+            note.tmdate <= latest for note in head
+        )
+
+    def fetch_with_retries(self, **params):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait(BASE_URL)
+            count("http_requests")
+            try:
+                return self.fetch_notes(**params)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, min(60.0, 2.0 ** attempt))
+                logger.warning(
+                    f"Failed to fetch the notes at offset "
+                    f"{params.get('offset', 0)}: {e}. Retry "
+                    f"{attempt + 1}/{self.max_retries} in {delay:.1f} "
+                    f"seconds."
+                )
+                time.sleep(delay)
+        return []
 
 
 class OpenReviewParser(BasePlugin):
+    """
+    Request the papers of a conference from OpenReview.
+
+    Args:
+        page_size: The number of notes requested at once.
+        max_workers: The number of pages requested concurrently.
+        requests_per_second: Politeness limit of the requests.
+        snapshot_directory: If set, the raw notes are kept in
+            `<conference>_<year>.jsonl.gz` in this directory, along with the
+            latest modification time (`tmdate`) in `<conference>_<year>.json`.
+            The next run only requests the notes modified since then.
+        refresh_snapshot: Request all the notes again, e.g., to drop the
+            withdrawn papers, which an incremental run can't notice.
+    """
+
     def __init__(
             self,
             year: int,
@@ -29,6 +190,11 @@ class OpenReviewParser(BasePlugin):
             output_directory: str,
             max_retries: int = 3,
             num_requested: int | None = None,
+            page_size: int = 1000,
+            max_workers: int = 4,
+            requests_per_second: float = 2.0,
+            snapshot_directory: str = "",
+            refresh_snapshot: bool = False,
             overwrite: bool = False,
             version: str = "",
             dependencies: list[str] | None = None,
@@ -39,61 +205,106 @@ class OpenReviewParser(BasePlugin):
         self.output_directory = output_directory
         self.max_retries = max_retries
         self.num_requested = num_requested
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.requests_per_second = requests_per_second
+        self.snapshot_directory = snapshot_directory
+        self.refresh_snapshot = refresh_snapshot
         os.makedirs(self.output_directory, exist_ok=True)
         self.client = OpenReviewClient(baseurl=BASE_URL)
 
     def process(self,
                 papers: list[Paper],
                 global_plugin_data: GlobalPluginData):
-        if use_v1_api(self.conference, self.year):
-            return self.process_openreview_v1(papers, global_plugin_data)
-        return self.process_openreview_v2(papers, global_plugin_data)
-
-    def process_openreview_v2(
-            self, papers: list[Paper], global_plugin_data: GlobalPluginData):
-        submissions: list[Note] = self.client.get_all_notes(
-            invitation=get_invitation_id(self.conference, self.year),
-            content={"venueid": get_venue_id(self.conference, self.year)}
-        )
-        if self.num_requested:
-            submissions = submissions[:self.num_requested]
-        logger.info(f"Found {len(submissions)} submissions.")
-        pbar = tqdm(submissions)
-        for s in pbar:
-            pbar.set_description(s.id)
-            assert s.pdate and s.tmdate and s.content, (
-                f"Submission {s} does not have odate."
-            )
-            paper = create_paper_from_openreview(note=s)
-            papers.append(paper)
-        return papers
-
-    def process_openreview_v1(
-            self, papers: list[Paper], global_plugin_data: GlobalPluginData):
-        client = openreview.Client(baseurl="https://api.openreview.net")
-        submissions: list[openreview.Note] = client.get_all_notes(
-            invitation=get_invitation_id(self.conference, self.year),
-            content={"venueid": get_venue_id(self.conference, self.year)}
-        )
-        submissions = list(filter(
-            lambda s: (
-                "submitted" not in s.content["venue"].lower()
-                and "submit" not in s.content["venue"].lower()
+        v1 = use_v1_api(self.conference, self.year)
+        client = openreview.Client(baseurl=BASE_URL_V1) if v1 else self.client
+        note_class = openreview.Note if v1 else Note
+        invitation = get_invitation_id(self.conference, self.year)
+        venue_id = get_venue_id(self.conference, self.year)
+        harvester = OpenReviewHarvester(
+            lambda **params: client.get_notes(
+                invitation=invitation,
+                content={"venueid": venue_id},
+                **params,
             ),
-            submissions
-        ))
-        if self.num_requested:
-            submissions = submissions[:self.num_requested]
-        if len(submissions) == 0:
+            page_size=self.page_size,
+            max_workers=self.max_workers,
+            requests_per_second=self.requests_per_second,
+            max_retries=self.max_retries,
+        )
+        if self.snapshot_directory:
+            notes = self.iter_notes_with_snapshot(harvester, note_class)
+        else:
+            notes = harvester.iter_notes()
+        num_papers = len(papers)
+        pbar = tqdm(notes)
+        for note in pbar:
+            pbar.set_description(note.id)
+            # All the notes are consumed to complete the snapshot.
+            if self.num_requested and (
+                    len(papers) - num_papers >= self.num_requested):
+                continue
+            if v1 and not accepted_by_v1_venue(note):
+                continue
+            papers.append(create_paper_from_openreview(note))
+        if len(papers) == num_papers:
             logger.warning("No submissions found.")
-        logger.info(f"Found {len(submissions)} submissions.")
-        pbar = tqdm(submissions)
-        for s in pbar:
-            pbar.set_description(s.id)
-            paper = create_paper_from_openreview(s)
-            papers.append(paper)
+        logger.info(f"Found {len(papers) - num_papers} submissions.")
         return papers
 
+    def iter_notes_with_snapshot(
+            self, harvester: OpenReviewHarvester, note_class: type):
+        """
+        Yield the notes modified since the snapshot, then the unmodified
+        notes of the snapshot. The new snapshot replaces the old one only
+        after all the notes are yielded, and only if the harvest is
+        consistent and has as many notes as reported by OpenReview.
+        """
+        os.makedirs(self.snapshot_directory, exist_ok=True)
+        name = f"{self.conference.lower()}_{self.year}"
+        path = osp.join(self.snapshot_directory, f"{name}.jsonl.gz")
+        state_path = osp.join(self.snapshot_directory, f"{name}.json")
+        since = 0
+        if (not self.refresh_snapshot
+                and osp.exists(path) and osp.exists(state_path)):
+            with open(state_path, "r") as fp:
+                since = json.load(fp)["tmdate"]
+            logger.info(f"Requesting the notes modified since {since}.")
+        tmdate, modified_ids, num_notes = since, set(), 0
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open_binary(tmp_path, "wb", ".gz") as fp:
+                for note in harvester.iter_notes(since):
+                    fp.write(dumps_line(note_to_json(note)))
+                    modified_ids.add(note.id)
+                    tmdate = max(tmdate, note.tmdate)
+                    num_notes += 1
+                    yield note
+                logger.info(f"{num_notes} notes are new or modified.")
+                if since:
+                    for data in iter_jsonl(path):
+                        if data["id"] in modified_ids:
+                            continue
+                        fp.write(dumps_line(data))
+                        num_notes += 1
+                        yield note_class.from_json(data)
+            if not harvester.consistent or num_notes < harvester.total:
+                logger.warning(
+                    f"Got {num_notes} of {harvester.total} notes, some notes "
+                    f"may be skipped as they were modified meanwhile. The "
+                    f"snapshot is kept, the next run requests them again."
+                )
+                return
+            os.replace(tmp_path, path)
+            # The state is written last, a crash in between only makes the
+            # next run request more notes.
+            with open(state_path, "w") as fp:
+                json.dump({"tmdate": tmdate, "num_notes": num_notes}, fp)
+            logger.info(f"Saved {num_notes} notes to {path}")
+        finally:
+            if osp.exists(tmp_path):
+                os.remove(tmp_path)
+
     def check_content(self, content: dict[str, dict]):
         keys = (
             "title", "authors", "abstract", "venue", "TLDR", "keywords"
@@ -138,6 +349,23 @@ def create_paper_from_openreview(note: Note | openreview.Note) -> Paper:
     return paper
 
 
+def note_to_json(note: Note | openreview.Note) -> dict:
+    # `Note.to_json` of the v2 API drops the server-side fields.
+    data = note.to_json()
+    for key in ("tmdate", "tcdate", "number"):
+        if getattr(note, key, None) is not None:
+            data[key] = getattr(note, key)
+    return data
+
+
+def accepted_by_v1_venue(note: openreview.Note) -> bool:
+    # The v1 API also returns the submissions which are not accepted.
+    venue = note.content.get("venue", "")
+    if isinstance(venue, dict):
+        venue = venue.get("value", "")
+    return "submit" not in venue.lower()
+
+
 def check_content(content: dict):
     keys = (
         "title", "authors", "abstract", "venue", "TLDR", "keywords"
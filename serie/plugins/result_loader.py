@@ -1,10 +1,13 @@
 
 import os
+import re
+from datetime import datetime as dt
 from dataclasses import dataclass
 
 from serie.utils.logging import create_logger
-from serie.utils.io import load_jsonl
+from serie.utils.io import iter_jsonl
 from serie.base.paper import Paper, create_paper_from_dict
+from serie.base.store import PaperStore
 from serie.base.plugin import BasePlugin, BasePluginData, GlobalPluginData
 
 
@@ -22,9 +25,24 @@ class ResultLoaderData(BasePluginData):
 
 
 class ResultLoader(BasePlugin):
-    def __init__(self, output_directory: str, **kwargs):
+    """
+    Load the papers saved by `ResultSaver`.
+
+    Args:
+        store_path: If set, the papers are loaded from the `PaperStore` at
+            this path, selecting those updated within `datetime`, instead of
+            `output_directory/papers.jsonl`.
+    """
+
+    def __init__(self,
+                 output_directory: str,
+                 datetime: str = "",
+                 store_path: str = "",
+                 **kwargs):
         super().__init__(**kwargs)
         self.output_directory = output_directory
+        self.datetime = datetime
+        self.store_path = store_path
 
     def process(self,
                 papers: list[Paper],
@@ -32,12 +50,51 @@ class ResultLoader(BasePlugin):
         return papers or self.load_papers()
 
     def load_papers(self) -> list[Paper]:
-        path = os.path.join(self.output_directory, 'papers.jsonl')
+        if self.store_path:
+            return self.load_papers_from_store()
+        # The first of the plain and the compressed files written by
+        # `ResultSaver` is loaded.
+        candidates = [
+            os.path.join(self.output_directory, f"papers{suffix}")
+            for suffix in (".jsonl", ".jsonl.gz", ".jsonl.zst")
+        ]
+        path = next(
+            (p for p in candidates if os.path.exists(p)), candidates[0]
+        )
         logger.info(f"Loading results from {path}")
         if not os.path.exists(path):
             logger.warning(f"{path} does not exist.")
             return []
-        results = load_jsonl(path)
-        if not results:
+        papers = [create_paper_from_dict(r) for r in iter_jsonl(path)]
+        if not papers:
             logger.warning("No papers found in the JSONL file.")
-        return [create_paper_from_dict(r) for r in results]
+        return papers
+
+    def load_papers_from_store(self) -> list[Paper]:
+        if not os.path.exists(self.store_path):
+            logger.warning(f"{self.store_path} does not exist.")
+            return []
+        start_date, end_date = parse_date_range(self.datetime)
+        logger.info(
+            f"Loading results updated in [{start_date}, {end_date}) "
+            f"from {self.store_path}"
+        )
+        with PaperStore(self.store_path) as store:
+            papers = list(store.query(start_date, end_date))
+        if not papers:
+            logger.warning("No papers found in the paper store.")
+        return papers
+
+
+def parse_date_range(datetime: str) -> tuple[str, str]:
+    """
+    Convert the range of `lastUpdatedDate:[YYYYMMDDHHMM TO YYYYMMDDHHMM]`
+    into `%Y-%m-%d` bounds, empty strings mean unbounded.
+    """
+    dates = re.findall(r"\d{8}", datetime)
+    if len(dates) < 2:
+        return "", ""
+    start, end = [
+        dt.strptime(d, "%Y%m%d").strftime("%Y-%m-%d") for d in dates[:2]
+    ]
+    return start, end
@@ -2,16 +2,17 @@
 import os
 import os.path as osp
 from dataclasses import dataclass
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from serie.utils.logging import create_logger
 from serie.base.plugin import (
     BaseKeywordsFilterData, BasePlugin, BasePluginData, PluginStatus,
     GlobalPluginData
 )
 from serie.base.paper import Paper
+from serie.base.store import PaperStore
 from serie.base.constants import UNIQUE_PAPER_SIGNATURE
-from serie.plugins.markdown_table_maker import (
-    MarkdownTableMaker, MarkdownTableMakerData
-)
+from serie.plugins.markdown_table_maker import MarkdownTableMaker
 from serie.utils.io import save_jsonl
 
 
@@ -85,10 +86,25 @@ class ResultSaverData(BasePluginData):
 
 
 class ResultSaver(BasePlugin):
+    """
+    Save the papers as `papers.jsonl`, text and markdown files.
+
+    Args:
+        store_path: If set, the papers are upserted into the `PaperStore`
+            at this path instead of being written to `papers.jsonl`.
+        jsonl_compression: Compress `papers.jsonl` into `papers.jsonl.gz`
+            if set to `gz` or `papers.jsonl.zst` if set to `zst`.
+        max_workers: The number of markdown files of the keywords written
+            concurrently.
+    """
+
     def __init__(self,
                  output_directory: str,
                  markdown_directory: str,
                  keywords_filter_plugin: str = "",
+                 store_path: str = "",
+                 jsonl_compression: str = "",
+                 max_workers: int = 8,
                  overwrite: bool = False,
                  version: str = "",
                  dependencies: list[str] | None = None,
@@ -97,6 +113,14 @@ class ResultSaver(BasePlugin):
         self.output_directory = output_directory
         self.markdown_directory = markdown_directory
         self.keywords_filter_plugin = keywords_filter_plugin
+        self.store_path = store_path
+        if jsonl_compression not in ("", "gz", "zst"):
+            raise ValueError(
+                f"Unknown jsonl_compression: {jsonl_compression}. "
+                f"Expected one of '', 'gz' and 'zst'."
+            )
+        self.jsonl_compression = jsonl_compression
+        self.max_workers = max_workers
         os.makedirs(self.output_directory, exist_ok=True)
         os.makedirs(self.markdown_directory, exist_ok=True)
 
@@ -128,18 +152,36 @@ class ResultSaver(BasePlugin):
         self.save_papers(papers, markdown_table)
         return papers
 
-    def save_papers(self, papers: list[Paper], markdown_table: str):
+    def save_papers(self, papers: list[Paper], markdown_table: str | dict):
+        # Every paper is formatted once and shared by all the files.
+        table_maker = MarkdownTableMaker(cache_rows=True)
         self.save_jsonl(papers)
-        self.save_markdown_file(papers, markdown_table)
-        self.save_text(papers)
-        self.save_by_keywords(papers)
+        self.save_markdown_file(papers, markdown_table, table_maker)
+        texts = [self.format_text_result(p) for p in papers]
+        self.save_text(papers, texts)
+        self.save_by_keywords(papers, texts, table_maker)
         # self.make_navigation_list(papers)
 
     def save_jsonl(self, papers: list[Paper]):
-        path = os.path.join(self.output_directory, 'papers.jsonl')
-        save_jsonl(path, [r.asdict() for r in papers])
+        if self.store_path:
+            with PaperStore(self.store_path) as store:
+                store.upsert(papers)
+            return
+        filename = "papers.jsonl"
+        if self.jsonl_compression:
+            filename += f".{self.jsonl_compression}"
+        path = os.path.join(self.output_directory, filename)
+        save_jsonl(path, (r.asdict() for r in papers))
 
-    def save_markdown_file(self, papers: list[Paper], markdown_table: str):
+    def save_markdown_file(self,
+                           papers: list[Paper],
+                           markdown_table: str | dict,
+                           table_maker: MarkdownTableMaker | None = None):
+        """
+        Save `papers.md`. `markdown_table` is the table rendered by
+        `MarkdownTableMaker`, or its headers if the rendering is deferred,
+        then the rows are streamed into the file by `table_maker`.
+        """
         if not markdown_table:
             return
         dates = [
@@ -153,63 +195,93 @@ class ResultSaver(BasePlugin):
         logger.info(f"Saving markdown table to {path}")
         with open(path, 'w') as fp:
             fp.write(METAINFO_TEMPLATE.format(counts=len(papers)))
-            fp.write(markdown_table)
+            if isinstance(markdown_table, dict):
+                table_maker = table_maker or MarkdownTableMaker()
+                table_maker.write_table(
+                    fp, papers, markdown_table.get("headers")
+                )
+            else:
+                fp.write(markdown_table)
 
-    def save_text(self, papers: list[Paper]):
+    def save_text(self, papers: list[Paper], texts: list[str] | None = None):
+        """
+        Save the papers to `papers.txt`, `texts` are the papers formatted by
+        `format_text_result` if given.
+        """
+        if texts is None:
+            texts = [self.format_text_result(p) for p in papers]
         path = os.path.join(self.output_directory, 'papers.txt')
         logger.info(f"Saving text to {path}")
         with open(path, 'w') as fp:
-            for i, result in enumerate(papers):
-                fp.write(self.format_text_result(result, i))
+            for i, text in enumerate(texts):
+                fp.write(f"Index: {i}\n" + text)
 
-    def save_by_keywords(self, papers: list[Paper]):
+    def save_by_keywords(self,
+                         papers: list[Paper],
+                         texts: list[str] | None = None,
+                         table_maker: MarkdownTableMaker | None = None):
+        """
+        Save a markdown file per (date, keyword), the papers are grouped in
+        one pass and the files are written concurrently.
+        """
+        if texts is None:
+            texts = [self.format_text_result(p) for p in papers]
+        table_maker = table_maker or MarkdownTableMaker(cache_rows=True)
         plugin_name = self.keywords_filter_plugin
-        keywords: list[str] = list()
-        for result in papers:
-            plugin_data = result.get_plugin_data(plugin_name)
+        buckets: dict[tuple[str, str], list[int]] = defaultdict(list)
+        for i, paper in enumerate(papers):
+            plugin_data = paper.get_plugin_data(plugin_name)
             assert isinstance(plugin_data, BaseKeywordsFilterData)
-            keywords.extend(plugin_data.keywords)
-        keywords = list(set(keywords))
-        for keyword in keywords:
-            dates = [
-                p.update_date.strftime("%Y-%m-%d") for p in papers
+            date = paper.update_date.strftime("%Y-%m-%d")
+            ignorance = set(plugin_data.ignorance)
+            for keyword in dict.fromkeys(plugin_data.keywords):
+                if keyword not in ignorance:
+                    buckets[(date, keyword)].append(i)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self.save_by_keyword,
+                    [papers[i] for i in indices],
+                    keyword,
+                    [texts[i] for i in indices],
+                    table_maker,
+                )
+                for (_, keyword), indices in buckets.items()
             ]
-            dates = list(set(dates))
-            for date in dates:
-                papers_this_date = [
-                    p for p in papers
-                    if p.update_date.strftime("%Y-%m-%d") == date
-                ]
-                self.save_by_keyword(papers_this_date, keyword)
-
-    def save_by_keyword(self, papers: list[Paper], keyword: str):
+            for future in futures:
+                future.result()
+
+    def save_by_keyword(self,
+                        papers: list[Paper],
+                        keyword: str,
+                        texts: list[str] | None = None,
+                        table_maker: MarkdownTableMaker | None = None):
+        """
+        Save the papers of a date related to the keyword, `texts` are the
+        papers formatted by `format_text_result` if given. The table and the
+        texts are streamed into the file.
+        """
         plugin_name = self.keywords_filter_plugin
         filtered_papers: list[Paper] = []
-        for result in papers:
+        filtered_texts: list[str] = []
+        for i, result in enumerate(papers):
             plugin_data = result.get_plugin_data(plugin_name)
             assert isinstance(plugin_data, BaseKeywordsFilterData)
             if keyword in plugin_data.ignorance:
                 continue
             if keyword in plugin_data.keywords:
                 filtered_papers.append(result)
+                filtered_texts.append(
+                    texts[i] if texts is not None
+                    else self.format_text_result(result)
+                )
         if not filtered_papers:
             logger.info(f"No papers found for keyword: {keyword}")
             return
         logger.info(
             f"Saving {len(filtered_papers)} papers for keyword: {keyword}"
         )
-        paper_infos = [self.format_text_result(r) for r in filtered_papers]
-        paper_infos = "\n\n# Abstract\n" + "".join(paper_infos)
-        markdown_plugin = MarkdownTableMaker()
-        global_plugin = GlobalPluginData()
-        markdown_plugin(filtered_papers, global_plugin)
-        table: str = global_plugin.data[MarkdownTableMakerData.plugin_name]
-        content: str = (
-            METAINFO_TEMPLATE.format(counts=len(filtered_papers))
-            + table
-            + "\n\n"
-            + paper_infos
-        )
+        table_maker = table_maker or MarkdownTableMaker()
         dates = [p.update_date.strftime("%Y-%m-%d") for p in filtered_papers]
         dates = list(set(dates))
         assert len(dates) == 1
@@ -222,7 +294,10 @@ class ResultSaver(BasePlugin):
         path = osp.join(folder, f'papers @ {keyword}.md')
         logger.info(f"Saving markdown file to {path}")
         with open(path, 'w') as fp:
-            fp.write(content)
+            fp.write(METAINFO_TEMPLATE.format(counts=len(filtered_papers)))
+            table_maker.write_table(fp, filtered_papers)
+            fp.write("\n\n\n\n# Abstract\n")
+            fp.writelines(filtered_texts)
 
     def make_navigation_list(self, papers: list[Paper]):
         dates = [
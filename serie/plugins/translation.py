@@ -1,10 +1,11 @@
 
+import re
 from dataclasses import dataclass
 
 from serie.utils.logging import create_logger
 from serie.base.plugin import (
-    BasePlugin, PluginStatus, BasePluginData,
-    BaseKeywordsFilterData, GlobalPluginData,
+    BasePlugin, BasePluginData, BaseKeywordsFilterData, ExecutionMode,
+    GlobalPluginData, fingerprint,
 )
 from serie.base.paper import Paper
 from serie.core.agent import Agent, TaskMode
@@ -25,6 +26,20 @@ def translation_instruction():
     return prompt
 
 
+def combined_translation_template():
+    return (
+        "Given the following title and abstract of a paper:\n\n"
+        "<-|TITLE|->\n{title}\n\n<-|ABSTRACT|->\n{abstract}\n\n"
+        "{instruction} Keep the markers <-|TITLE|-> and <-|ABSTRACT|-> "
+        "before the translated title and abstract respectively."
+    )
+
+
+COMBINED_TRANSLATION_PATTERN = re.compile(
+    r"<-\|TITLE\|->(.*?)<-\|ABSTRACT\|->(.*)", re.DOTALL
+)
+
+
 @dataclass
 class TranslatorData(BasePluginData):
     plugin_name: str = plugin_name()
@@ -43,6 +58,24 @@ class TranslatorData(BasePluginData):
 
 
 class Translator(BasePlugin):
+    """
+    Translate the titles and abstracts of the papers.
+
+    The papers are tracked (see `BasePlugin`), a paper translated by the
+    same model and prompt from the same title and abstract is skipped unless
+    `overwrite` is set. Identical texts are only sent once.
+
+    Args:
+        combine_title_abstract: If True, the title and the abstract of a
+            paper are translated by one request. The papers whose response
+            can't be split fall back to separate requests.
+    """
+
+    track_papers = True
+    execution_mode = ExecutionMode.PER_BATCH
+    reads = ("title", "abstract")
+    writes = ("Translator", )
+
     def __init__(
             self,
             model: str,
@@ -52,29 +85,50 @@ class Translator(BasePlugin):
             keywords_filter_plugin: str = "",
             max_workers: int = 16,
             max_tasks_per_minute: int = 16,
+            bypass_response_cache: bool = False,
+            combine_title_abstract: bool = False,
             overwrite: bool = False,
             version: str = "",
             dependencies: list[str] | None = None,
             **kwargs) -> None:
         super().__init__(overwrite, version, dependencies, **kwargs)
-        self.agent = Agent(model)
+        self.agent = Agent(model, bypass_response_cache)
         self.mode = TaskMode(mode) if isinstance(mode, str) else mode
+        self.execution_mode = self.resolve_execution_mode(mode=self.mode)
         self.prompt = prompt or translation_instruction()
         self.translate_all_papers = translate_all_papers
         self.keywords_filter_plugin = keywords_filter_plugin
+        if keywords_filter_plugin and not translate_all_papers:
+            self.reads = ("title", "abstract", keywords_filter_plugin)
         self.max_workers = max_workers
         self.max_tasks_per_minute = max_tasks_per_minute
+        self.combine_title_abstract = combine_title_abstract
+
+    @classmethod
+    def resolve_execution_mode(
+            cls, mode: str | TaskMode = TaskMode.CONCURRENT,
+            **kwargs) -> ExecutionMode:
+        # A streamed batch mode would submit a Batch API job per batch.
+        if TaskMode(mode) == TaskMode.BATCH:
+            return ExecutionMode.BARRIER
+        return cls.execution_mode
+
+    def requires_processing(self, paper: Paper) -> bool:
+        return self.requires_translation(paper)
+
+    def paper_fingerprint(self, paper: Paper) -> str:
+        return fingerprint(
+            self.version, self.agent.model, self.prompt,
+            paper.title, paper.abstract,
+        )
 
-    def check_status(
-            self, papers: list[Paper], global_plugin_data: GlobalPluginData):
-        datas = [p.get_plugin_data(plugin_name()) for p in papers]
-        datas = [d for d in datas if d is not None]
-        for d in datas:
-            assert isinstance(d, TranslatorData)
-            if d.translated_abstract:
-                self.status = PluginStatus.DONE
-                return
-        self.status = PluginStatus.TODO
+    def paper_succeeded(
+            self, paper: Paper, plugin_data: BasePluginData) -> bool:
+        assert isinstance(plugin_data, TranslatorData)
+        return (
+            plugin_data.model == self.agent.model
+            and bool(plugin_data.translated_abstract)
+        )
 
     def process(self,
                 papers: list[Paper],
@@ -88,46 +142,55 @@ class Translator(BasePlugin):
             return self.translate_single(papers)
 
     def translate_batch(self, papers: list[Paper]) -> list[Paper]:
-        titles = [r.title for r in papers if self.requires_translation(r)]
-        abstracts = [
-            r.abstract for r in papers if self.requires_translation(r)
-        ]
-        papers_to_translate = [
-            r for r in papers if self.requires_translation(r)
-        ]
-        logger.info(f"Translating {len(titles)} titles ...")
-        prompts = [
-            f"Given the following text:\n\n{t}\n\n{translation_instruction()}"
-            for t in titles
-        ]
-        responses = self.agent(prompts, mode=self.mode)
-        responses = [responses] if isinstance(responses, str) else responses
-        translated_titles = responses
-
-        logger.info(f"Translating {len(abstracts)} abstracts ...")
-        prompts = [
-            f"Given the following text:\n\n{s}\n\n{translation_instruction()}"
-            for s in abstracts
-        ]
-        responses = self.agent(prompts, mode=self.mode)
-        responses = [responses] if isinstance(responses, str) else responses
-        translated_abstracts = responses
-        for result, title, translation in zip(papers_to_translate,
-                                              translated_titles,
-                                              translated_abstracts):
-            plugin = result.local_plugin_data.get(plugin_name(), None)
-            if plugin is None:
-                result.add_plugin_data(TranslatorData(model=self.agent.model))
-            plugin = result.local_plugin_data[plugin_name()]
-            assert isinstance(plugin, TranslatorData)
-            plugin.translated_abstract = translation
+        papers_to_translate = self.papers_to_translate(papers)
+        translations: dict[str, str] = {}
+        combined: dict[tuple[str, str], tuple[str, str]] = {}
+        if self.combine_title_abstract:
+            pairs = list(dict.fromkeys(
+                (p.title, p.abstract) for p in papers_to_translate
+            ))
+            logger.info(f"Translating {len(pairs)} titles and abstracts ...")
+            prompts = [
+                combined_translation_template().format(
+                    title=title, abstract=abstract, instruction=self.prompt
+                )
+                for title, abstract in pairs
+            ]
+            for pair, response in zip(pairs, self.complete(prompts)):
+                parsed = parse_combined_translation(response)
+                if parsed is not None:
+                    combined[pair] = parsed
+            if len(combined) < len(pairs):
+                logger.warning(
+                    f"Failed to split {len(pairs) - len(combined)} "
+                    f"translations, translate them separately ..."
+                )
+        # The titles and abstracts are sent in one pass, so the abstracts
+        # don't wait for all the titles to finish.
+        texts = list(dict.fromkeys(
+            text
+            for p in papers_to_translate
+            if (p.title, p.abstract) not in combined
+            for text in (p.title, p.abstract)
+        ))
+        if texts:
+            logger.info(f"Translating {len(texts)} texts ...")
+            prompts = [self.translation_prompt(t) for t in texts]
+            translations = dict(zip(texts, self.complete(prompts)))
+        for paper in papers_to_translate:
+            title, abstract = combined.get(
+                (paper.title, paper.abstract),
+                (translations.get(paper.title, ""),
+                 translations.get(paper.abstract, "")),
+            )
+            plugin = self.plugin_data(paper)
             plugin.translated_title = title
+            plugin.translated_abstract = abstract
         return papers
 
     def translate_single(self, papers: list[Paper]) -> list[Paper]:
-        papers_to_translate = [
-            r for r in papers if self.requires_translation(r)
-        ]
+        papers_to_translate = self.papers_to_translate(papers)
+        translations: dict[str, str] = {}
         logger.info(f"Translating {len(papers_to_translate)} abstracts ...")
         for idx, result in enumerate(papers_to_translate):
             abstract = result.abstract
@@ -135,18 +198,37 @@ class Translator(BasePlugin):
                 f"Translating the abstract of "
                 f"{idx+1}-th/{len(papers_to_translate)} paper: {result.title}"
             )
-            translation = self.agent.complete_single(
-                f"Given the following text:\n\n{abstract}\n\n"
-                f"{translation_instruction()}"
-            )
-            plugin = result.local_plugin_data.get(plugin_name(), None)
-            if plugin is None:
-                result.add_plugin_data(TranslatorData(model=self.agent.model))
-            plugin = result.local_plugin_data[plugin_name()]
-            assert isinstance(plugin, TranslatorData)
-            plugin.translated_abstract = translation
+            if abstract not in translations:
+                translations[abstract] = self.agent.complete_single(
+                    self.translation_prompt(abstract)
+                )
+            plugin = self.plugin_data(result)
+            plugin.translated_abstract = translations[abstract]
         return papers
 
+    def papers_to_translate(self, papers: list[Paper]) -> list[Paper]:
+        return [p for p in papers if self.requires_translation(p)]
+
+    def plugin_data(self, paper: Paper) -> TranslatorData:
+        """
+        Return the `TranslatorData` of the paper, stamped with the model of
+        the translation about to be stored.
+        """
+        plugin = paper.local_plugin_data.get(plugin_name(), None)
+        if plugin is None:
+            paper.add_plugin_data(TranslatorData())
+        plugin = paper.local_plugin_data[plugin_name()]
+        assert isinstance(plugin, TranslatorData)
+        plugin.model = self.agent.model
+        return plugin
+
+    def translation_prompt(self, text: str) -> str:
+        return f"Given the following text:\n\n{text}\n\n{self.prompt}"
+
+    def complete(self, prompts: list[str]) -> list[str]:
+        responses = self.agent(prompts, mode=self.mode)
+        return [responses] if isinstance(responses, str) else responses
+
     def requires_translation(self, result: Paper) -> bool:
         if self.translate_all_papers:
             return True
@@ -166,3 +248,13 @@ class Translator(BasePlugin):
             else:
                 translate = True
         return translate
+
+
+def parse_combined_translation(response: str) -> tuple[str, str] | None:
+    match = COMBINED_TRANSLATION_PATTERN.search(response)
+    if match is None:
+        return None
+    title, abstract = match.group(1).strip(), match.group(2).strip()
+    if not title or not abstract:
+        return None
+    return title, abstract
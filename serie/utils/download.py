@@ -0,0 +1,219 @@
+import os
+import re
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+import requests
+
+from serie.utils.http import HostRateLimiter, HTTPCache, create_session
+from serie.utils.logging import create_logger
+from serie.utils.metrics import count
+
+
+logger = create_logger(__name__)
+PDF_MAGIC = b"%PDF"
+PDF_EOF_MARKER = b"%%EOF"
+CHUNK_SIZE = 1 << 16
+
+
+class DownloadError(Exception):
+    pass
+
+
+class DownloadManager:
+    """
+    Thread-safe file downloader resuming interrupted downloads.
+
+    The content is streamed into `<path>.part`, an existing part file is
+    resumed with an HTTP `Range` request. The part file is renamed to `path`
+    only after its size matches the announced length and, for PDFs, it
+    starts with `%PDF`, so a truncated file is never mistaken for a finished
+    download.
+
+    Args:
+        connections_per_host: The maximum number of concurrent downloads
+            from the same host.
+        requests_per_second: Politeness limit of every host, a non-positive
+            value disables it.
+        max_retries: The number of retries after a failed attempt.
+        backoff_base_seconds: The retries wait for a random duration up to
+            `backoff_base_seconds * 2 ** attempt`, capped at
+            `backoff_max_seconds`.
+        timeout: Seconds to wait for the server to respond or send data.
+        pool_size: Size of the connection pool of the shared session, it
+            should be no less than the number of threads using the manager.
+    """
+
+    def __init__(self,
+                 connections_per_host: int = 2,
+                 requests_per_second: float = 0.0,
+                 max_retries: int = 5,
+                 backoff_base_seconds: float = 1.0,
+                 backoff_max_seconds: float = 60.0,
+                 timeout: float = 60.0,
+                 pool_size: int = 16) -> None:
+        self.connections_per_host = connections_per_host
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.timeout = timeout
+        self.session = create_session(pool_size)
+        self.lock = threading.Lock()
+        self.host_semaphores: dict[str, threading.BoundedSemaphore] = {}
+
+    def host_semaphore(self, url: str) -> threading.BoundedSemaphore:
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.host_semaphores:
+                self.host_semaphores[host] = threading.BoundedSemaphore(
+                    self.connections_per_host
+                )
+            return self.host_semaphores[host]
+
+    def download(self,
+                 url: str,
+                 path: str,
+                 is_pdf: bool = True,
+                 cache: HTTPCache | None = None) -> str:
+        """
+        Download `url` to `path`, return `path` on success and an empty
+        string if all the attempts failed. If `cache` is given, the content
+        is fetched through it and verified like a direct download.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.host_semaphore(url):
+                    self.rate_limiter.wait(url)
+                    if cache is None:
+                        self.fetch(url, path, is_pdf)
+                    else:
+                        self.fetch_cached(cache, url, path, is_pdf)
+                return path
+            except (requests.RequestException, DownloadError) as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Failed to download {url}: {e}")
+                    break
+                delay = random.uniform(0, min(
+                    self.backoff_max_seconds,
+                    self.backoff_base_seconds * 2 ** attempt,
+                ))
+                logger.warning(
+                    f"Failed to download {url}: {e}. Retry "
+                    f"{attempt + 1}/{self.max_retries} in {delay:.1f} seconds."
+                )
+                time.sleep(delay)
+        return ""
+
+    def fetch(self, url: str, path: str, is_pdf: bool):
+        part_path = f"{path}.part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        count("http_requests")
+        with self.session.get(url,
+                              headers=headers,
+                              stream=True,
+                              timeout=self.timeout,
+                              allow_redirects=True) as response:
+            if response.status_code == 416 and offset:
+                # The part file is already complete, or it is longer than
+                # the remote file, verify it below either way.
+                total = parse_total_length(response, 0)
+                if total is not None and total != offset:
+                    os.remove(part_path)
+                    raise DownloadError(
+                        f"Stale part file of {offset} bytes, the remote file "
+                        f"has {total} bytes"
+                    )
+            else:
+                response.raise_for_status()
+                if response.status_code != 206:
+                    # The server ignored the range, start over.
+                    offset = 0
+                total = parse_total_length(response, offset)
+                with open(part_path, "ab" if offset else "wb") as fp:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        fp.write(chunk)
+        self.commit(url, part_path, path, total, is_pdf)
+
+    def fetch_cached(self,
+                     cache: HTTPCache,
+                     url: str,
+                     path: str,
+                     is_pdf: bool):
+        """
+        Fetch `url` through `cache` into `<path>.part`, then verify and
+        rename it as `fetch` does. The body of the cache is complete, the
+        HTTP client rejects a response shorter than its `Content-Length`.
+        """
+        fetched = cache.fetch(
+            url, session=self.session, max_retries=1, sleep_time=0,
+            timeout=self.timeout,
+        )
+        if fetched is None:
+            raise DownloadError("The file is neither cached nor reachable")
+        part_path = f"{path}.part"
+        with open(part_path, "wb") as fp:
+            fp.write(fetched[0])
+        try:
+            self.commit(url, part_path, path, len(fetched[0]), is_pdf)
+        except DownloadError:
+            # Do not serve the invalid body again, the retry refetches it.
+            cache.remove(url)
+            raise
+
+    def commit(self,
+               url: str,
+               part_path: str,
+               path: str,
+               total: int | None,
+               is_pdf: bool):
+        """
+        Rename the part file to `path` if it has `total` bytes and, for
+        PDFs, starts with `%PDF`.
+        """
+        size = os.path.getsize(part_path)
+        if total is not None and size != total:
+            # Keep the part file, the next attempt resumes from it.
+            raise DownloadError(f"Received {size} of {total} bytes")
+        if is_pdf and not starts_with_pdf_magic(part_path):
+            os.remove(part_path)
+            raise DownloadError("The response is not a PDF file")
+        os.replace(part_path, path)
+        logger.info(f"Downloaded {url} to {path} ({size} bytes).")
+
+
+def parse_total_length(response: requests.Response,
+                       offset: int) -> int | None:
+    """
+    Return the full length of the remote file given by `Content-Range` or
+    `Content-Length`, None if it is unknown (e.g., a compressed response).
+    """
+    content_range = response.headers.get("Content-Range", "")
+    match = re.search(r"/(\d+)$", content_range)
+    if match:
+        return int(match.group(1))
+    length = response.headers.get("Content-Length")
+    if length is None or response.headers.get("Content-Encoding"):
+        return None
+    return offset + int(length)
+
+
+def starts_with_pdf_magic(path: str) -> bool:
+    with open(path, "rb") as fp:
+        return fp.read(len(PDF_MAGIC)) == PDF_MAGIC
+
+
+def is_complete_pdf(path: str, tail_size: int = 4096) -> bool:
+    """
+    Whether `path` starts with `%PDF` and has the `%%EOF` marker in its last
+    `tail_size` bytes, which a truncated file misses.
+    """
+    size = os.path.getsize(path)
+    if size <= len(PDF_MAGIC) or not starts_with_pdf_magic(path):
+        return False
+    with open(path, "rb") as fp:
+        fp.seek(max(0, size - tail_size))
+        return PDF_EOF_MARKER in fp.read()
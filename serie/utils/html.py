@@ -0,0 +1,193 @@
+"""
+Light-weight HTML extraction for the conference pages.
+
+Building a full `html5lib` tree for every cached page is by far the most
+expensive part of re-parsing a conference. The pages parsed by the scrapers
+(CVF Open Access and ECVA) only need a handful of elements: the ones with an
+`id`, the ones with a `class` and the anchors. `FastHTMLDocument` collects
+exactly these elements in a single pass of the standard library
+`HTMLParser` and exposes the small subset of the BeautifulSoup API used by
+the plugins (`find`, `find_all`, `text`, `get_text`, `string`, `get`).
+"""
+
+from html.parser import HTMLParser
+from typing import Any, Callable
+
+from bs4 import BeautifulSoup
+
+
+HTML_PARSER_BACKENDS = ("fast", "html5lib", "lxml", "html.parser")
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+}
+# Elements whose start tag implicitly closes an open sibling.
+IMPLIED_END_TAGS = {
+    "dt": {"dt", "dd"},
+    "dd": {"dt", "dd"},
+    "li": {"li"},
+    "p": {"p"},
+}
+
+
+class HTMLElement:
+    """
+    A captured element, mimicking the read-only part of `bs4.element.Tag`.
+    """
+
+    def __init__(self, name: str, attrs: dict[str, str]) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.strings: list[str] = []
+        self.children: list["HTMLElement"] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self.strings)
+
+    @property
+    def string(self) -> str | None:
+        return self.strings[0] if len(self.strings) == 1 else None
+
+    def get_text(self, separator: str = "", strip: bool = False) -> str:
+        strings = self.strings
+        if strip:
+            strings = [s.strip() for s in strings]
+            strings = [s for s in strings if s]
+        return separator.join(strings)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key: str) -> str:
+        return self.attrs[key]
+
+    def find(self,
+             name: str | None = None,
+             **kwargs) -> "HTMLElement | None":
+        return next(iter(_filter(self.children, name, **kwargs)), None)
+
+    def find_all(self,
+                 name: str | None = None,
+                 **kwargs) -> list["HTMLElement"]:
+        return _filter(self.children, name, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__qualname__}({self.name!r}, {self.attrs!r})"
+
+
+class FastHTMLDocument(HTMLParser):
+    """
+    Single pass extractor keeping the elements having an `id` or a `class`
+    attribute plus the elements listed in `capture_tags`.
+
+    Args:
+        txt: The HTML text.
+        capture_tags: Tags that are kept regardless of their attributes.
+    """
+
+    def __init__(self,
+                 txt: str,
+                 capture_tags: tuple[str, ...] = ("a", "dt")) -> None:
+        super().__init__(convert_charrefs=True)
+        self.capture_tags = set(capture_tags)
+        self.elements: list[HTMLElement] = []
+        self.stack: list[tuple[str, HTMLElement | None]] = []
+        self.opened: list[HTMLElement] = []
+        self.feed(txt)
+        self.close()
+
+    def find(self,
+             name: str | None = None,
+             **kwargs) -> HTMLElement | None:
+        return next(iter(_filter(self.elements, name, **kwargs)), None)
+
+    def find_all(self,
+                 name: str | None = None,
+                 **kwargs) -> list[HTMLElement]:
+        return _filter(self.elements, name, **kwargs)
+
+    def handle_starttag(self,
+                        tag: str,
+                        attrs: list[tuple[str, str | None]]):
+        implied = IMPLIED_END_TAGS.get(tag, set())
+        if self.stack and self.stack[-1][0] in implied:
+            self.close_until(len(self.stack) - 1)
+        element = None
+        attributes = {k: v or "" for k, v in attrs}
+        if (
+                tag in self.capture_tags
+                or "id" in attributes
+                or "class" in attributes):
+            element = HTMLElement(tag, attributes)
+            for parent in self.opened:
+                parent.children.append(element)
+            self.elements.append(element)
+            self.opened.append(element)
+        if tag in VOID_ELEMENTS:
+            if element is not None:
+                self.opened.remove(element)
+            return
+        self.stack.append((tag, element))
+
+    def handle_startendtag(self, tag: str, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str):
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                self.close_until(i)
+                return
+
+    def handle_data(self, data: str):
+        for element in self.opened:
+            element.strings.append(data)
+
+    def close_until(self, index: int):
+        for _, element in self.stack[index:]:
+            if element is not None:
+                self.opened.remove(element)
+        del self.stack[index:]
+
+
+def parse_html(txt: str, backend: str = "fast"):
+    """
+    Parse the HTML text with the specified backend. `fast` returns a
+    `FastHTMLDocument`, the others return a `BeautifulSoup` object.
+    """
+    if backend == "fast":
+        return FastHTMLDocument(txt)
+    if backend not in HTML_PARSER_BACKENDS:
+        raise ValueError(
+            f"Unknown HTML parser backend: {backend}. "
+            f"Expected one of {HTML_PARSER_BACKENDS}."
+        )
+    return BeautifulSoup(txt, backend)
+
+
+def _filter(elements: list[HTMLElement],
+            name: str | None = None,
+            id: str | None = None,
+            class_: str | None = None,
+            string: Callable[[str | None], Any] | None = None):
+    results = []
+    for element in elements:
+        if name is not None and element.name != name:
+            continue
+        if id is not None and element.attrs.get("id") != id:
+            continue
+        if class_ is not None and not _match_class(element, class_):
+            continue
+        if string is not None and not string(element.string):
+            continue
+        results.append(element)
+    return results
+
+
+def _match_class(element: HTMLElement, class_: str) -> bool:
+    # Same semantic as BeautifulSoup: either the whole attribute value or
+    # one of the class names matches.
+    value = element.attrs.get("class", "")
+    return value == class_ or class_ in value.split()
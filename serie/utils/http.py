@@ -0,0 +1,248 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+import os.path as osp
+from enum import Enum
+from dataclasses import asdict, dataclass
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from serie.utils.logging import create_logger
+from serie.utils.metrics import count
+
+
+logger = create_logger(__name__)
+
+
+class HostRateLimiter:
+    """
+    Thread-safe politeness limiter that spaces requests to the same host.
+
+    Args:
+        requests_per_second: The maximum number of requests sent to a single
+            host per second. A non-positive value disables the limiter.
+    """
+
+    def __init__(self, requests_per_second: float = 1.0) -> None:
+        self.interval = (
+            1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        )
+        self.lock = threading.Lock()
+        self.next_slot: dict[str, float] = {}
+
+    def wait(self, url: str):
+        if self.interval <= 0:
+            return
+        host = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def create_session(pool_size: int = 16) -> requests.Session:
+    """
+    Create a session whose keep-alive connection pool is large enough to be
+    shared by `pool_size` worker threads.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class CachePolicy(Enum):
+    """
+    How `HTTPCache` decides whether to touch the network.
+
+    - OFFLINE: only serve cached entries, never send a request.
+    - REVALIDATE: serve cached entries until their TTL expires, then send a
+        conditional request with the stored validators.
+    - REFRESH: always send a conditional request, regardless of the TTL.
+    """
+    OFFLINE = "offline"
+    REVALIDATE = "revalidate"
+    REFRESH = "refresh"
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    etag: str = ""
+    last_modified: str = ""
+    encoding: str = "utf-8"
+    fetched_at: float = 0.0
+
+
+class HTTPCache:
+    """
+    A conditional-GET cache storing gzip compressed response bodies next to
+    their validators (`ETag` and `Last-Modified`).
+
+    Args:
+        directory: Where to save the cache files.
+        policy: One of `CachePolicy`, see its documentation.
+        ttl: Seconds an entry is considered fresh under the `revalidate`
+            policy. None means the entries never expire.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 policy: str | CachePolicy = CachePolicy.REVALIDATE,
+                 ttl: float | None = None) -> None:
+        self.directory = directory
+        if isinstance(policy, str):
+            policy = CachePolicy(policy)
+        self.policy = policy
+        self.ttl = ttl
+        self.stats = {"fresh": 0, "not_modified": 0, "downloaded": 0}
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return osp.join(self.directory, key[:2], key)
+
+    def lookup(self, url: str) -> tuple[CacheEntry, bytes] | None:
+        path = self.path(url)
+        if not (osp.exists(f"{path}.json") and osp.exists(f"{path}.gz")):
+            return None
+        with open(f"{path}.json", "r") as fp:
+            entry = CacheEntry(**json.load(fp))
+        with gzip.open(f"{path}.gz", "rb") as fp:
+            content = fp.read()
+        return entry, content
+
+    def store(self, entry: CacheEntry, content: bytes | None = None):
+        path = self.path(entry.url)
+        os.makedirs(osp.dirname(path), exist_ok=True)
+        # Write to a temporary file first, concurrent readers never see a
+        # partially written entry.
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        if content is not None:
+            with gzip.open(f"{path}.gz{suffix}", "wb") as fp:
+                fp.write(content)
+            os.replace(f"{path}.gz{suffix}", f"{path}.gz")
+        with open(f"{path}.json{suffix}", "w") as fp:
+            json.dump(asdict(entry), fp)
+        os.replace(f"{path}.json{suffix}", f"{path}.json")
+
+    def remove(self, url: str):
+        path = self.path(url)
+        for suffix in (".json", ".gz"):
+            if osp.exists(f"{path}{suffix}"):
+                os.remove(f"{path}{suffix}")
+
+    def import_file(self, url: str, path: str):
+        """
+        Adopt a legacy cache file (the raw response body) without validators.
+        """
+        if osp.exists(f"{self.path(url)}.json"):
+            return
+        with open(path, "rb") as fp:
+            content = fp.read()
+        entry = CacheEntry(url=url, fetched_at=osp.getmtime(path))
+        self.store(entry, content)
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        if self.policy == CachePolicy.OFFLINE:
+            return True
+        if self.policy == CachePolicy.REFRESH:
+            return False
+        if self.ttl is None:
+            return True
+        return time.time() - entry.fetched_at < self.ttl
+
+    def fetch(self, url: str, **kwargs) -> tuple[bytes, str] | None:
+        """
+        Return the body and its encoding, the keyword arguments are passed to
+        `request_get`. Return None if the url is neither cached nor reachable.
+        """
+        cached = self.lookup(url)
+        if cached is not None and self.is_fresh(cached[0]):
+            self.count("fresh")
+            return cached[1], cached[0].encoding
+        if self.policy == CachePolicy.OFFLINE:
+            logger.warning(f"{url} is not cached and the cache is offline.")
+            return None
+        headers = {}
+        if cached is not None:
+            if cached[0].etag:
+                headers["If-None-Match"] = cached[0].etag
+            if cached[0].last_modified:
+                headers["If-Modified-Since"] = cached[0].last_modified
+        response = request_get(url, headers=headers, **kwargs)
+        if response is None:
+            if cached is not None:
+                logger.warning(f"Failed to revalidate {url}, use the cache.")
+                return cached[1], cached[0].encoding
+            return None
+        if response.status_code == 304 and cached is not None:
+            self.count("not_modified")
+            entry = cached[0]
+            entry.fetched_at = time.time()
+            self.store(entry)
+            return cached[1], entry.encoding
+        self.count("downloaded")
+        entry = CacheEntry(
+            url=url,
+            etag=response.headers.get("ETag", ""),
+            last_modified=response.headers.get("Last-Modified", ""),
+            encoding=(
+                response.encoding or response.apparent_encoding or "utf-8"
+            ),
+            fetched_at=time.time(),
+        )
+        self.store(entry, response.content)
+        return response.content, entry.encoding
+
+    def fetch_text(self, url: str, **kwargs) -> str | None:
+        fetched = self.fetch(url, **kwargs)
+        if fetched is None:
+            return None
+        content, encoding = fetched
+        return content.decode(encoding, errors="replace")
+
+
+def request_get(
+        url: str,
+        session: requests.Session | None = None,
+        rate_limiter: HostRateLimiter | None = None,
+        max_retries: int = 3,
+        sleep_time: float = 1,
+        timeout: float = 10,
+        **kwargs) -> requests.Response | None:
+    """
+    Send a GET request with retries, return None if all attempts failed.
+    A `304 Not Modified` response is returned as is.
+    """
+    getter = session.get if session is not None else requests.get
+    for _ in range(max_retries):
+        if rate_limiter is not None:
+            rate_limiter.wait(url)
+        count("http_requests")
+        try:
+            response = getter(
+                url, timeout=timeout, allow_redirects=True, **kwargs
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Failed to get {url}. Error message: {e}.\n"
+                         f"Retry after {sleep_time} seconds.")
+            time.sleep(sleep_time)
+            continue
+        return response
+    return None
@@ -1,9 +1,18 @@
 
+import io
+import os
+import gzip
 import json
 import importlib.util
+from typing import IO, Iterable, Iterator
 
 from serie.utils.logging import create_logger, setup_format
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 setup_format()
 logger = create_logger(__name__)
 
@@ -39,20 +48,80 @@ def load_json(path: str):
     return data
 
 
-def save_jsonl(path: str, data: list[dict]):
+def open_binary(path: str,
+                mode: str,
+                suffix: str | None = None) -> IO[bytes]:
+    """
+    Open a file in binary mode, `.gz` and `.zst` files are transparently
+    (de)compressed. `.zst` requires the `zstandard` package.
+
+    Args:
+        suffix: Decides the compression instead of the suffix of `path`.
+    """
+    suffix = os.path.splitext(path)[1] if suffix is None else suffix
+    if suffix == ".gz":
+        return gzip.open(path, mode)  # type: ignore
+    if suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                f"Reading or writing {path} requires `zstandard`, "
+                f"install it by `pip install zstandard`."
+            ) from e
+        if "r" in mode:
+            # The zstandard reader doesn't support iterating over lines.
+            return io.BufferedReader(zstandard.open(path, mode))
+        return zstandard.open(path, mode)  # type: ignore
+    return open(path, mode)
+
+
+def dumps_line(data: dict) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            # e.g., non-str keys or integers out of the 64-bit range, note
+            # that `orjson` loads such integers back as floats.
+            pass
+    return json.dumps(data).encode("utf-8") + b"\n"
+
+
+def loads_line(line: bytes) -> dict:
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def save_jsonl(path: str, data: Iterable[dict]):
+    """
+    Stream the items into a JSON lines file, compressed if `path` ends with
+    `.gz` or `.zst`. The file is written to a temporary file first and then
+    renamed, readers never see a partially written file.
+    """
     logger.info(f"Saving data to {path}")
-    with open(path, 'w') as fp:
-        for line in data:
-            fp.write(json.dumps(line))
-            fp.write("\n")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open_binary(tmp_path, "wb", os.path.splitext(path)[1]) as fp:
+            for line in data:
+                fp.write(dumps_line(line))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
     return path
 
 
-def load_jsonl(path: str) -> list[dict]:
+def iter_jsonl(path: str) -> Iterator[dict]:
+    """
+    Lazily yield the items of a JSON lines file, see `save_jsonl`.
+    """
     logger.info(f"Loading data from {path}")
-    lines = []
-    with open(path, 'r') as fp:
+    with open_binary(path, "rb") as fp:
         for line in fp:
-            data = json.loads(line)
-            lines.append(data)
-    return lines
+            if line.strip():
+                yield loads_line(line)
+
+
+def load_jsonl(path: str) -> list[dict]:
+    return list(iter_jsonl(path))
@@ -8,11 +8,10 @@ from logging import StreamHandler, FileHandler, Formatter, LoggerAdapter
 from functools import lru_cache
 from contextlib import contextmanager
 from typing import Any, Callable
-try:
-    from accelerate import PartialState  # type: ignore
-    ACCELERATE_AVAILABLE = True
-except ImportError:
-    ACCELERATE_AVAILABLE = False
+from importlib.util import find_spec
+# `accelerate` is only imported when a logger is created, importing it
+# (and torch) at startup takes seconds.
+ACCELERATE_AVAILABLE = find_spec("accelerate") is not None
 
 
 PROMPT = ("[%(asctime)s] [%(levelname)s] "
@@ -64,6 +63,7 @@ class Logger:
             name = __name__.split(".")[0]
         self.logger = LoggerAdapter(logging.getLogger(name), extra={})
         if ACCELERATE_AVAILABLE:
+            from accelerate import PartialState  # type: ignore
             self.state = PartialState()  # type: ignore
         else:
             self.state = None
@@ -152,6 +152,10 @@ def create_logger(name: str | None = None,
 
 
 def setup_libs_format():
+    # Only configure `transformers` if it has been imported, importing it
+    # here just to configure its logger is expensive.
+    if "transformers" not in sys.modules:
+        return
     try:
         from transformers.utils.logging import _get_library_root_logger  # type: ignore # noqa
     except ImportError:
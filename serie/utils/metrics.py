@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import threading
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+from tabulate import tabulate
+
+from serie.utils.logging import create_logger
+
+
+logger = create_logger(__name__)
+RUN_METRICS_FILE_NAME = "run_metrics.json"
+COUNTER_NAMES = (
+    "http_requests", "llm_requests", "llm_cached_responses",
+    "prompt_tokens", "completion_tokens",
+)
+
+
+class Counters:
+    """
+    Process wide thread-safe counters of the network activity, incremented
+    by the HTTP helpers and `Agent` through `count`.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.values: dict[str, int] = {}
+
+    def add(self, name: str, amount: int = 1):
+        with self.lock:
+            self.values[name] = self.values.get(name, 0) + amount
+
+    def snapshot(self) -> dict[str, int]:
+        with self.lock:
+            return dict(self.values)
+
+
+COUNTERS = Counters()
+
+
+def count(name: str, amount: int = 1):
+    COUNTERS.add(name, amount)
+
+
+@dataclass
+class PluginMetrics:
+    """
+    Resources used by a plugin, accumulated over all its calls (a plugin is
+    called once per batch in streaming mode).
+
+    The CPU time, the counters and the peak memory are process wide, they
+    include the work of the plugins running at the same time (see
+    `Configs.streaming` and `Configs.max_parallel_plugins`). The peak memory
+    is the peak of the memory traced by `tracemalloc` above the level at the
+    start of a call, None if the memory is not traced. The peak is reset
+    only by a call starting while no other call is measured, the peak of a
+    call overlapping another one may be reached before it started.
+    """
+    plugin: str
+    status: str = ""
+    calls: int = 0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    papers_in: int = 0
+    papers_out: int = 0
+    http_requests: int = 0
+    llm_requests: int = 0
+    llm_cached_responses: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    peak_memory_bytes: int | None = None
+
+
+class RunMetrics:
+    """
+    Collect the `PluginMetrics` of the plugins called during a run and save
+    them as `run_metrics.json`.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.plugins: list[PluginMetrics] = []
+        self.started_at = datetime.now()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_counters: dict[str, int] = {}
+        # `measure` resets the peak of `tracemalloc`, the peak of the run is
+        # kept here.
+        self.peak_memory_bytes = 0
+        self.started_tracing = False
+        # The number of calls being measured, the peak is reset by a call
+        # only if it is the only one.
+        self.active_measures = 0
+
+    def start(self, trace_memory: bool = False):
+        with self.lock:
+            self.plugins = []
+        self.started_at = datetime.now()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.start_counters = COUNTERS.snapshot()
+        self.peak_memory_bytes = 0
+        self.started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def measure(self, metrics: PluginMetrics, num_papers: int):
+        """
+        Accumulate the resources used by the code under the context into
+        `metrics`, which is registered by its first call.
+        """
+        tracing = tracemalloc.is_tracing()
+        with self.lock:
+            if not any(m is metrics for m in self.plugins):
+                self.plugins.append(metrics)
+            self.active_measures += 1
+            if tracing:
+                memory_start, peak = tracemalloc.get_traced_memory()
+                if self.active_measures == 1:
+                    self.peak_memory_bytes = max(
+                        self.peak_memory_bytes, peak
+                    )
+                    tracemalloc.reset_peak()
+        counters = COUNTERS.snapshot()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        metrics.calls += 1
+        metrics.papers_in += num_papers
+        try:
+            yield metrics
+        finally:
+            metrics.wall_seconds += time.perf_counter() - wall
+            metrics.cpu_seconds += time.process_time() - cpu
+            after = COUNTERS.snapshot()
+            for name in COUNTER_NAMES:
+                delta = after.get(name, 0) - counters.get(name, 0)
+                setattr(metrics, name, getattr(metrics, name) + delta)
+            with self.lock:
+                self.active_measures -= 1
+                if tracing:
+                    peak = tracemalloc.get_traced_memory()[1]
+                    metrics.peak_memory_bytes = max(
+                        metrics.peak_memory_bytes or 0, peak - memory_start
+                    )
+                    self.peak_memory_bytes = max(self.peak_memory_bytes, peak)
+
+    def summary(self, **extra) -> dict:
+        """
+        Return the metrics of the run as a json serializable dict, `extra`
+        items (e.g., the number of papers) are added as is.
+        """
+        counters = COUNTERS.snapshot()
+        with self.lock:
+            plugins = [asdict(m) for m in self.plugins]
+        summary = {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "wall_seconds": time.perf_counter() - self.start_wall,
+            "cpu_seconds": time.process_time() - self.start_cpu,
+            "peak_memory_bytes": (
+                max(self.peak_memory_bytes, tracemalloc.get_traced_memory()[1])
+                if tracemalloc.is_tracing() else None
+            ),
+        }
+        for name in COUNTER_NAMES:
+            summary[name] = (
+                counters.get(name, 0) - self.start_counters.get(name, 0)
+            )
+        summary.update(extra)
+        summary["plugins"] = plugins
+        return summary
+
+    def save(self,
+             directory: str,
+             history_file: str = "",
+             **extra) -> dict:
+        """
+        Save the summary of the run to `directory/run_metrics.json` and
+        append it as a json line to `history_file` if it is set.
+        """
+        summary = self.summary(**extra)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, RUN_METRICS_FILE_NAME)
+        with open(f"{path}.tmp", "w") as fp:
+            json.dump(summary, fp, indent=2, default=str)
+        os.replace(f"{path}.tmp", path)
+        if history_file:
+            folder = os.path.dirname(history_file)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(history_file, "a") as fp:
+                fp.write(json.dumps(summary, default=str) + "\n")
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        logger.info(f"Metrics of the run saved to {path}.")
+        return summary
+
+    def report(self):
+        with self.lock:
+            plugins = list(self.plugins)
+        str_metrics = tabulate(
+            [
+                [m.plugin, m.status, m.calls, f"{m.wall_seconds:.2f}",
+                 f"{m.cpu_seconds:.2f}", m.papers_in, m.papers_out,
+                 m.http_requests, m.llm_requests,
+                 m.prompt_tokens + m.completion_tokens,
+                 format_bytes(m.peak_memory_bytes)]
+                for m in plugins
+            ],
+            tablefmt="pretty",
+            headers=[
+                "Plugin", "Status", "Calls", "Wall", "CPU", "In", "Out",
+                "HTTP", "LLM", "Tokens", "Peak memory",
+            ],
+        )
+        logger.info(f"Metrics of the plugins:\n{str_metrics}")
+
+
+RUN_METRICS = RunMetrics()
+
+
+def format_bytes(num_bytes: int | None) -> str:
+    if num_bytes is None:
+        return "-"
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
@@ -3,10 +3,13 @@ import sys
 import inspect
 import os.path as osp
 from time import sleep
+from typing import TYPE_CHECKING
 
-import openai
 import tabulate
-from openai import OpenAI
+
+if TYPE_CHECKING:
+    import openai
+    from openai import OpenAI
 
 from serie.utils.logging import create_logger
 
@@ -30,8 +33,8 @@ def get_class_file_path(cls):
     return file_path
 
 
-def wait_batch_task(client: OpenAI,
-                    batch: openai.types.Batch,
+def wait_batch_task(client: "OpenAI",
+                    batch: "openai.types.Batch",
                     interval: float = 10):
     while True:
         sleep(interval)
@@ -48,7 +51,7 @@ def wait_batch_task(client: OpenAI,
     return client.batches.retrieve(batch.id)
 
 
-def batch_task_success(batch: openai.types.Batch):
+def batch_task_success(batch: "openai.types.Batch"):
     return batch.status in ("completed",)
 
 
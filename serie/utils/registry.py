@@ -0,0 +1,104 @@
+import os
+import ast
+import json
+import importlib
+import os.path as osp
+
+
+MANIFEST_FILE_NAME = ".manifest.json"
+
+
+class LazyRegistry:
+    """
+    Map the class names defined in the modules of a package to the module
+    names without importing them. A module is only imported when one of its
+    classes is looked up.
+
+    The classes are found by parsing the modules with `ast`, the result is
+    cached in a manifest file next to the modules and a module is parsed
+    again only if its size or modification time changed.
+
+    Args:
+        package: The package name, e.g., `serie.plugins`.
+        directory: The directory of the package.
+        excludes: File names which are not scanned.
+    """
+
+    def __init__(self,
+                 package: str,
+                 directory: str,
+                 excludes: tuple[str, ...] = ("__init__.py", "base.py")):
+        self.package = package
+        self.directory = directory
+        self.excludes = excludes
+        self.manifest_path = osp.join(directory, MANIFEST_FILE_NAME)
+        self.classes: dict[str, str] | None = None
+        self.loaded: dict[str, type] = {}
+
+    def get(self, name: str) -> type:
+        if name in self.loaded:
+            return self.loaded[name]
+        classes = self.manifest()
+        if name not in classes:
+            raise KeyError(
+                f"{name} is not found in {self.package}. Available: "
+                f"{sorted(classes.keys())}"
+            )
+        module = importlib.import_module(
+            f".{classes[name]}", package=self.package
+        )
+        self.loaded[name] = getattr(module, name)
+        return self.loaded[name]
+
+    def names(self) -> list[str]:
+        return sorted(self.manifest().keys())
+
+    def manifest(self) -> dict[str, str]:
+        if self.classes is not None:
+            return self.classes
+        cached = self.load_manifest()
+        files: dict[str, dict] = {}
+        for entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+            if not entry.name.endswith(".py") or entry.name in self.excludes:
+                continue
+            stat = entry.stat()
+            signature = [stat.st_mtime_ns, stat.st_size]
+            record = cached.get(entry.name)
+            if record is None or record["signature"] != signature:
+                record = {
+                    "signature": signature,
+                    "classes": parse_class_names(entry.path),
+                }
+            files[entry.name] = record
+        if files != cached:
+            self.save_manifest(files)
+        self.classes = {}
+        for filename, record in files.items():
+            for name in record["classes"]:
+                self.classes[name] = filename[:-3]
+        return self.classes
+
+    def load_manifest(self) -> dict[str, dict]:
+        try:
+            with open(self.manifest_path, "r") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, files: dict[str, dict]):
+        # A read-only installation simply rebuilds the manifest every time.
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as fp:
+                json.dump(files, fp, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            pass
+
+
+def parse_class_names(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as fp:
+        tree = ast.parse(fp.read(), filename=path)
+    return [
+        node.name for node in tree.body if isinstance(node, ast.ClassDef)
+    ]
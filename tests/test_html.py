@@ -0,0 +1,157 @@
+"""
+The `fast` HTML backend must extract the same fields as the BeautifulSoup
+backends from the CVF and ECVA paper pages.
+"""
+import pytest
+
+from serie.plugins import cvf_parser, eccv_parser
+from serie.utils.html import parse_html
+
+
+CVF_URL = (
+    "https://openaccess.thecvf.com/content/CVPR2024/html/"
+    "Smith_Fast_Detection_CVPR_2024_paper.html"
+)
+CVF_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>CVPR 2024 Open Access Repository</title></head>
+<body>
+<div id="header"><a href="/menu">Home</a></div>
+<div id="content">
+<dl>
+<dd>
+<div id="papertitle">Fast Detection &amp; Segmentation with
+<i>Sparse</i> Queries</div>
+<div id="authors"><br><b><i>Ana Smith, Jos&eacute; Garc&iacute;a</i></b>;
+Proceedings of the IEEE/CVF Conference on Computer Vision and Pattern
+Recognition (CVPR), 2024, pp. 1-10</div>
+<font size="5"><br><b>Abstract</b></font>
+<br><br><div id="abstract">
+We study detection &amp; segmentation with <b>sparse <i>queries</i></b>.
+<br>Our model runs at 30&nbsp;FPS &mdash; 2&times; faster than &lt;DETR&gt;.
+Code: <a href="https://github.com/smith/fast">github</a>.
+</div>
+<dd>
+[<a href="../../content/CVPR2024/papers/Smith_Fast_Detection_CVPR_2024_paper.pdf">pdf</a>]
+[<a href="../../content/CVPR2024/supplemental/Smith_Fast_CVPR_2024_supplemental.pdf">supp</a>]
+[<a href="http://arxiv.org/abs/2403.00001">arXiv</a>]
+<div class="link2">[<a class="fakelink" onclick="$(this).siblings('.bibref').slideToggle()">bibtex</a>]
+<div class="bibref pre-white-space">@InProceedings{Smith_2024_CVPR,<br>
+    author    = {Smith, Ana and Garc\\'ia, Jos\\'e},<br>
+    title     = {Fast Detection \\&amp; Segmentation with Sparse Queries},<br>
+    booktitle = {Proceedings of the IEEE/CVF Conference on Computer Vision and Pattern Recognition (CVPR)},<br>
+    month     = {June},<br>
+    year      = {2024},<br>
+    pages     = {1-10}<br>
+}</div>
+</div>
+</dd>
+</dl>
+</div>
+</body>
+</html>
+"""
+
+ECCV_URL = (
+    "https://www.ecva.net/papers/eccv_2024/papers_ECCV/html/"
+    "1_ECCV_2024_paper.php"
+)
+ECCV_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head><title>ECVA | European Computer Vision Association</title></head>
+<body>
+<div class="container">
+<div id="papertitle">
+Depth &amp; Motion from <b><i>Event</i></b> Cameras
+</div>
+<div id="authors">
+<i><b>Li&nbsp;Wei</b>, M&uuml;ller Hans, O&#39;Neil Kate;</i>
+</div>
+<div id="abstract">
+"Event cameras report <i>brightness</i> changes &lt;asynchronously&gt;.<br>
+We estimate depth &amp; motion <b>jointly <i>and</i> densely</b>."
+</div>
+<p></p>
+<a href="../../../../papers/eccv_2024/papers_ECCV/papers/00001.pdf">pdf</a>
+|
+<a href="../../../../papers/eccv_2024/papers_ECCV/papers/00001-supp.pdf">supplementary material</a>
+|
+<a href="https://doi.org/10.1007/978-3-031-72624-8_1">DOI</a>
+<div class="bibref">@InProceedings{10.1007/978-3-031-72624-8_1,<br>
+author={Wei, Li and M{\\"u}ller, Hans and O'Neil, Kate},<br>
+title={Depth \\&amp; Motion from Event Cameras},<br>
+booktitle={Computer Vision -- ECCV 2024},<br>
+year={2024},<br>
+publisher={Springer Nature Switzerland},<br>
+pages={1--17}<br>
+}</div>
+</div>
+</body>
+</html>
+"""
+
+
+def write_page(tmp_path, name: str, page: str) -> str:
+    path = tmp_path / name
+    path.write_text(page)
+    return str(path)
+
+
+@pytest.mark.parametrize("backend", ["html5lib", "lxml", "html.parser"])
+def test_cvf_paper_info_matches_beautifulsoup(tmp_path, backend):
+    cache_file = write_page(tmp_path, "cvf.html", CVF_PAGE)
+    fast = cvf_parser.parse_paper_info(
+        CVF_URL, cache_file, sleep_time=0, backend="fast"
+    )
+    expected = cvf_parser.parse_paper_info(
+        CVF_URL, cache_file, sleep_time=0, backend=backend
+    )
+    assert fast == expected
+    assert fast["title"] == (
+        "Fast Detection \\& Segmentation with Sparse Queries"
+    )
+    assert fast["year"] == "2024"
+    assert "30\xa0FPS — 2\xd7 faster than <DETR>" in fast["abstract"]
+    assert fast["pdfurl"].endswith(
+        "Smith_Fast_Detection_CVPR_2024_paper.pdf"
+    )
+
+
+@pytest.mark.parametrize("backend", ["html5lib", "lxml", "html.parser"])
+def test_eccv_paper_info_matches_beautifulsoup(tmp_path, backend):
+    cache_file = write_page(tmp_path, "eccv.html", ECCV_PAGE)
+    fast = eccv_parser.parse_paper_info(
+        ECCV_URL, cache_file, sleep_time=0, backend="fast"
+    )
+    expected = eccv_parser.parse_paper_info(
+        ECCV_URL, cache_file, sleep_time=0, backend=backend
+    )
+    assert fast == expected
+    # The fields of the bibtex entry take precedence over the page.
+    assert fast["title"] == "Depth \\& Motion from Event Cameras"
+    assert fast["authors"] == ["Li\xa0Wei", " Müller Hans", " O'Neil Kate"]
+    assert "<asynchronously>.We estimate" in fast["abstract"]
+    assert fast["doi"] == "https://doi.org/10.1007/978-3-031-72624-8_1"
+    assert fast["supplementary"].endswith("00001-supp.pdf")
+
+
+def test_listing_anchors_match_beautifulsoup():
+    listing = (
+        '<dl><dt class="ptitle"><br><a href="/content/a.html">A &amp; '
+        '<i>B</i></a></dt><dd>[<a href="/content/a.pdf">pdf</a>]</dd>'
+        '<dt class="ptitle"><br><a href="/content/c.html">C</a>'
+        '<dd>[<a href="/content/c.pdf">pdf</a>]</dl>'
+    )
+    fast = parse_html(listing, "fast")
+    soup = parse_html(listing, "html5lib")
+
+    def titles(document):
+        return [
+            (t.find("a")["href"], t.get_text(strip=True))
+            for t in document.find_all("dt", class_="ptitle")
+        ]
+
+    assert titles(fast) == titles(soup)
+    assert titles(fast) == [
+        ("/content/a.html", "A &B"), ("/content/c.html", "C"),
+    ]